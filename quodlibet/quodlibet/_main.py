@@ -15,6 +15,7 @@ from quodlibet import const
 from quodlibet import build
 from quodlibet.util import cached_func, windows, set_process_title, is_osx
 from quodlibet.util.dprint import print_d
+from quodlibet.util import tracer
 from quodlibet.util.path import mkdir, xdg_get_config_home, xdg_get_cache_home
 
 
@@ -214,7 +215,7 @@ def init_plugins(no_plugins=False):
     folders.append(os.path.join(get_user_dir(), "plugins"))
     print_d("Scanning folders: %s" % folders)
     pm = plugins.init(folders, no_plugins)
-    pm.rescan()
+    pm.rescan(lazy=True)
 
     from quodlibet.qltk.edittags import EditTags
     from quodlibet.qltk.renamefiles import RenameFiles
@@ -356,6 +357,18 @@ def run(window, before_quit=None):
         # if we don't show a window, startup isn't completed, so call manually
         Gdk.notify_startup_complete()
 
+    # startup is done once the window is drawn for the first time
+    if tracer.is_tracing():
+        def finish_trace(*args):
+            window.disconnect(draw_id)
+            tracer.finish()
+            return False
+
+        if window.get_visible():
+            draw_id = window.connect("draw", finish_trace)
+        else:
+            GLib.idle_add(tracer.finish)
+
     from quodlibet.errorreport import faulthandling
 
     # gtk+ on osx is just too crashy
@@ -176,7 +176,10 @@ class PanedBrowser(Browser, util.InstanceTracker):
             pane.remove(songs, remove_if_empty)
 
     def __changed(self, library, songs):
-        self.__removed(library, songs, False)
+        # Not filtered: the songs might have left the search results and
+        # the panes remember the keys of songs hidden by the search.
+        for pane in self._panes:
+            pane.remove(songs, False)
         self.__added(library, songs)
         self.__removed(library, [])
 
@@ -11,6 +11,7 @@ from quodlibet import _
 from quodlibet import util
 from quodlibet.qltk.models import ObjectStore
 from quodlibet.util.collection import Collection
+from quodlibet.util.collections import LRUCache
 
 
 class BaseEntry(Collection):
@@ -114,32 +115,67 @@ class AllEntry(BaseEntry):
 
 class PaneModel(ObjectStore):
 
+    KEY_CACHE_SIZE = 20000
+    """Number of songs not in the model to remember the keys of, so
+    switching between selections upstream doesn't need to format them
+    again"""
+
+    SORT_CACHE_SIZE = 5000
+    """Number of texts to remember the sort keys of"""
+
     def __init__(self, pattern_config):
         super(PaneModel, self).__init__()
-        self.__sort_cache = {} # text to sort text cache
-        self.__key_cache = {} # song to key cache
+        self.__sort_cache = LRUCache(self.SORT_CACHE_SIZE)
+        self.__key_cache = LRUCache(self.KEY_CACHE_SIZE)
+        # song -> keys, for all songs in the model
+        self.__song_keys = {}
+        # entry key -> iter, for all entries except All
+        self.__rows = {}
+        # keys of entries which got empty and weren't removed yet
+        self.__empty = set()
+        # (selected paths, selected keys) for matches()
+        self.__selected = None
         self.config = pattern_config
 
+    def __format_keys(self, song):
+        # We filter out empty values, so Unknown can be ""
+        return list(filter(lambda v: v[0], self.config.format(song)))
+
     def get_format_keys(self, song):
         try:
-            return self.__key_cache[song]
+            return self.__song_keys[song]
         except KeyError:
-            # We filter out empty values, so Unknown can be ""
-            self.__key_cache[song] = list(filter(
-                lambda v: v[0], self.config.format(song)))
-            return self.__key_cache[song]
+            keys = self.__key_cache.get(song)
+            if keys is None:
+                keys = self.__key_cache[song] = self.__format_keys(song)
+            return keys
 
     def __human_sort_key(self, text, reg=re.compile('<.*?>')):
-        try:
-            return self.__sort_cache[text], text
-        except KeyError:
+        sort_key = self.__sort_cache.get(text)
+        if sort_key is None:
             # remove the markup so it doesn't affect the sort order
             if self.config.has_markup:
                 text_stripped = reg.sub("", text)
             else:
                 text_stripped = text
-            self.__sort_cache[text] = util.human_sort_key(text_stripped)
-            return self.__sort_cache[text], text
+            sort_key = self.__sort_cache[text] = \
+                util.human_sort_key(text_stripped)
+        return sort_key, text
+
+    def clear(self):
+        self.__song_keys.clear()
+        self.__rows.clear()
+        self.__empty.clear()
+        self.__selected = None
+        super(PaneModel, self).clear()
+
+    def remove(self, iter_):
+        entry = self.get_value(iter_)
+        if not isinstance(entry, AllEntry):
+            del self.__rows[entry.key]
+            self.__empty.discard(entry.key)
+        self.__selected = None
+        return super(PaneModel, self).remove(iter_)
 
     def get_songs(self, paths):
         """Get all songs for the given paths (from a selection e.g.)"""
@@ -150,8 +186,7 @@ class PaneModel(ObjectStore):
 
         first_path = paths[0]
         if isinstance(self[first_path][0], AllEntry):
-            for entry in self.itervalues():
-                s.update(entry.songs)
+            s.update(self.__song_keys)
         else:
             for path in paths:
                 s.update(self[path][0].songs)
@@ -168,31 +203,64 @@ class PaneModel(ObjectStore):
         """
 
         songs = set(songs)
+        self.__remove_songs(songs, remove_if_empty, False)
 
+        # they might have changed
         for song in songs:
-            if song in self.__key_cache:
-                del self.__key_cache[song]
+            self.__key_cache.pop(song)
 
-        to_remove = []
-        for iter_, entry in self.iterrows():
-            if isinstance(entry, AllEntry):
+    def set_songs(self, songs):
+        """Changes the songs to `songs`, only adding and removing the
+        difference to the current ones.
+        """
+
+        songs = set(songs)
+        current = self.__song_keys.keys()
+        removed = current - songs
+        if removed:
+            self.__remove_songs(removed, True, True)
+        added = songs - current
+        if added:
+            self.add_songs(added)
+
+    def __remove_songs(self, songs, remove_if_empty, remember):
+        # only touch the entries which contain the songs
+        changed = {}
+        key_cache = self.__key_cache
+        for song in songs:
+            keys = self.__song_keys.pop(song, None)
+            if keys is None:
                 continue
-            entry.songs -= songs
+            if remember:
+                key_cache[song] = keys
+            if not keys:
+                changed.setdefault("", set()).add(song)
+            for key, sort in keys:
+                changed.setdefault(key, set()).add(song)
+
+        empty = self.__empty
+        for key, removed in changed.items():
+            iter_ = self.__rows.get(key)
+            if iter_ is None:
+                continue
+            entry = self.get_value(iter_)
+            entry.songs -= removed
             entry.finalize()
             self.row_changed(self.get_path(iter_), iter_)
             if not entry.songs:
-                to_remove.append(iter_)
+                empty.add(key)
 
         if not remove_if_empty:
             return
 
-        # remove from cache and the model
+        to_remove = []
+        for key in empty:
+            iter_ = self.__rows[key]
+            if not self.get_value(iter_).songs:
+                to_remove.append(iter_)
+        empty.clear()
+
         for iter_ in to_remove:
-            try:
-                key = self.get_value(iter_).key
-                del(self.__sort_cache[key])
-            except KeyError:
-                pass
             self.remove(iter_)
 
         if len(self) == 1 and isinstance(self[0][0], AllEntry):
@@ -202,14 +270,42 @@ class PaneModel(ObjectStore):
             # Only one entry + All -> remove All
             self.remove(self.get_iter_first())
 
+    def __find_position(self, sort_key):
+        """The position of the first entry which sorts after `sort_key`,
+        but before Unknown.
+        """
+
+        lo = 0
+        hi = len(self)
+        if hi and isinstance(self[0][0], AllEntry):
+            lo = 1
+        if hi > lo and isinstance(self[-1][0], UnknownEntry):
+            hi -= 1
+
+        get_value = self.get_value
+        nth = self.iter_nth_child
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if sort_key < get_value(nth(None, mid)).sort:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
     def add_songs(self, songs):
         """Add new songs to the list, creating new rows"""
 
         collection = {}
         unknown = UnknownEntry()
         human_sort = self.__human_sort_key
+        song_keys = self.__song_keys
         for song in songs:
-            items = self.get_format_keys(song)
+            items = song_keys.get(song)
+            if items is None:
+                items = self.__key_cache.pop(song)
+                if items is None:
+                    items = self.__format_keys(song)
+                song_keys[song] = items
             if not items:
                 unknown.songs.add(song)
             for key, sort in items:
@@ -225,74 +321,53 @@ class PaneModel(ObjectStore):
                     collection[key] = (entry, hsort, bool(sort))
                     entry.songs.add(song)
 
-        items = sorted(collection.items(),
-                       key=lambda s: s[1][1],
-                       reverse=True)
+        self.__selected = None
+        rows = self.__rows
 
         # fast path
         if not len(self):
+            items = sorted(collection.values(), key=lambda s: s[1])
+            entries = [val for (val, sort_key, srtp) in items]
             if unknown.songs:
-                self.insert(0, [unknown])
-            entries = []
-            for key, (val, sort_key, srtp) in items:
-                entries.append(val)
-            self.insert_many(0, reversed(entries))
+                entries.append(unknown)
+            for iter_ in self.iter_append_many(entries):
+                rows[self.get_value(iter_).key] = iter_
             if len(self) > 1:
                 self.insert(0, [AllEntry()])
             return
 
-        # insert all new songs
-        key = None
-        val = None
-        sort_key = None
-
-        for iter_, entry in self.iterrows():
-            if not isinstance(entry, SongsEntry):
+        # merge into existing entries, insert the new ones in order
+        new = []
+        for key, (val, sort_key, srtp) in collection.items():
+            iter_ = rows.get(key)
+            if iter_ is None:
+                new.append(val)
                 continue
+            entry = self.get_value(iter_)
+            entry.songs |= val.songs
+            entry.finalize()
+            self.__empty.discard(key)
+            self.row_changed(self.get_path(iter_), iter_)
 
-            if key is None:
-                if not items:
-                    break
-                key, (val, sort_key, srtp) = items.pop(-1)
+        for val in new:
+            rows[val.key] = self.insert(self.__find_position(val.sort), [val])
 
-            if key == entry.key: # Display strings the same
-                entry.songs |= val.songs
+        # check if Unknown needs to be inserted or updated
+        if unknown.songs:
+            iter_ = rows.get("")
+            if iter_ is not None:
+                entry = self.get_value(iter_)
+                entry.songs |= unknown.songs
                 entry.finalize()
+                self.__empty.discard("")
                 self.row_changed(self.get_path(iter_), iter_)
-                key = None
-            elif sort_key < entry.sort:
-                self.insert_before(iter_, row=[val])
-                key = None
-
-        # the last one failed, add it again
-        if key:
-            items.append((key, (val, sort_key, srtp)))
-
-        # insert the left over songs
-        if items:
-            entries = []
-            for key, (val, srt, srtp) in items:
-                entries.append(val)
-            if isinstance(self[-1][0], UnknownEntry):
-                self.insert_many(len(self) - 1, entries)
             else:
-                self.append_many(entries)
+                rows[""] = self.append(row=[unknown])
 
         # check if All needs to be inserted
         if len(self) > 1 and not isinstance(self[0][0], AllEntry):
             self.insert(0, [AllEntry()])
 
-        # check if Unknown needs to be inserted or updated
-        if unknown.songs:
-            last_row = self[-1]
-            entry = last_row[0]
-            if isinstance(entry, UnknownEntry):
-                entry.songs |= unknown.songs
-                entry.finalize()
-                self.row_changed(last_row.path, last_row.iter)
-            else:
-                self.append(row=[unknown])
-
     def matches(self, paths, song):
         """If the song is included in the selection defined by the paths.
 
@@ -306,17 +381,20 @@ class PaneModel(ObjectStore):
         if isinstance(self[paths[0]][0], AllEntry):
             return True
 
+        selection = tuple(str(p) for p in paths)
+        if self.__selected is None or self.__selected[0] != selection:
+            self.__selected = (selection, self.get_keys(paths))
+        selected = self.__selected[1]
+
         keys = self.get_format_keys(song)
 
         # empty key -> unknown
-        if not keys and isinstance(self[paths[-1]][0], UnknownEntry):
-            return True
+        if not keys:
+            return "" in selected
 
-        for path in paths:
-            entry = self.get_value(self.get_iter(path))
-            for key in keys:
-                if entry.key == (key[0] if isinstance(key, tuple) else key):
-                    return True
+        for key in keys:
+            if (key[0] if isinstance(key, tuple) else key) in selected:
+                return True
 
         return False
 
@@ -244,8 +244,8 @@ class Pane(AllTreeView):
 
         self.inhibit()
         with self.without_model():
-            model.clear()
-            model.add_songs(songs)
+            # songs staying keep their entries and format keys
+            model.set_songs(songs)
 
         self.set_selected(selected, jump=True)
         self.uninhibit()
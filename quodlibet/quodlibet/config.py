@@ -46,6 +46,29 @@ INITIAL = {
     "library": {
         "exclude": "",
         "refresh_on_start": "true",
+
+        # only write changed songs to a journal file on save instead of
+        # rewriting the whole library file each time
+        "journal": "false",
+
+        # keep an index of the words in tag values for faster searching
+        "query_index": "false",
+
+        # number of processes reading tags while scanning the library,
+        # 0 reads them in the main process
+        "scan_workers": "0",
+
+        # number of threads listing directories while scanning, helps
+        # with network file systems, 0 lists them in the main thread
+        "walk_workers": "0",
+
+        # remember directory mtimes and skip unchanged directories when
+        # rebuilding, files changed in place need a full rebuild then
+        "dir_cache": "false",
+
+        # remember the images in song directories while scanning, so
+        # looking up album covers doesn't need to list them again
+        "cover_index": "false",
     },
 
     # State about the player, to restore on startup
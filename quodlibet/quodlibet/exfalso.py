@@ -15,12 +15,15 @@ from quodlibet import app
 from quodlibet import util
 from quodlibet import const
 from quodlibet import config
+from quodlibet.util import tracer
 
 
 def main(argv=None):
     if argv is None:
         argv = sys_argv
 
+    tracer.start()
+
     import quodlibet
 
     config_file = os.path.join(quodlibet.get_user_dir(), "config")
@@ -50,7 +53,7 @@ def main(argv=None):
     from quodlibet.qltk.songlist import PlaylistModel
     app.player.setup(PlaylistModel(), None, 0)
     pm = quodlibet.init_plugins()
-    pm.rescan()
+    pm.rescan(lazy=True)
 
     from quodlibet.qltk.exfalsowindow import ExFalsoWindow
     dir_ = args[0]
@@ -66,6 +69,11 @@ def main(argv=None):
 
     quodlibet.enable_periodic_save(save_library=False)
     quodlibet.run(app.window)
+
+    # finish started and queued tag writes before exiting
+    from quodlibet.util.tagwriter import TagWriter
+    TagWriter.get().shutdown()
+
     quodlibet.finish_first_session("exfalso")
     config.save()
 
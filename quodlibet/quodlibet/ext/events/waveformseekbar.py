@@ -12,10 +12,19 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import hashlib
+import os
+import struct
+import sys
+import threading
+from array import array
+
 from gi.repository import Gtk, Gdk, Gst
+from senf import fsn2bytes
 import cairo
 from math import ceil, floor
 
+import quodlibet
 from quodlibet import _, app
 from quodlibet import print_w
 from quodlibet import util
@@ -28,17 +37,315 @@ from quodlibet.qltk.seekbutton import TimeLabel
 from quodlibet.qltk.tracker import TimeTracker
 from quodlibet.qltk import get_fg_highlight_color
 from quodlibet.util import connect_destroy, print_d
+from quodlibet.util.path import mkdir, mtime
+
+
+MIN_LEVEL_VALUES = 64
+"""The coarsest level of the cached waveforms has at least that many
+values"""
+
+PRECOMPUTE_COUNT = 3
+"""Number of upcoming songs to compute the waveforms of in advance"""
+
+
+def decimate(values):
+    """Returns half as many values, each the mean of two neighbours"""
+
+    result = [(a + b) / 2.0 for a, b in zip(values[::2], values[1::2])]
+    if len(values) % 2:
+        result.append(values[-1])
+    return result
+
+
+def build_levels(values, min_count=MIN_LEVEL_VALUES):
+    """Returns a list with the values, followed by coarser versions of them
+    with half as many values each, down to at least min_count values.
+    """
+
+    levels = [list(values)]
+    while len(levels[-1]) >= min_count * 2:
+        levels.append(decimate(levels[-1]))
+    return levels
+
+
+def get_level(levels, count):
+    """Returns the coarsest level with at least count values"""
+
+    for level in reversed(levels):
+        if len(level) >= count:
+            return level
+    return levels[0]
+
+
+def create_level_pipeline(song, points):
+    """Returns a pipeline posting about the given number of level messages
+    for the whole song, or None if it can't be analyzed.
+    """
+
+    if not song.is_file:
+        return
+
+    command_template = """
+    uridecodebin name=uridec
+    ! audioconvert
+    ! level name=audiolevel interval={} post-messages=true
+    ! fakesink sync=false"""
+    interval = int(song("~#length") * 1E9 / points)
+    if not interval:
+        return
+    print_d("Computing data for each %.3f seconds" % (interval / 1E9))
+
+    command = command_template.format(interval)
+    pipeline = Gst.parse_launch(command)
+    pipeline.get_by_name("uridec").set_property("uri", song("~uri"))
+    return pipeline
+
+
+def get_level_rms(structure):
+    """Returns the RMS of all channels of a level message structure,
+    normalized to a value between 0 and 1, or None
+    """
+
+    rms_db = structure.get_value("rms")
+    if rms_db:
+        # Calculate average of all channels (usually 2)
+        rms_db_avg = sum(rms_db) / len(rms_db)
+        # Normalize dB value to value between 0 and 1
+        return pow(10, (rms_db_avg / 20))
+
+
+def get_upcoming_songs(playlist, count=PRECOMPUTE_COUNT):
+    """Returns up to count songs likely to be played next: the queued ones
+    followed by the ones after the current song in the song list"""
+
+    songs = []
+    for song in playlist.q.itervalues():
+        if len(songs) >= count:
+            return songs
+        songs.append(song)
+
+    model = playlist.pl
+    iter_ = model.current_iter
+    while iter_ is not None and len(songs) < count:
+        iter_ = model.iter_next(iter_)
+        if iter_ is not None:
+            songs.append(model.get_value(iter_))
+    return songs
+
+
+class WaveformCache(object):
+    """Stores the waveforms of songs on disk, as returned by build_levels().
+
+    Entries are stored together with the mtime of the song file and get
+    ignored once it has changed, or if they were computed with fewer data
+    points than requested.
+    """
+
+    VERSION = 1
+    MAX_FILES = 5000
+
+    _MAGIC = b"QLWF"
+    # magic, version, data points, song mtime, number of levels
+    _HEADER = struct.Struct("<4sHIdH")
+    _SCALE = 65535
+
+    def __init__(self, folder=None):
+        self._folder = folder
+
+    @property
+    def folder(self):
+        if self._folder is None:
+            return os.path.join(quodlibet.get_cache_dir(), "waveforms")
+        return self._folder
+
+    def _get_path(self, filename):
+        key = hashlib.sha1(fsn2bytes(filename, "utf-8")).hexdigest()
+        return os.path.join(self.folder, key + ".wf")
+
+    def lookup(self, filename, points):
+        """Returns the levels of the song file or None"""
+
+        try:
+            with open(self._get_path(filename), "rb") as h:
+                data = h.read()
+        except EnvironmentError:
+            return
+
+        try:
+            magic, version, stored_points, file_mtime, count = \
+                self._HEADER.unpack_from(data)
+        except struct.error:
+            return
+        if magic != self._MAGIC or version != self.VERSION or \
+                stored_points < points or file_mtime != mtime(filename):
+            return
+
+        offset = self._HEADER.size
+        sizes = array("I")
+        values = array("H")
+        sizes_end = offset + count * sizes.itemsize
+        if (len(data) - sizes_end) % values.itemsize:
+            return
+        sizes.frombytes(data[offset:sizes_end])
+        values.frombytes(data[sizes_end:])
+        if sys.byteorder == "big":
+            sizes.byteswap()
+            values.byteswap()
+        if sum(sizes) != len(values) or not values:
+            return
+
+        scale = float(self._SCALE)
+        levels = []
+        start = 0
+        for size in sizes:
+            levels.append([v / scale for v in values[start:start + size]])
+            start += size
+        return levels
+
+    def store(self, filename, points, levels):
+        """Caches the levels, computed with the given number of data
+        points. Does nothing if the song file doesn't exist.
+        """
+
+        file_mtime = mtime(filename)
+        if not file_mtime or not levels or not levels[0]:
+            return
+
+        scale = self._SCALE
+        sizes = array("I", [len(level) for level in levels])
+        values = array("H", [int(round(min(max(v, 0.0), 1.0) * scale))
+                             for level in levels for v in level])
+        if sys.byteorder == "big":
+            sizes.byteswap()
+            values.byteswap()
+        header = self._HEADER.pack(
+            self._MAGIC, self.VERSION, points, file_mtime, len(sizes))
+
+        path = self._get_path(filename)
+        temp_path = "%s.%d.%d.tmp" % (
+            path, os.getpid(), threading.current_thread().ident)
+        try:
+            mkdir(self.folder, 0o700)
+            with open(temp_path, "wb") as h:
+                h.write(header)
+                h.write(sizes.tobytes())
+                h.write(values.tobytes())
+            os.replace(temp_path, path)
+        except EnvironmentError:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def prune(self, max_files=MAX_FILES):
+        """Removes the entries stored longest ago, leaving max_files"""
+
+        try:
+            names = os.listdir(self.folder)
+        except OSError:
+            return
+        if len(names) <= max_files:
+            return
+
+        paths = [os.path.join(self.folder, n) for n in names]
+        paths.sort(key=mtime)
+        for path in paths[:len(paths) - max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class WaveformPrecomputer(object):
+    """Computes and caches the waveforms of songs one after another"""
+
+    def __init__(self, cache):
+        self._cache = cache
+        self._songs = []
+        self._points = 0
+        self._pipeline = None
+        self._bus_id = None
+        self._song = None
+        self._rms_vals = []
+
+    def set_songs(self, songs, points):
+        """Replaces the songs to compute the waveforms of"""
+
+        self._songs = list(songs)
+        self._points = points
+        if self._pipeline is None:
+            self._next()
+
+    def stop(self):
+        self._songs = []
+        self._clean_pipeline()
+
+    def _next(self):
+        while self._songs:
+            song = self._songs.pop(0)
+            if not song.is_file or self._cache.lookup(
+                    song("~filename"), self._points) is not None:
+                continue
+            pipeline = create_level_pipeline(song, self._points)
+            if pipeline is None:
+                continue
+
+            bus = pipeline.get_bus()
+            self._bus_id = bus.connect("message", self._on_bus_message)
+            bus.add_signal_watch()
+            pipeline.set_state(Gst.State.PLAYING)
+
+            self._pipeline = pipeline
+            self._song = song
+            self._rms_vals = []
+            return
+
+    def _on_bus_message(self, bus, message):
+        done = failed = False
+        if message.type == Gst.MessageType.ERROR:
+            failed = True
+        elif message.type == Gst.MessageType.EOS:
+            done = True
+        elif message.type == Gst.MessageType.ELEMENT:
+            structure = message.get_structure()
+            if structure.get_name() == "level":
+                rms = get_level_rms(structure)
+                if rms is not None:
+                    self._rms_vals.append(rms)
+                    done = len(self._rms_vals) >= self._points
+
+        if done or failed:
+            self._clean_pipeline()
+            if done and self._rms_vals:
+                self._cache.store(self._song("~filename"), self._points,
+                                  build_levels(self._rms_vals))
+            self._song = None
+            self._rms_vals = []
+            self._next()
+
+    def _clean_pipeline(self):
+        if self._pipeline:
+            self._pipeline.set_state(Gst.State.NULL)
+            bus = self._pipeline.get_bus()
+            bus.remove_signal_watch()
+            bus.disconnect(self._bus_id)
+            self._bus_id = None
+            self._pipeline = None
 
 
 class WaveformSeekBar(Gtk.Box):
     """A widget containing labels and the seekbar."""
 
-    def __init__(self, player, library):
+    def __init__(self, player, library, playlist=None):
         super(WaveformSeekBar, self).__init__()
 
         self._player = player
+        self._playlist = playlist
         self._rms_vals = []
         self._hovering = False
+        self._cache = WaveformCache()
+        self._cache.prune()
+        self._precomputer = WaveformPrecomputer(self._cache)
 
         self._elapsed_label = TimeLabel()
         self._remaining_label = TimeLabel()
@@ -89,23 +396,20 @@ class WaveformSeekBar(Gtk.Box):
     def _create_waveform(self, song, points):
         # Close any existing pipeline to avoid leaks
         self._clean_pipeline()
+        self._precomputer.stop()
 
         if not song.is_file:
             return
 
-        command_template = """
-        uridecodebin name=uridec
-        ! audioconvert
-        ! level name=audiolevel interval={} post-messages=true
-        ! fakesink sync=false"""
-        interval = int(song("~#length") * 1E9 / points)
-        if not interval:
+        levels = self._cache.lookup(song("~filename"), points)
+        if levels is not None:
+            print_d("Using cached waveform for %s" % song("~filename"))
+            self._set_levels(levels)
             return
-        print_d("Computing data for each %.3f seconds" % (interval / 1E9))
 
-        command = command_template.format(interval)
-        pipeline = Gst.parse_launch(command)
-        pipeline.get_by_name("uridec").set_property("uri", song("~uri"))
+        pipeline = create_level_pipeline(song, points)
+        if pipeline is None:
+            return
 
         bus = pipeline.get_bus()
         self._bus_id = bus.connect("message", self._on_bus_message, points)
@@ -115,6 +419,19 @@ class WaveformSeekBar(Gtk.Box):
 
         self._pipeline = pipeline
         self._new_rms_vals = []
+        self._filename = song("~filename")
+
+    def _set_levels(self, levels):
+        self._rms_vals = levels[0]
+        self._waveform_scale.reset(levels)
+        self._waveform_scale.set_placeholder(False)
+        self._update_redraw_interval()
+        self._precompute()
+
+    def _precompute(self):
+        if CONFIG.precompute and self._playlist is not None:
+            songs = get_upcoming_songs(self._playlist)
+            self._precomputer.set_songs(songs, CONFIG.max_data_points)
 
     def _on_bus_message(self, bus, message, points):
         force_stop = False
@@ -126,12 +443,8 @@ class WaveformSeekBar(Gtk.Box):
         elif message.type == Gst.MessageType.ELEMENT:
             structure = message.get_structure()
             if structure.get_name() == "level":
-                rms_db = structure.get_value("rms")
-                if rms_db:
-                    # Calculate average of all channels (usually 2)
-                    rms_db_avg = sum(rms_db) / len(rms_db)
-                    # Normalize dB value to value between 0 and 1
-                    rms = pow(10, (rms_db_avg / 20))
+                rms = get_level_rms(structure)
+                if rms is not None:
                     self._new_rms_vals.append(rms)
                     if len(self._new_rms_vals) >= points:
                         # The audio might be much longer than we anticipated
@@ -146,10 +459,10 @@ class WaveformSeekBar(Gtk.Box):
             self._clean_pipeline()
 
             # Update the waveform with the new data
-            self._rms_vals = self._new_rms_vals
-            self._waveform_scale.reset(self._rms_vals)
-            self._waveform_scale.set_placeholder(False)
-            self._update_redraw_interval()
+            levels = build_levels(self._new_rms_vals)
+            if self._new_rms_vals:
+                self._cache.store(self._filename, points, levels)
+            self._set_levels(levels)
 
             # Clear temporary reference to the waveform data
             del self._new_rms_vals
@@ -173,6 +486,7 @@ class WaveformSeekBar(Gtk.Box):
 
     def _on_destroy(self, *args):
         self._clean_pipeline()
+        self._precomputer.stop()
         self._label_tracker.destroy()
         self._redraw_tracker.destroy()
 
@@ -200,12 +514,14 @@ class WaveformSeekBar(Gtk.Box):
             self._update_label(player)
 
     def _on_song_started(self, player, song):
+        self._waveform_scale.set_placeholder(True)
+
         if player.info:
-            # Trigger a re-computation of the waveform
+            # Trigger a re-computation of the waveform, this might use the
+            # cache and show it right away
             self._create_waveform(player.info, CONFIG.max_data_points)
             self._resize_labels(player.info)
 
-        self._waveform_scale.set_placeholder(True)
         self._update(player, True)
 
     def _on_song_ended(self, player, song, ended):
@@ -309,7 +625,8 @@ class WaveformSeekBar(Gtk.Box):
 class WaveformScale(Gtk.EventBox):
     """The waveform widget."""
 
-    _rms_vals = []
+    _levels = [[]]
+    _max_value = 0.0
     _player = None
     _placeholder = True
 
@@ -336,8 +653,11 @@ class WaveformScale(Gtk.EventBox):
     def set_placeholder(self, placeholder):
         self._placeholder = placeholder
 
-    def reset(self, rms_vals):
-        self._rms_vals = rms_vals
+    def reset(self, levels):
+        """Takes the waveform as returned by build_levels()"""
+
+        self._levels = levels
+        self._max_value = max(levels[0]) if levels[0] else 0.0
         self._seeking = False
         self.queue_draw()
 
@@ -394,8 +714,12 @@ class WaveformScale(Gtk.EventBox):
 
         half_height = self.compute_half_height(height, pixel_ratio)
 
-        value_count = len(self._rms_vals)
-        max_value = max(self._rms_vals)
+        # The coarsest level still having a value for each pixel, so there
+        # are fewer values to average per pixel
+        data = get_level(self._levels, int(ceil(width * pixel_ratio)))
+
+        value_count = len(data)
+        max_value = self._max_value
         ratio_width = value_count / (float(width) * pixel_ratio)
         ratio_height = max_value / half_height
 
@@ -407,8 +731,6 @@ class WaveformScale(Gtk.EventBox):
         mouse_position = self.mouse_position * scale_factor
 
         hw = line_width / 2.0
-        # Avoiding object lookups is slightly faster
-        data = self._rms_vals
 
         # Use the clip rectangles to redraw only what is necessary
         for (cx, cy, cw, ch) in cr.copy_clip_rectangle_list():
@@ -536,7 +858,7 @@ class WaveformScale(Gtk.EventBox):
         width = allocation.width
         height = allocation.height
 
-        if not self._placeholder and self._rms_vals:
+        if not self._placeholder and self._max_value:
             self.draw_waveform(cr, width, height, elapsed_color,
                                hover_color, remaining_color,
                                show_current_pos_config)
@@ -591,6 +913,7 @@ class Config(object):
     seek_amount = IntConfProp(_config, "seek_amount", 5000)
     max_data_points = IntConfProp(_config, "max_data_points", 3000)
     show_time_labels = BoolConfProp(_config, "show_time_labels", True)
+    precompute = BoolConfProp(_config, "precompute", False)
 
 
 CONFIG = Config()
@@ -610,7 +933,8 @@ class WaveformSeekBarPlugin(EventPlugin):
         self._bar = None
 
     def enabled(self):
-        self._bar = WaveformSeekBar(app.player, app.librarian)
+        self._bar = WaveformSeekBar(
+            app.player, app.librarian, app.window.playlist)
         self._bar.show()
         app.window.set_seekbar_widget(self._bar)
 
@@ -695,6 +1019,15 @@ class WaveformSeekBarPlugin(EventPlugin):
         show_time_labels.connect("toggled", on_show_time_labels_toggled)
         vbox.pack_start(show_time_labels, True, True, 0)
 
+        def on_precompute_toggled(button, *args):
+            CONFIG.precompute = button.get_active()
+
+        precompute = Gtk.CheckButton(
+            label=_("Compute waveforms of upcoming songs in advance"))
+        precompute.set_active(CONFIG.precompute)
+        precompute.connect("toggled", on_precompute_toggled)
+        vbox.pack_start(precompute, True, True, 0)
+
         hbox = Gtk.HBox(spacing=6)
         hbox.set_border_width(6)
         label = Gtk.Label(label=_(
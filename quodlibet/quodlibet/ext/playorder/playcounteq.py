@@ -6,17 +6,13 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
-import math
-import random
-
 from quodlibet import _
-from quodlibet.order.reorder import Reorder
+from quodlibet.order.reorder import Reorder, WeightedReorder
 from quodlibet.plugins.playorder import ShufflePlugin
-from quodlibet.order import OrderRemembered
 from quodlibet.qltk import Icons
 
 
-class PlaycountEqualizer(ShufflePlugin, OrderRemembered):
+class PlaycountEqualizer(ShufflePlugin, WeightedReorder):
     PLUGIN_ID = "playcounteq"
     PLUGIN_NAME = _("Playcount Equalizer")
     PLUGIN_DESC = _("Shuffle, preferring songs with fewer total plays.")
@@ -25,26 +21,35 @@ class PlaycountEqualizer(ShufflePlugin, OrderRemembered):
 
     priority = Reorder.priority
 
-    # Select the next track.
-    def next(self, playlist, current):
-        super(PlaycountEqualizer, self).next(playlist, current)
-
-        remaining = self.remaining(playlist)
-
-        # Don't try to search through an empty / played playlist.
-        if len(remaining) <= 0:
-            return None
-
-        # Set-up the search information.
-        max_count = max([song('~#playcount') for song in remaining.values()])
-        weights = {i: max_count - song('~#playcount')
-                   for i, song in remaining.items()}
-        choice = int(max(1, math.ceil(sum(weights) * random.random())))
-
-        # Search for a track.
-        for i, weight in weights.items():
-            choice -= weight
-            if choice <= 0:
-                return playlist.get_iter([i])
-        else:  # This should only happen if all songs have equal play counts.
-            return playlist.get_iter([random.choice(list(remaining.keys()))])
+    _max_count = 0
+
+    def prepare(self, songs):
+        self._max_count = max(
+            [song("~#playcount") for song in songs] or [0])
+
+    def __played(self, song):
+        # The most played remaining songs have a weight of zero, so once
+        # one of them got played the maximum of the others might be lower
+        if song("~#playcount") >= self._max_count:
+            self._weights = None
+
+    def next(self, playlist, iter):
+        if iter is not None:
+            self.__played(playlist[iter][0])
+        return super(PlaycountEqualizer, self).next(playlist, iter)
+
+    def set(self, playlist, iter):
+        if iter is not None:
+            self.__played(playlist[iter][0])
+        return super(PlaycountEqualizer, self).set(playlist, iter)
+
+    # Songs get picked with a probability proportional to how much less
+    # they were played than the most played song not played yet.
+    def weight(self, song):
+        count = song("~#playcount")
+        if count > self._max_count:
+            # all weights depend on the maximum, so recompute them
+            # with the next pick
+            self._max_count = count
+            self._weights = None
+        return max(0, self._max_count - count)
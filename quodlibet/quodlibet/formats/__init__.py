@@ -11,8 +11,11 @@ from ._audio import PEOPLE, AudioFile, DUMMY_SONG, decode_value, \
 from ._image import EmbeddedImage, APICType
 from ._misc import AudioFileError, init, MusicFile, types, loaders, filter, \
     mimes
-from ._serialize import load_audio_files, dump_audio_files, SerializationError
+from ._serialize import load_audio_files, dump_audio_files, \
+    SerializationError, is_legacy_data
+from ._pool import LoaderPool, get_pool
 
 AudioFile, AudioFileError, EmbeddedImage, DUMMY_SONG, PEOPLE, decode_value,
 APICType, FILESYSTEM_TAGS, TIME_TAGS, init, MusicFile, types, loaders, filter,
-mimes, load_audio_files, dump_audio_files, SerializationError
+mimes, load_audio_files, dump_audio_files, SerializationError, LoaderPool,
+get_pool, is_legacy_data
@@ -15,7 +15,7 @@ import re
 import shutil
 import time
 from collections import OrderedDict
-from itertools import zip_longest
+from itertools import zip_longest, count
 
 from senf import fsn2uri, fsnative, fsn2text, devnull, bytes2fsn, path2fsn
 
@@ -38,6 +38,17 @@ from ._misc import AudioFileError, translate_errors
 
 translate_errors
 
+_change_serials = count(1)
+
+
+def get_change_serial():
+    """Returns a number smaller than the serials of all following tag
+    changes, see `AudioFile.get_tag_changes()`
+    """
+
+    return next(_change_serials)
+
+
 MIGRATE = {"~#playcount", "~#laststarted", "~#lastplayed", "~#added",
            "~#skipcount", "~#rating", "~bookmark"}
 """These get migrated if a song gets reloaded"""
@@ -134,6 +145,8 @@ class AudioFile(dict, ImageContainer):
             self[key] = value
         for key, value in kwargs.items():
             self[key] = value
+        # no need to remember each tag of a new song
+        self.__changed(None)
 
     def __song_key(self):
         return (self("~#disc", 1), self("~#track", 1),
@@ -153,6 +166,13 @@ class AudioFile(dict, ImageContainer):
     def sort_key(self):
         return [self.album_key, self.__song_key()]
 
+    @util.cached_property
+    def column_sort_keys(self):
+        """A dict for caching sort keys of other tags, which gets replaced
+        when the song changes"""
+
+        return {}
+
     @staticmethod
     def sort_by_func(tag):
         """Returns a fast sort function for a specific tag (or pattern).
@@ -194,17 +214,70 @@ class AudioFile(dict, ImageContainer):
             value = str(value)
 
         dict.__setitem__(self, key, value)
-
-        pop = self.__dict__.pop
-        pop("album_key", None)
-        pop("sort_key", None)
+        self.__changed(key)
 
     def __delitem__(self, key):
         dict.__delitem__(self, key)
+        self.__changed(key)
+
+    def clear(self):
+        dict.clear(self)
+        self.__changed(None)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.__changed(None)
+
+    def pop(self, key, *args):
+        if key in self:
+            self.__changed(key)
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self.__changed(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self.__changed(key)
+        return dict.setdefault(self, key, default)
+
+    def __changed(self, key):
+        """Drops the values cached for the old tags and records the change
+        of `key`, None meaning all of them.
+        """
 
         pop = self.__dict__.pop
         pop("album_key", None)
         pop("sort_key", None)
+        pop("column_sort_keys", None)
+
+        serial = next(_change_serials)
+        changes = self.__dict__.get("tag_changes")
+        if key is None:
+            # a single serial instead of a dict per song, after all tags
+            # got filled in on load
+            changes = serial
+        elif isinstance(changes, dict):
+            changes[key] = serial
+        elif changes is None:
+            changes = {key: serial}
+        else:
+            changes = {None: changes, key: serial}
+        self.__dict__["tag_changes"] = changes
+
+    def get_tag_changes(self):
+        """Returns a dict mapping changed tags to the serial of their last
+        change (see `get_change_serial()`), with None standing for all
+        tags. None if the song didn't change since it got loaded from
+        the library.
+        """
+
+        changes = self.__dict__.get("tag_changes")
+        if isinstance(changes, int):
+            return {None: changes}
+        return changes
 
     @property
     def key(self):
@@ -231,10 +304,13 @@ class AudioFile(dict, ImageContainer):
     def __ne__(self, other):
         return self is not other
 
-    def reload(self):
+    def reload(self, loaded=None):
         """Reload an audio file from disk. If reloading fails nothing will
         change.
 
+        If `loaded` is given, it is used as the freshly loaded file instead
+        of loading it again, e.g. if it was loaded in another process.
+
         Raises:
             AudioFileError: if the file fails to load
         """
@@ -248,7 +324,10 @@ class AudioFile(dict, ImageContainer):
         self.clear()
         self["~filename"] = fn
         try:
-            self.__init__(fn)
+            if loaded is None:
+                self.__init__(fn)
+            else:
+                self.update(loaded)
         except AudioFileError:
             self.update(backup)
             raise
@@ -906,6 +985,9 @@ class AudioFile(dict, ImageContainer):
         except OSError:
             self["~#mtime"] = 0
 
+        # no need to remember each tag of a new song
+        self.__changed(None)
+
     def to_dump(self):
         """A string of 'key=value' lines, similar to vorbiscomment output.
 
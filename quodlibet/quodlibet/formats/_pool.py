@@ -0,0 +1,175 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Loading many files in worker processes.
+
+The workers send back serialized songs in batches, which get turned into
+songs again in the main process, so that e.g. a library scan only has to
+merge them into the library on the main loop.
+
+The workers only import what is needed for loading files and don't
+initialize translations or Gtk.
+"""
+
+import multiprocessing
+from concurrent import futures
+from concurrent.futures.process import BrokenProcessPool
+
+from quodlibet import config
+from quodlibet import util
+from quodlibet.util.dprint import print_d, print_w
+from ._misc import init, MusicFile
+from ._serialize import load_audio_files, dump_audio_files, \
+    SerializationError
+
+
+BATCH_SIZE = 50
+"""Number of files a worker loads before sending the songs back"""
+
+MIN_FILES = BATCH_SIZE * 2
+"""Below this number of files starting the workers isn't worth it"""
+
+WAIT_TIMEOUT = 0.015
+"""Seconds to wait for a batch before giving control back"""
+
+CONFIG_SECTIONS = ["editing"]
+"""Config sections which influence loading files"""
+
+
+def _get_config_values():
+    values = []
+    for section in CONFIG_SECTIONS:
+        for option in config.options(section):
+            values.append((section, option, config.get(section, option)))
+    return values
+
+
+def _init_worker(config_values):
+    config.init_defaults()
+    for section, option, value in config_values:
+        config.set(section, option, value)
+    init()
+
+
+def _load_batch(filenames):
+    """Runs in a worker process.
+
+    Returns a list of flags for which files could be loaded and the loaded
+    songs serialized.
+    """
+
+    songs = []
+    loaded = []
+    for filename in filenames:
+        try:
+            song = MusicFile(filename)
+        except Exception:
+            util.print_exc()
+            song = None
+        loaded.append(song is not None)
+        if song is not None:
+            songs.append(song)
+    return loaded, (
+        dump_audio_files(songs, legacy=False) if songs else b"")
+
+
+class LoaderPool(object):
+    """A pool of worker processes loading files.
+
+    Call shutdown() if no longer needed.
+    """
+
+    def __init__(self, workers):
+        # forking a process with threads and GLib state isn't safe
+        context = multiprocessing.get_context("spawn")
+        self._executor = futures.ProcessPoolExecutor(
+            workers, mp_context=context, initializer=_init_worker,
+            initargs=(_get_config_values(),))
+        self.workers = workers
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def load(self, filenames, batch_size=BATCH_SIZE):
+        """Loads all files in batches.
+
+        Yields a list of (filename, song) tuples for each finished batch,
+        where song is None in case the file couldn't be loaded, and None
+        every `WAIT_TIMEOUT` seconds while waiting, so this can be used
+        in a copool.
+
+        Raises:
+            EnvironmentError: in case the workers failed
+        """
+
+        batches = [filenames[i:i + batch_size]
+                   for i in range(0, len(filenames), batch_size)]
+        batches.reverse()
+        # only keep a few batches queued, so pausing the scan pauses the
+        # workers soon after
+        max_pending = self.workers * 2
+
+        pending = {}
+        try:
+            while batches or pending:
+                while batches and len(pending) < max_pending:
+                    batch = batches.pop()
+                    try:
+                        future = self._executor.submit(_load_batch, batch)
+                    except BrokenProcessPool as e:
+                        raise EnvironmentError(e)
+                    pending[future] = batch
+
+                done, not_done = futures.wait(
+                    pending, timeout=WAIT_TIMEOUT,
+                    return_when=futures.FIRST_COMPLETED)
+                if not done:
+                    yield None
+                    continue
+
+                for future in done:
+                    batch = pending.pop(future)
+                    yield self._get_result(future, batch)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def _get_result(self, future, batch):
+        try:
+            loaded, data = future.result()
+        except BrokenProcessPool as e:
+            raise EnvironmentError(e)
+
+        songs = []
+        if data:
+            try:
+                songs = load_audio_files(data)
+            except SerializationError:
+                util.print_exc()
+        if len(songs) != sum(loaded):
+            print_w("Loading a batch of %d files failed" % len(batch))
+            return [(filename, None) for filename in batch]
+
+        songs.reverse()
+        return [(filename, songs.pop() if ok else None)
+                for filename, ok in zip(batch, loaded)]
+
+
+def get_pool(workers, num_files):
+    """Returns a `LoaderPool` for loading `num_files` files, or None if
+    files should be loaded in the main process.
+    """
+
+    if workers <= 0 or num_files < MIN_FILES:
+        return None
+
+    try:
+        pool = LoaderPool(workers)
+    except (EnvironmentError, ValueError, ImportError,
+            NotImplementedError) as e:
+        print_w("Couldn't start loader processes: %s" % e)
+        return None
+    print_d("Loading %d files in %d processes" % (num_files, workers))
+    return pool
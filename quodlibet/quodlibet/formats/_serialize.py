@@ -5,9 +5,22 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
-"""Code for serializing AudioFile instances"""
+"""Code for serializing AudioFile instances
 
+There are two formats:
+
+* The legacy one, a protocol 2 pickle of the AudioFile list with py2
+  compatible key and value types. Loading it needs a type conversion pass
+  and a class swap for each item.
+* The current one, a header containing a version followed by a protocol 4
+  pickle of the class names and plain dicts with shared keys, which only
+  contains built-in types and needs no conversion.
+"""
+
+import importlib
 import pickle
+import struct
+
 from senf import bytes2fsn, fsn2bytes
 
 from quodlibet.util.picklehelper import pickle_loads, pickle_dumps
@@ -15,10 +28,26 @@ from quodlibet.util import is_windows
 from ._audio import AudioFile
 
 
+FORMAT_VERSION = 2
+"""Version of the current format"""
+
+_MAGIC = b"QLAF"
+_HEADER = struct.Struct("<4sH")
+
+_MODULES = ("quodlibet", "tests")
+"""Top level packages classes of serialized items can be imported from"""
+
+
 class SerializationError(Exception):
     pass
 
 
+def is_legacy_data(data):
+    """If `data` (or the start of it) isn't in the current format"""
+
+    return not data.startswith(_MAGIC)
+
+
 def _py2_to_py3(items):
     for i in items:
         try:
@@ -76,6 +105,83 @@ def _py3_to_py2(items):
     return new_list
 
 
+def _load_current(data):
+    try:
+        magic, version = _HEADER.unpack_from(data)
+    except struct.error as e:
+        raise SerializationError(e)
+    if version != FORMAT_VERSION:
+        raise SerializationError("unknown format version %d" % version)
+
+    def lookup_func(base, module, name):
+        raise pickle.UnpicklingError("unexpected class %s.%s" % (
+            module, name))
+
+    try:
+        type_names, records = pickle_loads(
+            data[_HEADER.size:], lookup_func)
+    except pickle.UnpicklingError as e:
+        raise SerializationError(e)
+
+    types = []
+    for module, name in type_names:
+        if str(module).split(".")[0] not in _MODULES:
+            raise SerializationError(
+                "unexpected class %s.%s" % (module, name))
+        try:
+            cls = getattr(importlib.import_module(module), name)
+        except (ImportError, AttributeError):
+            cls = None
+        if cls is not None and not (
+                isinstance(cls, type) and issubclass(cls, AudioFile)):
+            raise SerializationError(
+                "%s.%s is not an AudioFile" % (module, name))
+        types.append(cls)
+
+    items = []
+    new = dict.__new__
+    update = dict.update
+    append = items.append
+    try:
+        for index, values in records:
+            cls = types[index]
+            if cls is None:
+                continue
+            item = new(cls)
+            update(item, values)
+            append(item)
+    except (TypeError, ValueError, IndexError) as e:
+        raise SerializationError(e)
+
+    if records and not items:
+        raise SerializationError(
+            "all class lookups failed. something is wrong")
+
+    return items
+
+
+def _dump_current(item_list):
+    type_names = []
+    type_indices = {}
+    keys = {}
+    records = []
+    for item in item_list:
+        cls = type(item)
+        index = type_indices.get(cls)
+        if index is None:
+            index = type_indices[cls] = len(type_names)
+            type_names.append((cls.__module__, cls.__name__))
+        # the same key object in all items, so it gets stored only once
+        records.append(
+            (index, {keys.setdefault(k, k): v for k, v in item.items()}))
+
+    try:
+        data = pickle.dumps((type_names, records), 4)
+    except Exception as e:
+        raise SerializationError(e)
+    return _HEADER.pack(_MAGIC, FORMAT_VERSION) + data
+
+
 def load_audio_files(data, process=True):
     """unpickles the item list and if some class isn't found unpickle
     as a dict and filter them out afterwards.
@@ -83,16 +189,23 @@ def load_audio_files(data, process=True):
     In case everything gets filtered out will raise SerializationError
     (because then likely something larger went wrong)
 
+    Data in the current format gets detected automatically and doesn't
+    need any processing.
+
     Args:
         data (bytes)
-        process (bool): if the dict key/value types should be converted,
-            either to be usable from py3 or to convert to newer types
+        process (bool): if the dict key/value types of legacy data should
+            be converted, either to be usable from py3 or to convert to
+            newer types
     Returns:
         List[AudioFile]
     Raises:
         SerializationError
     """
 
+    if not is_legacy_data(data):
+        return _load_current(data)
+
     dummy = type("dummy", (dict,), {})
     error_occured = []
     temp_type_cache = {}
@@ -104,7 +217,7 @@ def load_audio_files(data, process=True):
             error_occured.append(True)
             return dummy
 
-        if module.split(".")[0] not in ("quodlibet", "tests"):
+        if module.split(".")[0] not in _MODULES:
             return real_type
 
         # return a straight dict subclass so that unpickle doesn't call
@@ -140,9 +253,15 @@ def load_audio_files(data, process=True):
     return items
 
 
-def dump_audio_files(item_list, process=True):
+def dump_audio_files(item_list, process=True, legacy=True):
     """Pickles a list of AudioFiles
 
+    Args:
+        item_list (List[AudioFile])
+        process (bool): if the dict key/value types should be converted
+            so that Python 2 can load them, legacy format only
+        legacy (bool): if the legacy format should be used, which older
+            versions can load, instead of the current one
     Returns:
         bytes
     Raises:
@@ -152,6 +271,9 @@ def dump_audio_files(item_list, process=True):
     assert isinstance(item_list, list)
     assert not item_list or isinstance(item_list[0], AudioFile)
 
+    if not legacy:
+        return _dump_current(item_list)
+
     if process:
         item_list = _py3_to_py2(item_list)
 
@@ -17,22 +17,54 @@ import time
 
 from quodlibet import print_d
 
-from quodlibet.library.libraries import SongFileLibrary, SongLibrary
+from quodlibet.library.libraries import SongFileLibrary, SongLibrary, \
+    JournalingSongFileLibrary
 from quodlibet.library.librarians import SongLibrarian
 from quodlibet.util.path import mtime
 
 
-def init(cache_fn=None):
+def init(cache_fn=None, journal=False, query_index=False,
+         scan_workers=0, dir_cache=False, walk_workers=0,
+         cover_index=False):
     """Set up the library and return the main one.
 
     Return a main library, and set a librarian for
     all future SongLibraries.
+
+    If `journal` is True the main library only writes changed songs
+    to disk on save, see `JournalingSongFileLibrary`.
+
+    If `query_index` is True the main library keeps an index for
+    speeding up queries, see `SongLibrary.enable_query_index()`.
+
+    `scan_workers` is the number of processes used for loading files
+    while scanning, see `SongFileLibrary.scan_workers`.
+
+    If `dir_cache` is True unchanged directories get skipped when
+    rebuilding, see `FileLibrary.enable_dir_cache()`.
+
+    `walk_workers` is the number of threads used for listing directories
+    while scanning, see `FileLibrary.walk_workers`.
+
+    If `cover_index` is True the images in song directories get indexed
+    while scanning, see `FileLibrary.enable_cover_index()`.
     """
 
     SongFileLibrary.librarian = SongLibrary.librarian = SongLibrarian()
-    library = SongFileLibrary("main")
+    if journal:
+        library = JournalingSongFileLibrary("main")
+    else:
+        library = SongFileLibrary("main")
     if cache_fn:
         library.load(cache_fn)
+    if query_index:
+        library.enable_query_index()
+    library.scan_workers = scan_workers
+    library.walk_workers = walk_workers
+    if dir_cache:
+        library.enable_dir_cache()
+    if cover_index:
+        library.enable_cover_index()
     return library
 
 
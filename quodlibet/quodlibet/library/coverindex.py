@@ -0,0 +1,161 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Remembering the cover image candidates of album directories."""
+
+import os
+import time
+
+from quodlibet import util
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.path import mkdir
+from quodlibet.util.picklehelper import pickle_dumps, pickle_loads, \
+    PickleError
+from quodlibet.library.dircache import get_dir_mtime, RACY_SECONDS
+
+
+COVER_SUBDIRS = frozenset(["scan", "scans", "images", "covers", "artwork"])
+"""Sub directories which get searched for images as well (lower case)"""
+
+COVER_EXTS = frozenset(["jpg", "jpeg", "png", "gif"])
+"""Image file extensions (lower case)"""
+
+
+def get_ext(s):
+    return os.path.splitext(s)[1].lstrip('.')
+
+
+def list_cover_candidates(base):
+    """Returns the images in `base` and its cover sub directories.
+
+    Returns:
+        Tuple[List[Tuple[fsnative or None, fsnative]],
+              List[Tuple[fsnative, float or None]]]:
+            (sub directory or None, image file name) for all images and
+            the sub directories with their mtime
+    """
+
+    try:
+        entries = os.listdir(base)
+    except EnvironmentError:
+        print_w("Can't list album art directory %s" % base)
+        return [], []
+
+    fns = []
+    subdirs = []
+    for entry in entries:
+        lentry = entry.lower()
+        if get_ext(lentry) in COVER_EXTS:
+            fns.append((None, entry))
+        if lentry in COVER_SUBDIRS:
+            subdir = os.path.join(base, entry)
+            subdirs.append((entry, get_dir_mtime(subdir)))
+            sub_entries = []
+            try:
+                sub_entries = os.listdir(subdir)
+            except EnvironmentError:
+                pass
+            for sub_entry in sub_entries:
+                lsub_entry = sub_entry.lower()
+                if get_ext(lsub_entry) in COVER_EXTS:
+                    fns.append((entry, sub_entry))
+    return fns, subdirs
+
+
+class CoverIndex(object):
+    """Remembers the cover image candidates of directories together with
+    the mtimes of the directory and its cover sub directories, so finding
+    them again only needs a stat() call as long as nothing has changed.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        # path -> (mtime, tuple of (sub directory, mtime),
+        #          tuple of (sub directory or None, file name))
+        self._dirs = {}
+        self.dirty = False
+
+    def __len__(self):
+        return len(self._dirs)
+
+    def load(self, filename):
+        """Loads the index from a file, or starts empty if that fails"""
+
+        self._dirs = {}
+        self.dirty = False
+        try:
+            with open(filename, "rb") as h:
+                data = pickle_loads(h.read())
+        except EnvironmentError:
+            return
+        except PickleError:
+            util.print_exc()
+            return
+
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            print_w("Ignoring cover index %r" % filename)
+            return
+        self._dirs = data["dirs"]
+        print_d("Loaded covers of %d directories from %r" % (
+            len(self._dirs), filename))
+
+    def save(self, filename):
+        data = pickle_dumps({"version": self.VERSION, "dirs": self._dirs}, 2)
+        try:
+            mkdir(os.path.dirname(filename))
+            with atomic_save(filename, "wb") as h:
+                h.write(data)
+        except EnvironmentError:
+            print_w("Couldn't save cover index to %r" % filename)
+        else:
+            self.dirty = False
+
+    def clear(self):
+        self._dirs.clear()
+        self.dirty = True
+
+    def invalidate(self, path):
+        if self._dirs.pop(path, None) is not None:
+            self.dirty = True
+
+    def get(self, path):
+        """Returns the candidates as returned by list_cover_candidates()
+        or None if the directory isn't known or has changed.
+        """
+
+        entry = self._dirs.get(path)
+        if entry is None:
+            return None
+
+        mtime, subdirs, fns = entry
+        if get_dir_mtime(path) != mtime:
+            return None
+        for sub, sub_mtime in subdirs:
+            if get_dir_mtime(os.path.join(path, sub)) != sub_mtime:
+                return None
+        return list(fns)
+
+    def update(self, path, now=None):
+        """Lists the directory in case it has changed and returns its
+        candidates, see get()
+        """
+
+        fns = self.get(path)
+        if fns is not None:
+            return fns
+
+        if now is None:
+            now = time.time()
+        mtime = get_dir_mtime(path)
+        fns, subdirs = list_cover_candidates(path)
+        mtimes = [mtime] + [m for s, m in subdirs]
+        if None in mtimes or max(mtimes) > now - RACY_SECONDS:
+            self.invalidate(path)
+        else:
+            self._dirs[path] = (mtime, tuple(subdirs), tuple(fns))
+            self.dirty = True
+        return fns
@@ -0,0 +1,184 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Remembering which directories have changed between library scans."""
+
+import os
+import threading
+import time
+
+from quodlibet import util
+from quodlibet.util.atomic import atomic_save
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.path import mkdir, scan_dir, walk_dirs
+from quodlibet.util.picklehelper import pickle_dumps, pickle_loads, \
+    PickleError
+
+
+RACY_SECONDS = 2.0
+"""Directories modified this close to a check might get modified again
+without their mtime changing (coarse timestamps), so they don't get
+remembered"""
+
+
+def get_dir_mtime(path):
+    """Returns the mtime of the directory or None if it doesn't exist"""
+
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class DirectoryCache(object):
+    """Remembers the mtime and the sub directories of directories.
+
+    Adding, removing or renaming entries changes the mtime of a directory,
+    so as long as it is the same the directory doesn't need to be listed
+    again and files in it don't need to be checked for being added or
+    removed. Note that changing a file doesn't change the mtime of the
+    directory containing it.
+
+    New entries are pending until commit() is called, so that a scan which
+    got stopped doesn't leave directories behind which look up to date.
+
+    walk() lists directories in worker threads, so all access is guarded
+    by a lock.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        # path -> (mtime, tuple of sub directory names or None)
+        self._dirs = {}
+        self._pending = {}
+        self._lock = threading.RLock()
+        self.dirty = False
+
+    def __len__(self):
+        with self._lock:
+            return len(self._dirs)
+
+    def load(self, filename):
+        """Loads the cache from a file, or starts empty if that fails"""
+
+        dirs = {}
+        try:
+            with open(filename, "rb") as h:
+                data = pickle_loads(h.read())
+        except EnvironmentError:
+            data = None
+        except PickleError:
+            util.print_exc()
+            data = None
+
+        if data is not None:
+            if not isinstance(data, dict) or \
+                    data.get("version") != self.VERSION:
+                print_w("Ignoring directory cache %r" % filename)
+            else:
+                dirs = data["dirs"]
+                print_d("Loaded %d directories from %r" % (
+                    len(dirs), filename))
+
+        with self._lock:
+            self._dirs = dirs
+            self.dirty = False
+
+    def save(self, filename):
+        with self._lock:
+            data = pickle_dumps(
+                {"version": self.VERSION, "dirs": self._dirs}, 2)
+        try:
+            mkdir(os.path.dirname(filename))
+            with atomic_save(filename, "wb") as h:
+                h.write(data)
+        except EnvironmentError:
+            print_w("Couldn't save directory cache to %r" % filename)
+        else:
+            self.dirty = False
+
+    def clear(self):
+        with self._lock:
+            self._dirs.clear()
+            self._pending.clear()
+            self.dirty = True
+
+    def commit(self):
+        """Remembers all directories walked or checked since the last
+        commit() or discard()"""
+
+        with self._lock:
+            if self._pending:
+                self._dirs.update(self._pending)
+                self._pending.clear()
+                self.dirty = True
+
+    def discard(self):
+        with self._lock:
+            self._pending.clear()
+
+    def invalidate(self, path):
+        """Forget about the directory, so it gets checked next time"""
+
+        with self._lock:
+            self._pending.pop(path, None)
+            if self._dirs.pop(path, None) is not None:
+                self.dirty = True
+
+    def is_unchanged(self, path, mtime):
+        """If the directory was remembered with the given mtime"""
+
+        with self._lock:
+            entry = self._dirs.get(path)
+        return entry is not None and entry[0] == mtime
+
+    def set_checked(self, path, mtime, now=None):
+        """Remember that all files in the directory were checked at the
+        given mtime of the directory.
+        """
+
+        if now is None:
+            now = time.time()
+        with self._lock:
+            entry = self._dirs.get(path)
+            if mtime is None or mtime > now - RACY_SECONDS:
+                self.invalidate(path)
+            elif entry is None or entry[0] != mtime:
+                # the directory needs to be listed again by walk()
+                self._pending.setdefault(path, (mtime, None))
+
+    def _scan_dir(self, path, now):
+        mtime = get_dir_mtime(path)
+        if mtime is None:
+            self.invalidate(path)
+            raise OSError("Can't access %r" % path)
+
+        with self._lock:
+            entry = self._dirs.get(path)
+        if entry is not None and entry[0] == mtime and entry[1] is not None:
+            return list(entry[1]), [], []
+
+        try:
+            dnames, fnames, links = scan_dir(path)
+        except OSError:
+            self.invalidate(path)
+            raise
+
+        if mtime > now - RACY_SECONDS:
+            self.invalidate(path)
+        else:
+            with self._lock:
+                self._pending[path] = (mtime, tuple(dnames))
+        return dnames, fnames, links
+
+    def walk(self, root, workers=0):
+        """Like walk_dirs(), but yields no files for directories which
+        haven't changed since the last walk.
+        """
+
+        now = time.time()
+        return walk_dirs(
+            root, workers, lambda path: self._scan_dir(path, now))
@@ -15,24 +15,31 @@ least useful but most content-agnostic.
 
 import os
 import shutil
+import struct
+import threading
 import time
 
-from gi.repository import GObject
+from gi.repository import GObject, GLib
 from senf import fsn2text, fsnative
 
 from quodlibet import _
 from quodlibet.formats import MusicFile, AudioFileError, load_audio_files, \
-    dump_audio_files, SerializationError
-from quodlibet.query import Query
+    dump_audio_files, SerializationError, get_pool, is_legacy_data
+from quodlibet.query import Query, TagIndex
 from quodlibet.qltk.notif import Task
 from quodlibet.util.atomic import atomic_save
+from quodlibet.util.picklehelper import pickle_dumps, pickle_loads, \
+    PickleError
 from quodlibet.util.collection import Album
 from quodlibet.util.collections import DictMixin
 from quodlibet import util
 from quodlibet import formats
 from quodlibet.util.dprint import print_d, print_w
 from quodlibet.util.path import unexpand, mkdir, normalize_path, ishidden, \
-    ismount
+    mtime, walk_dirs
+from quodlibet.library.coverindex import CoverIndex
+from quodlibet.library.dircache import DirectoryCache, get_dir_mtime
+from quodlibet.library.mounts import MountProber, POLL_INTERVAL
 
 
 class Library(GObject.GObject, DictMixin):
@@ -143,6 +150,13 @@ class Library(GObject.GObject, DictMixin):
 
         return list(self.values())
 
+    def _get_content_item(self, key):
+        """Returns the item for `key` including hidden ones or None
+           (see get_content)
+        """
+
+        return self._contents.get(key)
+
     def keys(self):
         return self._contents.keys()
 
@@ -233,6 +247,31 @@ def _load_items(filename):
     return items
 
 
+def _is_legacy_file(filename):
+    """If the library file exists and is in the legacy format"""
+
+    try:
+        with open(filename, "rb") as fp:
+            return is_legacy_data(fp.read(16))
+    except EnvironmentError:
+        return False
+
+
+def _backup_legacy_file(filename):
+    """Keeps a copy of a library file in the legacy format before it gets
+    replaced, so older versions can still be used with it. Only done once.
+    """
+
+    backup = filename + ".legacy"
+    if os.path.exists(backup) or not _is_legacy_file(filename):
+        return
+    print_d("Keeping legacy library file as %r." % backup)
+    try:
+        shutil.copy(filename, backup)
+    except EnvironmentError:
+        util.print_exc()
+
+
 class PicklingMixin(object):
     """A mixin to provide persistence of a library by pickling to disk"""
 
@@ -253,6 +292,10 @@ class PicklingMixin(object):
         # sure that non-mounted items are masked
         self._load_init(items)
 
+        if items and _is_legacy_file(filename):
+            # so it gets written in the current format with the next save
+            self.dirty = True
+
         print_d("Done loading contents of %r." % filename, self)
 
     def save(self, filename=None):
@@ -266,8 +309,10 @@ class PicklingMixin(object):
         try:
             dirname = os.path.dirname(filename)
             mkdir(dirname)
+            _backup_legacy_file(filename)
             with atomic_save(filename, "wb") as fileobj:
-                fileobj.write(dump_audio_files(self.get_content()))
+                fileobj.write(dump_audio_files(
+                    self.get_content(), legacy=False))
         except SerializationError:
             # Can happen when we try to pickle while the library is being
             # modified, like in the periodic 15min save.
@@ -279,6 +324,346 @@ class PicklingMixin(object):
             self.dirty = False
 
 
+_JOURNAL_MAGIC = b"QLJ1"
+_JOURNAL_HEADER = struct.Struct("<4sII")
+
+
+def _dump_journal_record(items, keys):
+    """Serializes one journal record.
+
+    Args:
+        items (List[AudioFile]): items which were added or changed
+        keys (List[fsnative]): keys of items which were removed
+    Returns:
+        bytes
+    Raises:
+        SerializationError
+    """
+
+    items_data = dump_audio_files(items, legacy=False)
+    try:
+        keys_data = pickle_dumps(keys, 2)
+    except PickleError as e:
+        raise SerializationError(e)
+    header = _JOURNAL_HEADER.pack(
+        _JOURNAL_MAGIC, len(items_data), len(keys_data))
+    return header + items_data + keys_data
+
+
+def _iter_journal_records(data):
+    """Yields (items, removed_keys) for each record in `data`.
+
+    Raises:
+        SerializationError: in case a record is invalid or incomplete
+            (e.g. because of a crash while appending)
+    """
+
+    offset = 0
+    size = _JOURNAL_HEADER.size
+    while offset < len(data):
+        if offset + size > len(data):
+            raise SerializationError("incomplete journal record")
+        magic, items_len, keys_len = _JOURNAL_HEADER.unpack_from(data, offset)
+        if magic != _JOURNAL_MAGIC:
+            raise SerializationError("invalid journal record")
+        start = offset + size
+        end = start + items_len + keys_len
+        if end > len(data):
+            raise SerializationError("incomplete journal record")
+        items = load_audio_files(data[start:start + items_len])
+        try:
+            keys = pickle_loads(data[start + items_len:end])
+        except PickleError as e:
+            raise SerializationError(e)
+        yield items, keys
+        offset = end
+
+
+def _replay_journal(items, data):
+    """Applies the journal records in `data` to the list of items.
+
+    Stops at the first invalid record.
+
+    Returns:
+        Tuple[List[AudioFile], bool]: the resulting items and whether
+            the whole journal could be applied
+    """
+
+    contents = {item.key: item for item in items}
+    complete = True
+    try:
+        for changed, removed in _iter_journal_records(data):
+            for key in removed:
+                contents.pop(key, None)
+            for item in changed:
+                contents[item.key] = item
+    except SerializationError:
+        util.print_exc()
+        complete = False
+    return list(contents.values()), complete
+
+
+class JournalingMixin(PicklingMixin):
+    """A mixin to provide persistence of a library by keeping a pickled
+    snapshot and appending only added, changed and removed items to a
+    journal file next to it.
+
+    The snapshot has the same format as the one written by `PicklingMixin`,
+    so an existing library file gets picked up as is. Once the journal
+    grows too large compared to the snapshot it gets merged into a new
+    snapshot in a background thread.
+    """
+
+    journal_suffix = ".journal"
+
+    compact_ratio = 0.25
+    """Compact once the journal exceeds this fraction of the snapshot size"""
+
+    compact_min_size = 1024 * 1024
+    """Don't compact journals smaller than this (in bytes)"""
+
+    def __init__(self, *args, **kwargs):
+        # items which need to be written to the journal on the next save
+        self._journal_dirty = set()
+        # item -> key, for all items contained in snapshot + journal
+        self._journal_keys = {}
+        # protects the journal and snapshot file against the compaction
+        # thread
+        self._journal_lock = threading.Lock()
+        # gets increased on each full save so compaction can detect
+        # that its result is outdated
+        self._journal_generation = 0
+        self._compacting = False
+        super(JournalingMixin, self).__init__(*args, **kwargs)
+
+    def emit(self, signal_name, *args):
+        if signal_name in ("added", "changed", "removed"):
+            self._journal_dirty.update(args[0])
+        return super(JournalingMixin, self).emit(signal_name, *args)
+
+    def _get_journal_filename(self, filename):
+        return filename + fsnative(self.journal_suffix)
+
+    def load(self, filename):
+        """Load a library from a snapshot file and replay the journal
+        written next to it.
+
+        Loading does not cause added, changed, or removed signals.
+        """
+
+        self.filename = filename
+        print_d("Loading contents of %r." % filename, self)
+
+        items = _load_items(filename)
+        journal = self._get_journal_filename(filename)
+        try:
+            with open(journal, "rb") as fp:
+                data = fp.read()
+        except EnvironmentError:
+            data = b""
+
+        complete = True
+        if data:
+            print_d("Replaying %d bytes of journal." % len(data), self)
+            items, complete = _replay_journal(items, data)
+            if not complete:
+                try:
+                    shutil.copy(journal, journal + ".not-valid")
+                except EnvironmentError:
+                    util.print_exc()
+
+        self._load_init(items)
+        self._journal_keys = {item: item.key for item in items}
+        self._journal_dirty.clear()
+
+        if not complete:
+            # new records can't be appended after a broken one, so
+            # replace everything with what we could recover
+            self._save_snapshot(filename)
+        elif self._needs_compaction(filename):
+            self.compact(background=True)
+
+        print_d("Done loading contents of %r." % filename, self)
+
+    def save(self, filename=None):
+        """Save the library to the given filename, or the default if `None`.
+
+        Saving to the default file only appends the items changed since the
+        last save to the journal, in case a snapshot exists.
+        """
+
+        if filename is None:
+            filename = self.filename
+
+        if filename != self.filename:
+            super(JournalingMixin, self).save(filename)
+            return
+
+        if not os.path.exists(filename) or not self._journal_keys:
+            self._save_snapshot(filename)
+            return
+
+        self._append_journal(filename)
+
+    def _save_snapshot(self, filename):
+        journal = self._get_journal_filename(filename)
+        with self._journal_lock:
+            self._journal_generation += 1
+            # so we can tell if saving failed
+            self.dirty = True
+            super(JournalingMixin, self).save(filename)
+            if self.dirty:
+                return
+            try:
+                os.remove(journal)
+            except EnvironmentError:
+                pass
+            self._journal_keys = {
+                item: item.key for item in self.get_content()}
+            self._journal_dirty.clear()
+
+    def _append_journal(self, filename):
+        get_item = self._get_content_item
+        known = self._journal_keys
+        changed, removed, keys = [], [], {}
+
+        for item in self._journal_dirty:
+            old_key = known.get(item)
+            key = item.key
+            if get_item(key) is item:
+                changed.append(item)
+                keys[item] = key
+                if old_key is not None and old_key != key and \
+                        get_item(old_key) is None:
+                    removed.append(old_key)
+            elif old_key is not None:
+                keys[item] = None
+                if get_item(old_key) is None:
+                    removed.append(old_key)
+
+        if not changed and not removed:
+            self._journal_dirty.clear()
+            self.dirty = False
+            return
+
+        print_d("Journaling %d changed and %d removed items to %r." % (
+            len(changed), len(removed), filename), self)
+
+        journal = self._get_journal_filename(filename)
+        try:
+            record = _dump_journal_record(changed, removed)
+            with self._journal_lock:
+                with open(journal, "ab") as fileobj:
+                    fileobj.write(record)
+                    fileobj.flush()
+                    os.fsync(fileobj.fileno())
+        except SerializationError:
+            util.print_exc()
+            return
+        except EnvironmentError:
+            print_w("Couldn't save library journal to path: %r" % journal)
+            return
+
+        for item, key in keys.items():
+            if key is None:
+                known.pop(item, None)
+            else:
+                known[item] = key
+        self._journal_dirty.clear()
+        self.dirty = False
+
+        if self._needs_compaction(filename):
+            self.compact(background=True)
+
+    def _needs_compaction(self, filename):
+        journal = self._get_journal_filename(filename)
+        try:
+            journal_size = os.path.getsize(journal)
+        except EnvironmentError:
+            return False
+        try:
+            snapshot_size = os.path.getsize(filename)
+        except EnvironmentError:
+            snapshot_size = 0
+        limit = max(self.compact_min_size, snapshot_size * self.compact_ratio)
+        return journal_size > limit
+
+    def compact(self, background=False):
+        """Merge the journal into a new snapshot.
+
+        This only works on the files and doesn't touch the library content,
+        so it is safe to do while the library gets modified.
+        """
+
+        if self.filename is None or self._compacting:
+            return
+
+        self._compacting = True
+        if background:
+            thread = threading.Thread(
+                target=self._compact, args=(self.filename,))
+            thread.daemon = True
+            thread.start()
+        else:
+            self._compact(self.filename)
+
+    def _compact(self, filename):
+        try:
+            self.__compact(filename)
+        finally:
+            self._compacting = False
+
+    def __compact(self, filename):
+        journal = self._get_journal_filename(filename)
+
+        with self._journal_lock:
+            generation = self._journal_generation
+            try:
+                with open(journal, "rb") as fp:
+                    data = fp.read()
+            except EnvironmentError:
+                return
+
+        print_d("Compacting %d bytes of journal into %r." % (
+            len(data), filename), self)
+
+        try:
+            try:
+                with open(filename, "rb") as fp:
+                    items = load_audio_files(fp.read())
+            except EnvironmentError:
+                items = []
+            items, complete = _replay_journal(items, data)
+            if not complete:
+                return
+            items.sort(key=lambda item: item.key)
+            snapshot = dump_audio_files(items, legacy=False)
+        except SerializationError:
+            # don't replace a snapshot we couldn't read
+            util.print_exc()
+            return
+
+        with self._journal_lock:
+            if generation != self._journal_generation:
+                print_d("Library saved while compacting, aborting.", self)
+                return
+            try:
+                with open(journal, "rb") as fp:
+                    tail = fp.read()[len(data):]
+                _backup_legacy_file(filename)
+                with atomic_save(filename, "wb") as fileobj:
+                    fileobj.write(snapshot)
+                if tail:
+                    with atomic_save(journal, "wb") as fileobj:
+                        fileobj.write(tail)
+                else:
+                    os.remove(journal)
+            except EnvironmentError:
+                print_w("Couldn't compact library journal: %r" % journal)
+
+        print_d("Done compacting %r." % filename, self)
+
+
 class PicklingLibrary(Library, PicklingMixin):
     """A library that pickles its contents to disk"""
     def __init__(self, name=None):
@@ -376,11 +761,16 @@ class AlbumLibrary(Library):
         changed = set()
         removed = set()
         to_add = []
+        # album -> songs of it which only changed tags
+        changed_songs = {}
+        regrouped = set()
         for song in items:
             # in case the key hasn't changed
             key = song.album_key
             if key in self._contents and song in self._contents[key].songs:
-                changed.add(self._contents[key])
+                album = self._contents[key]
+                changed.add(album)
+                changed_songs.setdefault(album, []).append(song)
             else:  # key changed.. look for it in each album
                 to_add.append(song)
                 for key, album in self._contents.items():
@@ -390,11 +780,13 @@ class AlbumLibrary(Library):
                             removed.add(album)
                         else:
                             changed.add(album)
+                            regrouped.add(album)
                         break
 
         # get new albums and changed ones because keys could have changed
         add_changed, new = self.__add(to_add)
         changed |= add_changed
+        regrouped |= add_changed
 
         # check if albums that were empty at some point are still empty
         for album in removed:
@@ -403,7 +795,10 @@ class AlbumLibrary(Library):
                 changed.discard(album)
 
         for album in changed:
-            album.finalize()
+            if album in regrouped:
+                album.finalize()
+            else:
+                album.finalize(changed_songs[album])
 
         if removed:
             self.emit("removed", removed)
@@ -420,6 +815,10 @@ class SongLibrary(PicklingLibrary):
     interface.
     """
 
+    query_index = None
+    """A `TagIndex` used for narrowing down queries, see
+    `enable_query_index()`"""
+
     def __init__(self, *args, **kwargs):
         super(SongLibrary, self).__init__(*args, **kwargs)
 
@@ -431,6 +830,28 @@ class SongLibrary(PicklingLibrary):
         super(SongLibrary, self).destroy()
         if "albums" in self.__dict__:
             self.albums.destroy()
+        if self.query_index is not None:
+            self.query_index.destroy()
+            self.query_index = None
+
+    def enable_query_index(self):
+        """Maintain an index of tag values to speed up queries.
+
+        This trades memory for not having to check every song
+        for many queries. Numeric tags are kept in columns which
+        also speed up sorting.
+        """
+
+        if self.query_index is None:
+            self.query_index = TagIndex(self)
+
+    @property
+    def numeric_columns(self):
+        """The `NumericColumns` of the query index, which can be used for
+        sorting, or None"""
+
+        if self.query_index is not None:
+            return self.query_index.columns
 
     def tag_values(self, tag):
         """Return a set of all values for the given tag."""
@@ -466,11 +887,24 @@ class SongLibrary(PicklingLibrary):
 
         songs = self.values()
         if text != "":
-            songs = list(filter(Query(text, star).search, songs))
+            songs = self.filter_query(Query(text, star))
         return songs
 
+    def filter_query(self, query):
+        """Returns a list of songs matching the query (`Query` or any
+        other query node), in no particular order.
+        """
+
+        songs = None
+        if self.query_index is not None:
+            songs = self.query_index.candidates(query)
+        if songs is None:
+            songs = self.values()
+        return query.filter(songs)
 
-def iter_paths(root, exclude=[], skip_hidden=True):
+
+def iter_paths(root, exclude=[], skip_hidden=True, dir_cache=None,
+               filter_func=None, workers=0):
     """yields paths contained in root (symlinks dereferenced)
 
     Any path starting with any of the path parts included in exclude
@@ -483,6 +917,13 @@ def iter_paths(root, exclude=[], skip_hidden=True):
         exclude (List[fsnative])
         skip_hidden (bool): Ignore files which are hidden or where any
             of the parent directories are hidden.
+        dir_cache (DirectoryCache or None): Skip files in directories
+            which haven't changed since the last walk.
+        filter_func (callable or None): Only yield paths for which it
+            returns True. Gets called before dereferencing, except for
+            symlinks.
+        workers (int): Number of threads listing directories ahead of
+            time, see `walk_dirs()`
     Yields:
         fsnative: absolute dereferenced paths
     """
@@ -500,19 +941,56 @@ def iter_paths(root, exclude=[], skip_hidden=True):
     if skip_hidden and ishidden(root):
         return
 
-    for path, dnames, fnames in os.walk(root):
-        if skip_hidden:
-            dnames[:] = list(filter(
-                lambda d: not ishidden(os.path.join(path, d)), dnames))
+    # Directory symlinks aren't followed, so only root and symlinks to
+    # files need to be dereferenced. Walking the dereferenced root keeps
+    # the directory cache in sync with the paths we yield.
+    real_root = os.path.realpath(root)
+    if dir_cache is not None:
+        walk = dir_cache.walk(real_root, workers)
+    else:
+        walk = walk_dirs(real_root, workers)
+
+    for real_dir, dnames, fnames, links in walk:
+        rel_dir = real_dir[len(real_root):].lstrip(os.sep)
+        path = os.path.join(root, rel_dir) if rel_dir else root
+
+        # everything below would be skipped anyway
+        dnames[:] = [
+            d for d in dnames if not skip(os.path.join(path, d)) and
+            not skip(os.path.join(real_dir, d))]
+
+        # Skipped files might not be skipped next time, and the targets
+        # of symlinks can change without the directory changing, so
+        # list the directory again next time.
+        remember = not links
+
         for filename in fnames:
+            fullfilename = os.path.join(path, filename)
+            if filter_func is not None and not filter_func(fullfilename):
+                continue
+            if skip(fullfilename):
+                remember = False
+                continue
+            real_path = os.path.join(real_dir, filename)
+            if real_path != fullfilename and skip(real_path):
+                remember = False
+                continue
+            yield real_path
+
+        for filename in links:
             fullfilename = os.path.join(path, filename)
             if skip(fullfilename):
                 continue
             fullfilename = os.path.realpath(fullfilename)
             if skip(fullfilename):
                 continue
+            if filter_func is not None and not filter_func(fullfilename):
+                continue
             yield fullfilename
 
+        if dir_cache is not None and not remember:
+            dir_cache.invalidate(real_dir)
+
 
 class FileLibrary(PicklingLibrary):
     """A library containing items on a local(-ish) filesystem.
@@ -521,9 +999,124 @@ class FileLibrary(PicklingLibrary):
     and have a mountpoint attribute.
     """
 
+    walk_workers = 0
+    """Number of threads listing directories in `scan()`, see
+    `quodlibet.util.path.walk_dirs()`"""
+
     def __init__(self, name=None):
         super(FileLibrary, self).__init__(name)
         self._masked = {}
+        self._dir_cache = None
+        self._cover_index = None
+        self._mounts = MountProber()
+        self._poll_id = None
+
+    def destroy(self):
+        if self._poll_id is not None:
+            GLib.source_remove(self._poll_id)
+            self._poll_id = None
+        super(FileLibrary, self).destroy()
+
+    def _start_mount_polling(self):
+        """Checks masked mount points regularly and unmasks them once
+        they are available.
+        """
+
+        if self._poll_id is None and self._masked:
+            self._poll_id = GLib.timeout_add_seconds(
+                POLL_INTERVAL, self._poll_masked)
+
+    def _get_masked_checks(self):
+        """Mount point -> check for probing masked mount points, like
+        in _load_init() accessing an item triggers autofs mounts.
+        """
+
+        checks = {}
+        for point, items in self._masked.items():
+            check = None
+            for item in items.values():
+                check = item.exists
+                break
+            checks[point] = check
+        return checks
+
+    def _poll_masked(self):
+        for point, check in self._get_masked_checks().items():
+            # doesn't wait, results of slow checks get used next time
+            if self._mounts.probe(point, check, timeout=0):
+                self.unmask(point)
+
+        if not self._masked:
+            self._poll_id = None
+            return False
+        return True
+
+    def enable_dir_cache(self):
+        """Remember the mtimes of directories between rebuilds, so files
+        in unchanged directories don't get checked or scanned again.
+
+        Files which get changed in place don't change the mtime of their
+        directory, so they only get noticed by a forced rebuild.
+        """
+
+        if self._dir_cache is None:
+            self._dir_cache = DirectoryCache()
+            if self.filename is not None:
+                self._dir_cache.load(self._get_dir_cache_filename())
+
+    def _get_dir_cache_filename(self):
+        return self.filename + fsnative(u".dirs")
+
+    def _commit_dir_cache(self):
+        dir_cache = self._dir_cache
+        if dir_cache is None:
+            return
+        dir_cache.commit()
+        if dir_cache.dirty and self.filename is not None:
+            dir_cache.save(self._get_dir_cache_filename())
+
+    def enable_cover_index(self):
+        """Keep an index of the images in the directories of all items,
+        updated while scanning and rebuilding, see `cover_index`.
+        """
+
+        if self._cover_index is None:
+            self._cover_index = CoverIndex()
+            if self.filename is not None:
+                self._cover_index.load(self._get_cover_index_filename())
+
+    @property
+    def cover_index(self):
+        """The `CoverIndex` or None if not enabled"""
+
+        return self._cover_index
+
+    def _get_cover_index_filename(self):
+        return self.filename + fsnative(u".covers")
+
+    def _update_cover_index(self, dirnames):
+        """Generator, lists the given directories again in case they have
+        changed and saves the cover index.
+        """
+
+        index = self._cover_index
+        if index is None:
+            return
+        now = time.time()
+        for i, dirname in enumerate(dirnames):
+            index.update(dirname, now)
+            if i % 100 == 0:
+                yield
+        if index.dirty and self.filename is not None:
+            index.save(self._get_cover_index_filename())
+
+    def remove(self, items):
+        items = super(FileLibrary, self).remove(items)
+        if self._dir_cache is not None:
+            # so the next scan adds them again if they are still there
+            for item in items:
+                self._dir_cache.invalidate(os.path.dirname(item.key))
+        return items
 
     def _load_init(self, items):
         """Add many items to the library, check if the
@@ -532,37 +1125,44 @@ class FileLibrary(PicklingLibrary):
         Does not check if items are valid.
         """
 
-        mounts = {}
         contents = self._contents
         masked = self._masked
 
+        items = list(items)
+        checks = {}
         for item in items:
-            mountpoint = item.mountpoint
-
-            if mountpoint not in mounts:
-                is_mounted = ismount(mountpoint)
-
-                # In case mountpoint is mounted through autofs we need to
-                # access a sub path for it to mount
-                # https://github.com/quodlibet/quodlibet/issues/2146
-                if not is_mounted:
-                    item.exists()
-                    is_mounted = ismount(mountpoint)
-
-                mounts[mountpoint] = is_mounted
-                # at least one not mounted, make sure masked has an entry
-                if not is_mounted:
-                    masked.setdefault(mountpoint, {})
+            # In case mountpoint is mounted through autofs we need to
+            # access a sub path for it to mount
+            # https://github.com/quodlibet/quodlibet/issues/2146
+            checks.setdefault(item.mountpoint, item.exists)
+
+        # Dead network storage can block, so only wait a bit and mask
+        # the items in case there is no answer in time.
+        mounts = self._mounts.probe_all(checks)
+        for mountpoint, is_mounted in mounts.items():
+            # at least one not mounted, make sure masked has an entry
+            if not is_mounted:
+                if is_mounted is None:
+                    print_w("Checking %r timed out, masking it for now" %
+                            mountpoint, self)
+                masked.setdefault(mountpoint, {})
 
+        for item in items:
+            mountpoint = item.mountpoint
             if mounts[mountpoint]:
                 contents[item.key] = item
             else:
                 masked[mountpoint][item.key] = item
 
-    def _load_item(self, item, force=False):
+        self._start_mount_polling()
+
+    def _load_item(self, item, force=False, loaded=None):
         """Add an item, or refresh it if it's already in the library.
         No signals will be fired.
         Return a tuple of booleans: (changed, removed)
+
+        `loaded` can be a freshly loaded version of the item, see
+        `_prefetch()`.
         """
         print_d("Loading %r." % item.key, self)
         valid = item.valid()
@@ -585,7 +1185,10 @@ class FileLibrary(PicklingLibrary):
             # If the item still exists, reload it.
             if item.exists():
                 try:
-                    item.reload()
+                    if loaded is None:
+                        item.reload()
+                    else:
+                        item.reload(loaded)
                 except AudioFileError:
                     print_d("Error reloading %r." % item.key, self)
                     util.print_exc()
@@ -608,16 +1211,20 @@ class FileLibrary(PicklingLibrary):
                 print_d("Ignoring (so removing) %r." % item.key, self)
                 return False, present
 
-    def reload(self, item, changed=None, removed=None):
+    def reload(self, item, changed=None, removed=None, loaded=None):
         """Reload a song, possibly noting its status.
 
         If sets are given, it assumes the caller will handle signals,
         and only updates the sets. Otherwise, it handles signals
         itself. It *always* handles library contents, so do not
         try to remove (again) a song that appears in the removed set.
+
+        `loaded` can be a freshly loaded version of the song, see
+        `_prefetch()`.
         """
 
-        was_changed, was_removed = self._load_item(item, force=True)
+        was_changed, was_removed = self._load_item(
+            item, force=True, loaded=loaded)
         assert not (was_changed and was_removed)
 
         if was_changed:
@@ -651,31 +1258,70 @@ class FileLibrary(PicklingLibrary):
         task = Task(_("Library"), _("Checking mount points"))
         if cofuncid:
             task.copool(cofuncid)
-        for i, (point, items) in task.list(enumerate(self._masked.items())):
-            if ismount(point):
+        mounts = self._mounts.probe_all(self._get_masked_checks())
+        for i, (point, mounted) in task.list(enumerate(list(mounts.items()))):
+            if mounted:
+                items = self._masked.pop(point)
                 self._contents.update(items)
-                del(self._masked[point])
                 self.emit('added', list(items.values()))
                 yield True
 
+        dir_cache = self._dir_cache
+        if dir_cache is not None:
+            if force:
+                dir_cache.clear()
+            dir_mtimes = {}
+        if force and self._cover_index is not None:
+            self._cover_index.clear()
+
         task = Task(_("Library"), _("Scanning library"))
         if cofuncid:
             task.copool(cofuncid)
-        changed, removed = set(), set()
+        to_reload = []
         for i, (key, item) in task.list(enumerate(sorted(self.items()))):
-            if key in self._contents and force or not item.valid():
-                self.reload(item, changed, removed)
-                # These numbers are pretty empirical. We should yield more
-            # often than we emit signals; that way the main loop stays
-            # interactive and doesn't get bogged down in updates.
-            if len(changed) > 100:
-                self.emit('changed', changed)
-                changed = set()
-            if len(removed) > 100:
-                self.emit('removed', removed)
-                removed = set()
-            if len(changed) > 5 or i % 100 == 0:
+            unchanged = False
+            if dir_cache is not None:
+                dirname = os.path.dirname(key)
+                if dirname not in dir_mtimes:
+                    dir_mtimes[dirname] = get_dir_mtime(dirname)
+                unchanged = dir_cache.is_unchanged(
+                    dirname, dir_mtimes[dirname])
+            if key in self._contents and force or \
+                    not unchanged and not item.valid():
+                to_reload.append(item)
+            if i % 100 == 0:
                 yield True
+
+        changed, removed = set(), set()
+        items = {item.key: item for item in to_reload}
+        with Task(_("Library"), _("Reloading files")) as task:
+            if cofuncid:
+                task.copool(cofuncid)
+            i = 0
+            for result in self._prefetch(list(items)):
+                if result is None:
+                    yield True
+                    continue
+                key, loaded = result
+                task.update(float(i) / len(items))
+                i += 1
+                self.reload(items[key], changed, removed, loaded)
+                if dir_cache is not None and key not in self._contents:
+                    # check and scan the directory again next time
+                    dirname = os.path.dirname(key)
+                    dir_mtimes.pop(dirname, None)
+                    dir_cache.invalidate(dirname)
+                # These numbers are pretty empirical. We should yield more
+                # often than we emit signals; that way the main loop stays
+                # interactive and doesn't get bogged down in updates.
+                if len(changed) > 100:
+                    self.emit('changed', changed)
+                    changed = set()
+                if len(removed) > 100:
+                    self.emit('removed', removed)
+                    removed = set()
+                if len(changed) > 5 or i % 100 == 0:
+                    yield True
         print_d("Removing %d, changing %d." % (len(removed), len(changed)),
                 self)
         if removed:
@@ -686,6 +1332,15 @@ class FileLibrary(PicklingLibrary):
         for value in self.scan(paths, exclude, cofuncid):
             yield value
 
+        dirnames = {os.path.dirname(key) for key in self._contents}
+        for value in self._update_cover_index(sorted(dirnames)):
+            yield True
+
+        if dir_cache is not None:
+            for dirname, dir_mtime in dir_mtimes.items():
+                dir_cache.set_checked(dirname, dir_mtime)
+            self._commit_dir_cache()
+
     def add_filename(self, filename, add=True):
         """Add a file based on its filename.
 
@@ -694,6 +1349,18 @@ class FileLibrary(PicklingLibrary):
 
         raise NotImplementedError
 
+    def _prefetch(self, filenames):
+        """Loads files ahead of adding or reloading them.
+
+        Yields a (filename, item) tuple for each filename, where item is
+        None in case the caller has to load the file itself, or None in
+        between in case the caller should give control back to the main
+        loop.
+        """
+
+        for filename in filenames:
+            yield filename, None
+
     def contains_filename(self, filename):
         """Returns if a song for the passed filename is in the library.
 
@@ -719,6 +1386,10 @@ class FileLibrary(PicklingLibrary):
                 return True
             return False
 
+        if self._dir_cache is not None:
+            # whatever a stopped scan left behind
+            self._dir_cache.discard()
+
         # first scan each path for new files
         paths_to_load = []
         for scan_path in paths:
@@ -728,13 +1399,14 @@ class FileLibrary(PicklingLibrary):
                 if cofuncid:
                     task.copool(cofuncid)
 
-                for real_path in iter_paths(scan_path, exclude=exclude):
+                # skip unknown file extensions
+                for real_path in iter_paths(scan_path, exclude=exclude,
+                                            dir_cache=self._dir_cache,
+                                            filter_func=formats.filter,
+                                            workers=self.walk_workers):
                     if need_yield():
                         task.pulse()
                         yield
-                    # skip unknown file extensions
-                    if not formats.filter(real_path):
-                        continue
                     # already loaded
                     if self.contains_filename(real_path):
                         continue
@@ -748,8 +1420,19 @@ class FileLibrary(PicklingLibrary):
                 task.copool(cofuncid)
 
             added = []
-            for real_path in task.gen(paths_to_load):
-                item = self.add_filename(real_path, False)
+            done = 0
+            for result in self._prefetch(paths_to_load):
+                if result is None:
+                    yield
+                    continue
+                task.update(float(done) / len(paths_to_load))
+                done += 1
+                real_path, item = result
+                if item is None:
+                    item = self.add_filename(real_path, False)
+                if item is None and self._dir_cache is not None:
+                    # so it gets tried again with the next scan
+                    self._dir_cache.invalidate(os.path.dirname(real_path))
                 if item is not None:
                     added.append(item)
                     if len(added) > 100 or need_added():
@@ -763,6 +1446,13 @@ class FileLibrary(PicklingLibrary):
                 added = []
                 yield True
 
+        if paths_to_load:
+            dirnames = {os.path.dirname(p) for p in paths_to_load}
+            for value in self._update_cover_index(sorted(dirnames)):
+                yield
+
+        self._commit_dir_cache()
+
     def get_content(self):
         """Return visible and masked items"""
 
@@ -777,8 +1467,18 @@ class FileLibrary(PicklingLibrary):
 
         return items
 
+    def _get_content_item(self, key):
+        item = self._contents.get(key)
+        if item is None:
+            for masked in self._masked.values():
+                if key in masked:
+                    return masked[key]
+        return item
+
     def masked(self, item):
-        """Return true if the item is in the library but masked."""
+        """Return true if the item is in the library but masked, or is on
+        a mount point which wasn't mounted when last checked.
+        """
         try:
             point = item.mountpoint
         except AttributeError:
@@ -786,9 +1486,15 @@ class FileLibrary(PicklingLibrary):
             for point in self._masked.values():
                 if item in point:
                     return True
+            for point in self._mounts.get_unmounted():
+                if item.startswith(os.path.join(point, "")):
+                    return True
+            return False
         else:
             # Checking a full item.
-            return item in self._masked.get(point, {}).values()
+            if item in self._masked.get(point, {}).values():
+                return True
+            return self._mounts.get(point) is False
 
     def unmask(self, point):
         print_d("Unmasking %r." % point, self)
@@ -839,6 +1545,34 @@ class SongFileLibrary(SongLibrary, FileLibrary):
         key = normalize_path(filename, True)
         return self._contents.get(key)
 
+    scan_workers = 0
+    """Number of processes used for loading files in `scan()` and
+    `rebuild()`, see `quodlibet.formats.LoaderPool`"""
+
+    def _prefetch(self, filenames):
+        pool = get_pool(self.scan_workers, len(filenames))
+        if pool is None:
+            for result in super(SongFileLibrary, self)._prefetch(filenames):
+                yield result
+            return
+
+        finished = set()
+        try:
+            for results in pool.load(filenames):
+                if results is None:
+                    yield None
+                    continue
+                for result in results:
+                    finished.add(result[0])
+                    yield result
+        except EnvironmentError as e:
+            print_w("Loading files in other processes failed: %s" % e)
+            for filename in filenames:
+                if filename not in finished:
+                    yield filename, None
+        finally:
+            pool.shutdown()
+
     def add_filename(self, filename, add=True):
         """Add a song to the library based on filename.
 
@@ -863,3 +1597,12 @@ class SongFileLibrary(SongLibrary, FileLibrary):
             song = self._contents[key]
 
         return song
+
+
+class JournalingSongFileLibrary(JournalingMixin, SongFileLibrary):
+    """A library containing song files.
+    Journals changes to disk, see `JournalingMixin`"""
+
+    def __init__(self, name=None):
+        print_d("Using journaling persistence for library \"%s\"" % name)
+        super(JournalingSongFileLibrary, self).__init__(name)
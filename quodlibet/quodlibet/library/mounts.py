@@ -0,0 +1,136 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Checking mount points without blocking on unavailable storage."""
+
+import threading
+import time
+
+from quodlibet import util
+from quodlibet.util.path import ismount
+
+
+PROBE_TIMEOUT = 1.0
+"""Seconds to wait for a mount point check before treating the mount point
+as not available"""
+
+MAX_AGE = 4.0
+"""Seconds a check result gets reused"""
+
+POLL_INTERVAL = 5
+"""Seconds between checks of masked mount points"""
+
+
+class MountProber(object):
+    """Checks if mount points are available in background threads.
+
+    Checking a hung network mount can block forever, so callers only wait
+    for a result up to a timeout and treat the mount point as not
+    available in case there is none. Results get reused for `MAX_AGE`
+    seconds and there is at most one check per mount point running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # mount point -> (mounted, time of the check)
+        self._results = {}
+        # mount point -> threading.Event, set when the check is done
+        self._running = {}
+
+    def start(self, point, check=None):
+        """Starts checking the mount point, unless there is a recent result
+        or a check is already running.
+
+        `check` gets called in case the mount point isn't mounted, it can
+        access a path on it to trigger automounting (autofs) for example.
+        """
+
+        with self._lock:
+            if point in self._running:
+                return
+            result = self._results.get(point)
+            if result is not None and time.time() - result[1] < MAX_AGE:
+                return
+            done = threading.Event()
+            self._running[point] = done
+
+        thread = threading.Thread(
+            target=self._check, args=(point, check, done),
+            name="MountProber")
+        thread.daemon = True
+        thread.start()
+
+    def _check(self, point, check, done):
+        try:
+            mounted = ismount(point)
+            if not mounted and check is not None:
+                check()
+                mounted = ismount(point)
+        except Exception:
+            util.print_exc()
+            mounted = False
+
+        with self._lock:
+            self._results[point] = (mounted, time.time())
+            del self._running[point]
+        done.set()
+
+    def get(self, point, timeout=0):
+        """Returns if the mount point is mounted according to the last
+        check, waiting up to `timeout` seconds for a running one.
+
+        Returns None if there is no result yet.
+        """
+
+        with self._lock:
+            done = self._running.get(point)
+        if done is not None and timeout > 0:
+            done.wait(timeout)
+        with self._lock:
+            result = self._results.get(point)
+        if result is None:
+            return None
+        return result[0]
+
+    def get_unmounted(self):
+        """Returns the mount points which weren't mounted according to
+        their last check.
+        """
+
+        with self._lock:
+            return [p for p, (mounted, t) in self._results.items()
+                    if not mounted]
+
+    def probe(self, point, check=None, timeout=None):
+        """Like start() followed by get(), waiting `PROBE_TIMEOUT` seconds
+        by default.
+        """
+
+        if timeout is None:
+            timeout = PROBE_TIMEOUT
+        self.start(point, check)
+        return self.get(point, timeout)
+
+    def probe_all(self, checks, timeout=None):
+        """Checks many mount points at once, waiting up to `timeout`
+        seconds in total (`PROBE_TIMEOUT` by default).
+
+        Args:
+            checks (Dict[fsnative, callable or None]): mount points and
+                their `check` as passed to start()
+        Returns:
+            Dict[fsnative, bool or None]: see get()
+        """
+
+        if timeout is None:
+            timeout = PROBE_TIMEOUT
+        for point, check in checks.items():
+            self.start(point, check)
+
+        deadline = time.time() + timeout
+        result = {}
+        for point in checks:
+            result[point] = self.get(point, max(deadline - time.time(), 0))
+        return result
@@ -15,12 +15,15 @@ from senf import environ, argv as sys_argv
 from quodlibet import _
 from quodlibet.cli import process_arguments, exit_
 from quodlibet.util.dprint import print_d, print_, print_exc
+from quodlibet.util import tracer
 
 
 def main(argv=None):
     if argv is None:
         argv = sys_argv
 
+    tracer.start()
+
     import quodlibet
 
     config_file = os.path.join(quodlibet.get_user_dir(), "config")
@@ -34,7 +37,8 @@ def main(argv=None):
     finally:
         sys.modules.pop("gi.repository.Gtk", None)
 
-    quodlibet.init()
+    with tracer.span("Initializing"):
+        quodlibet.init()
 
     from quodlibet import app
     from quodlibet.qltk import add_signal_watch
@@ -57,7 +61,14 @@ def main(argv=None):
     print_d("Initializing main library (%s)" % (
             quodlibet.util.path.unexpand(library_path)))
 
-    library = quodlibet.library.init(library_path)
+    with tracer.span("Loading library"):
+        library = quodlibet.library.init(
+            library_path, journal=config.getboolean("library", "journal"),
+            query_index=config.getboolean("library", "query_index"),
+            scan_workers=config.getint("library", "scan_workers"),
+            dir_cache=config.getboolean("library", "dir_cache"),
+            walk_workers=config.getint("library", "walk_workers"),
+            cover_index=config.getboolean("library", "cover_index"))
     app.library = library
 
     # this assumes that nullbe will always succeed
@@ -65,18 +76,21 @@ def main(argv=None):
     wanted_backend = environ.get(
         "QUODLIBET_BACKEND", config.get("player", "backend"))
 
-    try:
-        player = quodlibet.player.init_player(wanted_backend, app.librarian)
-    except PlayerError:
-        print_exc()
-        player = quodlibet.player.init_player("nullbe", app.librarian)
+    with tracer.span("Initializing player"):
+        try:
+            player = quodlibet.player.init_player(
+                wanted_backend, app.librarian)
+        except PlayerError:
+            print_exc()
+            player = quodlibet.player.init_player("nullbe", app.librarian)
 
     app.player = player
 
     environ["PULSE_PROP_media.role"] = "music"
     environ["PULSE_PROP_application.icon_name"] = app.icon_name
 
-    browsers.init()
+    with tracer.span("Loading browsers"):
+        browsers.init()
 
     from quodlibet.qltk.songlist import SongList, get_columns
 
@@ -90,15 +104,17 @@ def main(argv=None):
     in_all = ("~filename ~uri ~#lastplayed ~#rating ~#playcount ~#skipcount "
               "~#added ~#bitrate ~current ~#laststarted ~basename "
               "~dirname").split()
-    for Kind in browsers.browsers:
-        if Kind.headers is not None:
-            Kind.headers.extend(in_all)
-        Kind.init(library)
+    with tracer.span("Initializing browsers"):
+        for Kind in browsers.browsers:
+            if Kind.headers is not None:
+                Kind.headers.extend(in_all)
+            Kind.init(library)
 
-    pm = quodlibet.init_plugins("no-plugins" in startup_actions)
+    with tracer.span("Loading plugins"):
+        pm = quodlibet.init_plugins("no-plugins" in startup_actions)
 
-    if hasattr(player, "init_plugins"):
-        player.init_plugins()
+        if hasattr(player, "init_plugins"):
+            player.init_plugins()
 
     from quodlibet.qltk import unity
     unity.init("io.github.quodlibet.QuodLibet.desktop", player)
@@ -106,9 +122,10 @@ def main(argv=None):
     from quodlibet.qltk.songsmenu import SongsMenu
     SongsMenu.init_plugins()
 
-    from quodlibet.util.cover import CoverManager
-    app.cover_manager = CoverManager()
-    app.cover_manager.init_plugins()
+    with tracer.span("Initializing cover manager"):
+        from quodlibet.util.cover import CoverManager
+        app.cover_manager = CoverManager()
+        app.cover_manager.init_plugins()
 
     from quodlibet.plugins.playlist import PLAYLIST_HANDLER
     PLAYLIST_HANDLER.init_plugins()
@@ -130,14 +147,16 @@ def main(argv=None):
                 if resp is not None:
                     print_(resp, end="", flush=True)
 
-    from quodlibet.qltk.quodlibetwindow import QuodLibetWindow, PlayerOptions
-    # Call exec_commands after the window is restored, but make sure
-    # it's after the mainloop has started so everything is set up.
+    with tracer.span("Creating main window"):
+        from quodlibet.qltk.quodlibetwindow import QuodLibetWindow, \
+            PlayerOptions
+        # Call exec_commands after the window is restored, but make sure
+        # it's after the mainloop has started so everything is set up.
 
-    app.window = window = QuodLibetWindow(
-        library, player,
-        restore_cb=lambda:
-            GLib.idle_add(exec_commands, priority=GLib.PRIORITY_HIGH))
+        app.window = window = QuodLibetWindow(
+            library, player,
+            restore_cb=lambda:
+                GLib.idle_add(exec_commands, priority=GLib.PRIORITY_HIGH))
 
     app.player_options = PlayerOptions(window)
 
@@ -145,9 +164,10 @@ def main(argv=None):
 
     from quodlibet.plugins.events import EventPluginHandler
     from quodlibet.plugins.gui import UserInterfacePluginHandler
-    pm.register_handler(EventPluginHandler(library.librarian, player,
-                                           app.window.songlist))
-    pm.register_handler(UserInterfacePluginHandler())
+    with tracer.span("Enabling event plugins"):
+        pm.register_handler(EventPluginHandler(library.librarian, player,
+                                               app.window.songlist))
+        pm.register_handler(UserInterfacePluginHandler())
 
     from quodlibet.mmkeys import MMKeysHandler
     from quodlibet.remote import Remote, RemoteError
@@ -208,6 +228,11 @@ def main(argv=None):
     fsiface.destroy()
 
     tracker.destroy()
+
+    # finish started and queued tag writes before exiting
+    from quodlibet.util.tagwriter import TagWriter
+    TagWriter.get().shutdown()
+
     quodlibet.library.save()
 
     config.save()
@@ -92,6 +92,28 @@ class Order(object):
         e.g. forgetting history / clearing pre-cached orders."""
         pass
 
+    def row_inserted(self, playlist, index):
+        """Called after a song got inserted at `index` in the playlist.
+        By default this resets the order, as the indices of the following
+        songs have changed."""
+        self.reset(playlist)
+
+    def row_deleted(self, playlist, index):
+        """Called after the song at `index` got removed from the playlist.
+        By default this resets the order, as the indices of the following
+        songs have changed."""
+        self.reset(playlist)
+
+    def row_changed(self, playlist, index):
+        """Called after the song at `index` in the playlist has changed"""
+        pass
+
+    def songs_changed(self, playlist, songs):
+        """Called after the library changed `songs`, which can be in the
+        playlist or not. Unlike `row_changed` this also covers rows which
+        aren't displayed."""
+        pass
+
     def __str__(self):
         """By default there is no interesting state"""
         return "<%s>" % self.display_name
@@ -9,6 +9,7 @@ import random
 
 from quodlibet import _
 from quodlibet.order import Order, OrderRemembered
+from quodlibet.util.collections import WeightedList
 
 
 class Reorder(Order):
@@ -17,43 +18,128 @@ class Reorder(Order):
     pass
 
 
-class OrderShuffle(Reorder, OrderRemembered):
-    name = "random"
-    display_name = _("Random")
-    accelerated_name = _("_Random")
+class WeightedReorder(Reorder, OrderRemembered):
+    """Base class for reorders picking one of the songs which haven't been
+    played yet, with a probability proportional to `weight(song)`.
+
+    The weights are kept in a `WeightedList`, which gets updated as the
+    playlist changes instead of being recomputed for every song.
+    """
+
+    def __init__(self):
+        super(WeightedReorder, self).__init__()
+        self._weights = None
+
+    def prepare(self, songs):
+        """Called with all songs of the playlist which weren't played yet,
+        before their weights get computed"""
+        pass
+
+    def weight(self, song):
+        """Returns the non-negative weight of `song`"""
+
+        return 1
+
+    def _get_weights(self, playlist):
+        weights = self._weights
+        if weights is None or len(weights) != len(playlist):
+            songs = playlist.get()
+            played = set(self._played)
+            self.prepare(
+                [s for i, s in enumerate(songs) if i not in played])
+            weights = WeightedList(
+                0 if i in played else self.weight(song)
+                for i, song in enumerate(songs))
+            self._weights = weights
+        return weights
+
+    def _update(self, playlist, index):
+        if self._weights is None:
+            return
+        if index in self._played:
+            weight = 0
+        else:
+            weight = self.weight(playlist[index][0])
+        # weight() can invalidate all weights
+        if self._weights is not None:
+            self._weights[index] = weight
 
     def next(self, playlist, iter):
-        super(OrderShuffle, self).next(playlist, iter)
-        played = set(self._played)
-        songs = set(range(len(playlist)))
-        remaining = songs.difference(played)
+        super(WeightedReorder, self).next(playlist, iter)
+        weights = self._get_weights(playlist)
+        if iter is not None:
+            weights[self._played[-1]] = 0
+
+        total = weights.total
+        if total > 0:
+            index = weights.pick(random.random() * total)
+            return playlist.get_iter((index,))
 
+        # only songs with a zero weight left
+        remaining = self.remaining(playlist)
         if remaining:
             return playlist.get_iter((random.choice(list(remaining)),))
 
         self.reset(playlist)
         return None
 
+    def previous(self, playlist, iter):
+        iter = super(WeightedReorder, self).previous(playlist, iter)
+        if iter is not None:
+            self._update(playlist, playlist.get_path(iter).get_indices()[0])
+        return iter
+
+    def set(self, playlist, iter):
+        iter = super(WeightedReorder, self).set(playlist, iter)
+        if iter is not None:
+            self._update(playlist, self._played[-1])
+        return iter
+
+    def reset(self, playlist):
+        super(WeightedReorder, self).reset(playlist)
+        self._weights = None
 
-class OrderWeighted(Reorder, OrderRemembered):
+    def row_inserted(self, playlist, index):
+        self._played[:] = [i + 1 if i >= index else i for i in self._played]
+        weights = self._weights
+        if weights is not None:
+            if len(weights) + 1 == len(playlist):
+                weights.insert(index, self.weight(playlist[index][0]))
+            else:
+                self._weights = None
+
+    def row_deleted(self, playlist, index):
+        self._played[:] = [
+            i - 1 if i > index else i for i in self._played if i != index]
+        weights = self._weights
+        if weights is not None:
+            if len(weights) - 1 == len(playlist):
+                del weights[index]
+            else:
+                self._weights = None
+
+    def row_changed(self, playlist, index):
+        if self._weights is not None and index < len(self._weights):
+            self._update(playlist, index)
+
+    def songs_changed(self, playlist, songs):
+        if self._weights is None:
+            return
+        for iter_ in playlist.find_all(songs):
+            self.row_changed(
+                playlist, playlist.get_path(iter_).get_indices()[0])
+
+
+class OrderShuffle(WeightedReorder):
+    name = "random"
+    display_name = _("Random")
+    accelerated_name = _("_Random")
+
+
+class OrderWeighted(WeightedReorder):
     name = "weighted"
     display_name = _("Prefer higher rated")
     accelerated_name = _("Prefer higher rated")
 
-    def next(self, playlist, iter):
-        super(OrderWeighted, self).next(playlist, iter)
-        remaining = self.remaining(playlist)
-
-        # Don't try to search through an empty / played playlist.
-        if len(remaining) <= 0:
-            self.reset(playlist)
-            return None
-
-        total_score = sum([song('~#rating') for song in remaining.values()])
-        choice = random.random() * total_score
-        current = 0.0
-        for i, song in remaining.items():
-            current += song("~#rating")
-            if current >= choice:
-                return playlist.get_iter([i])
-        raise ValueError
+    def weight(self, song):
+        return song("~#rating")
@@ -30,6 +30,18 @@ class Repeat(Order):
     def reset(self, playlist):
         return self.wrapped.reset(playlist)
 
+    def row_inserted(self, playlist, index):
+        return self.wrapped.row_inserted(playlist, index)
+
+    def row_deleted(self, playlist, index):
+        return self.wrapped.row_deleted(playlist, index)
+
+    def row_changed(self, playlist, index):
+        return self.wrapped.row_changed(playlist, index)
+
+    def songs_changed(self, playlist, songs):
+        return self.wrapped.songs_changed(playlist, songs)
+
     def __str__(self):
         return "<%s ∘ %s>" % (self.display_name, self.wrapped.display_name)
 
@@ -24,6 +24,7 @@ from quodlibet import _
 from quodlibet.util import fver, sanitize_tags, MainRunner, MainRunnerError, \
     MainRunnerAbortedError, MainRunnerTimeoutError, print_w, print_d, \
     print_e, print_
+from quodlibet.util.tracer import traced
 from quodlibet.player import PlayerError
 from quodlibet.player._base import BasePlayer
 from quodlibet.qltk.notif import Task
@@ -389,6 +390,7 @@ class GStreamerPlayer(BasePlayer, GStreamerPluginHandler):
         else:
             print_e("No active pipeline.")
 
+    @traced("Setting up GStreamer pipeline")
     def __init_pipeline(self):
         """Creates a gstreamer pipeline. Returns True on success."""
 
@@ -5,11 +5,18 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import os
+
+import quodlibet
 from quodlibet import _
 from quodlibet import config
 from quodlibet import util
+from quodlibet.util.atomic import atomic_save
 from quodlibet.util.modulescanner import ModuleScanner
-from quodlibet.util.dprint import print_d
+from quodlibet.util.dprint import print_d, print_w
+from quodlibet.util.path import mkdir, mtime
+from quodlibet.util.picklehelper import pickle_dumps, pickle_loads, \
+    PickleError
 from quodlibet.util.config import ConfigProxy
 from quodlibet.qltk.ccb import ConfigCheckButton
 
@@ -21,7 +28,8 @@ def init(folders=None, disable_plugins=False):
     """
     if disable_plugins:
         folders = []
-    manager = PluginManager.instance = PluginManager(folders)
+    manifest = os.path.join(quodlibet.get_cache_dir(), "plugins.manifest")
+    manager = PluginManager.instance = PluginManager(folders, manifest)
     return manager
 
 
@@ -174,6 +182,107 @@ class Plugin(object):
         return self.instance
 
 
+class PluginManifest(object):
+    """Remembers which plugins plugin modules contain, together with the
+    mtimes of their files, so they don't need to be imported to find out.
+
+    Entries are dicts with the id, name, description, tags, the
+    can_enable flag and the handler types (the names of the classes the
+    plugin class derives from) of each plugin in the module.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        # name: (path: mtime dict, list of entries)
+        self._modules = {}
+        self.dirty = False
+
+    def __len__(self):
+        return len(self._modules)
+
+    def load(self, filename):
+        """Loads the manifest from a file, or starts empty if that fails"""
+
+        self._modules = {}
+        self.dirty = False
+        try:
+            with open(filename, "rb") as h:
+                data = pickle_loads(h.read())
+        except EnvironmentError:
+            return
+        except PickleError:
+            util.print_exc()
+            return
+
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            print_w("Ignoring plugin manifest %r" % filename)
+            return
+        self._modules = data["modules"]
+
+    def save(self, filename):
+        data = pickle_dumps(
+            {"version": self.VERSION, "modules": self._modules}, 2)
+        try:
+            mkdir(os.path.dirname(filename))
+            with atomic_save(filename, "wb") as h:
+                h.write(data)
+        except EnvironmentError:
+            print_w("Couldn't save plugin manifest to %r" % filename)
+        else:
+            self.dirty = False
+
+    def get(self, name, dep_paths):
+        """Returns the entries of the module or None in case it isn't known
+        or any of its files have changed.
+        """
+
+        try:
+            deps, entries = self._modules[name]
+        except KeyError:
+            return None
+
+        if set(deps.keys()) != set(dep_paths):
+            return None
+        for path, old_mtime in deps.items():
+            if mtime(path) != old_mtime:
+                return None
+        return entries
+
+    def set(self, name, deps, plugins):
+        """Remembers the plugins of a module.
+
+        Args:
+            name (str): the module name
+            deps (Dict[fsnative, float]): files of the module and their mtime
+            plugins (List[Plugin]): all plugins in the module
+        """
+
+        entries = []
+        for plugin in plugins:
+            entries.append({
+                "id": plugin.id,
+                "name": plugin.name,
+                "description": plugin.description,
+                "tags": plugin.tags,
+                "can_enable": plugin.can_enable,
+                "types": [c.__name__ for c in plugin.cls.__mro__[1:]],
+            })
+
+        entry = (dict(deps), entries)
+        if self._modules.get(name) != entry:
+            self._modules[name] = entry
+            self.dirty = True
+
+    def retain(self, names):
+        """Forgets all modules not in `names`"""
+
+        for name in list(self._modules.keys()):
+            if name not in names:
+                del self._modules[name]
+                self.dirty = True
+
+
 class PluginHandler(object):
     """A plugin handler can choose to handle plugins, as well as control
     their enabled state."""
@@ -226,9 +335,12 @@ class PluginManager(object):
 
     instance = None  # default instance
 
-    def __init__(self, folders=None):
+    def __init__(self, folders=None, manifest_filename=None):
         """folders is a list of paths that will be scanned for plugins.
         Plugins in later paths will be preferred if they share a name.
+
+        manifest_filename is the path of the `PluginManifest` used for
+        lazy rescans, or None.
         """
 
         super(PluginManager, self).__init__()
@@ -240,15 +352,25 @@ class PluginManager(object):
         self.__modules = {}     # name: PluginModule
         self.__handlers = []    # handler list
         self.__enabled = set()  # (possibly) enabled plugin IDs
+        self.__manifest = PluginManifest()
+        self.__manifest_filename = manifest_filename
+        if manifest_filename is not None:
+            self.__manifest.load(manifest_filename)
 
         self.__restore()
 
-    def rescan(self):
-        """Scan for plugin changes or to initially load all plugins"""
+    def rescan(self, lazy=False):
+        """Scan for plugin changes or to initially load all plugins.
+
+        If `lazy` is True, modules which according to the manifest only
+        contain plugins that aren't enabled don't get imported, until
+        load_all() or the next rescan().
+        """
 
         print_d("Rescanning..")
 
-        removed, added = self.__scanner.rescan()
+        skip = self.__can_skip if lazy else None
+        removed, added = self.__scanner.rescan(skip)
 
         # remember IDs of enabled plugin that get reloaded, so we can enable
         # them again
@@ -272,8 +394,37 @@ class PluginManager(object):
             new_module = self.__scanner.modules[name]
             self.__add_module(name, new_module.module)
 
+        self.__update_manifest()
+
         print_d("Rescanning done.")
 
+    def load_all(self):
+        """Imports all modules skipped by a lazy rescan()"""
+
+        if self.__scanner.skipped:
+            self.rescan()
+
+    def __can_skip(self, name, dep_paths):
+        entries = self.__manifest.get(name, dep_paths)
+        if entries is None:
+            return False
+        for entry in entries:
+            if entry["id"] in self.__enabled or not entry["can_enable"]:
+                return False
+        return True
+
+    def __update_manifest(self):
+        manifest = self.__manifest
+        scanner = self.__scanner
+
+        for name, module in scanner.modules.items():
+            manifest.set(name, module.deps, self.__modules[name].plugins)
+        # failed modules aren't remembered, so they get tried again
+        manifest.retain(set(scanner.modules) | set(scanner.skipped))
+
+        if manifest.dirty and self.__manifest_filename is not None:
+            manifest.save(self.__manifest_filename)
+
     @property
     def _modules(self):
         return self.__scanner.modules.values()
@@ -10,6 +10,7 @@
 from gi.repository import Gtk, GObject
 from senf import fsn2text
 
+from quodlibet import app
 from quodlibet import config
 from quodlibet import util
 from quodlibet import _
@@ -18,6 +19,8 @@ from quodlibet.qltk.ccb import ConfigCheckButton
 from quodlibet.qltk.msg import WarningMessage, ErrorMessage
 from quodlibet.qltk import Icons
 from quodlibet.util import connect_obj, connect_destroy
+from quodlibet.util.i18n import numeric_phrase
+from quodlibet.util.tagwriter import TagWriter
 from quodlibet.errorreport import errorhook
 
 
@@ -42,6 +45,14 @@ class OverwriteWarning(WarningMessage):
         self.set_default_response(Gtk.ResponseType.CANCEL)
 
 
+def changed_outside(song):
+    """If the file of the song changed since it was loaded, not counting
+    our own writes which haven't finished yet.
+    """
+
+    return not song.valid() and not TagWriter.get().is_pending(song)
+
+
 class WriteFailedError(ErrorMessage):
 
     def __init__(self, parent, song):
@@ -56,6 +67,61 @@ class WriteFailedError(ErrorMessage):
             parent, title, description)
 
 
+class WriteBatchFailedError(ErrorMessage):
+
+    RESPONSE_REVERT = 1
+
+    def __init__(self, parent, batch):
+        title = numeric_phrase("Unable to save %d song",
+                               "Unable to save %d songs", len(batch.failed))
+        description = _("The files may be read-only, corrupted, or you do "
+            "not have permission to edit them. The other songs were saved, "
+            "reverting restores their previous tags.")
+
+        super(WriteBatchFailedError, self).__init__(
+            parent, title, description, buttons=Gtk.ButtonsType.NONE)
+
+        self.add_button(_("_Close"), Gtk.ResponseType.CLOSE)
+        self.add_icon_button(_("_Revert"), Icons.DOCUMENT_REVERT,
+                             self.RESPONSE_REVERT)
+        self.set_default_response(Gtk.ResponseType.CLOSE)
+
+
+def show_write_failures(parent, batch):
+    """Tells the user about songs of a finished WriteBatch which couldn't
+    be saved, and offers reverting all songs in case some got saved.
+    """
+
+    if not batch.failed:
+        return
+    if not batch.written:
+        WriteFailedError(parent, batch.failed[0]).run()
+        return
+    dialog = WriteBatchFailedError(parent, batch)
+    if dialog.run() == WriteBatchFailedError.RESPONSE_REVERT:
+        batch.revert()
+
+
+def write_batch(widget, batch, songs, done_func):
+    """Writes songs of a WriteBatch and tells the user about failures once
+    all are handled, see show_write_failures().
+
+    done_func(batch) gets called afterwards, unless the widget got
+    destroyed while writing.
+    """
+
+    destroyed = []
+    sig = widget.connect("destroy", lambda *x: destroyed.append(True))
+
+    def written_cb(batch):
+        show_write_failures(app.window if destroyed else widget, batch)
+        if not destroyed:
+            widget.disconnect(sig)
+            done_func(batch)
+
+    batch.write(songs, written_cb)
+
+
 class EditingPluginHandler(GObject.GObject, PluginHandler):
     __gsignals__ = {
         "changed": (GObject.SignalFlags.RUN_LAST, None, ())
@@ -18,22 +18,21 @@ from quodlibet import app
 
 from quodlibet.util import massagers
 
-from quodlibet.formats import AudioFileError
 from quodlibet.qltk.completion import LibraryValueCompletion
 from quodlibet.qltk.tagscombobox import TagsComboBox, TagsComboBoxEntry
 from quodlibet.qltk.views import RCMHintedTreeView, TreeViewColumn
-from quodlibet.qltk.wlw import WritingWindow
 from quodlibet.qltk.window import Dialog
 from quodlibet.qltk.models import ObjectStore
 from quodlibet.qltk.ccb import ConfigCheckButton
 from quodlibet.qltk.x import SeparatorMenuItem, Button, MenuItem
 from quodlibet.qltk._editutils import EditingPluginHandler, OverwriteWarning
-from quodlibet.qltk._editutils import WriteFailedError
+from quodlibet.qltk._editutils import write_batch, changed_outside
 from quodlibet.qltk import Icons
 from quodlibet.plugins import PluginManager
 from quodlibet.util import connect_obj
 from quodlibet.util.i18n import numeric_phrase
 from quodlibet.util.tags import USER_TAGS, MACHINE_TAGS, sortkey as tagsortkey
+from quodlibet.util.tagwriter import WriteBatch
 from quodlibet.util.string.splitters import (split_value, split_title,
     split_people, split_album)
 
@@ -824,20 +823,18 @@ class EditTags(Gtk.VBox):
                 l = renamed.setdefault(entry.tag, [])
                 l.append((entry.origtag, entry.value, entry.origvalue))
 
-        was_changed = set()
+        batch = WriteBatch(library)
+        to_write = []
         songs = self.__songinfo.songs
-        win = WritingWindow(self, len(songs))
-        win.show()
         all_done = False
         for song in songs:
-            if not song.valid():
-                win.hide()
+            if changed_outside(song):
                 dialog = OverwriteWarning(self, song)
                 resp = dialog.run()
-                win.show()
                 if resp != OverwriteWarning.RESPONSE_SAVE:
                     break
 
+            batch.record(song)
             changed = False
             for key, values in updated.items():
                 for (new_value, old_value) in values:
@@ -887,24 +884,18 @@ class EditTags(Gtk.VBox):
                 song.add(tag, value.text)
 
             if changed:
-                try:
-                    song.write()
-                except AudioFileError:
-                    util.print_exc()
-                    WriteFailedError(self, song).run()
-                    library.reload(song, changed=was_changed)
-                    break
-                was_changed.add(song)
-
-            if win.step():
-                break
+                to_write.append(song)
         else:
             all_done = True
 
-        win.destroy()
-        library.changed(was_changed)
         for b in [save, revert]:
-            b.set_sensitive(not all_done)
+            b.set_sensitive(False)
+
+        def written_cb(batch):
+            for b in [save, revert]:
+                b.set_sensitive(not all_done or bool(batch.failed))
+
+        write_batch(self, batch, to_write, written_cb)
 
     def __edit_tag(self, renderer, path, new_value, model):
         #pfps leaving the newline should be OK
@@ -448,6 +448,8 @@ class PluginWindow(UniqueWindow, PersistentWindowMixin):
 
         self.add(paned)
 
+        # plugins which weren't needed at start aren't imported yet
+        PluginManager.instance.load_all()
         self.__refill(tv, pref_box, errors, enabled_combo)
 
         self.connect('destroy', self.__destroy)
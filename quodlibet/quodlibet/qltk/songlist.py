@@ -172,6 +172,103 @@ def get_sort_tag(tag):
     return tag
 
 
+class _Reversed(object):
+    """Wraps a sort key, inverting the order"""
+
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+
+def _can_cache_key(name):
+    """If the sort key for a column only depends on the song itself and
+    is worth caching"""
+
+    # the artist sort key is part of the cached sort_key already
+    if name == "artistsort":
+        return False
+    return "rating" not in name and "playlists" not in name
+
+
+def get_column_key_func(header, tag=None):
+    """Returns a function returning the sort key of a song for a column,
+    see AudioFile.sort_by_func().
+
+    The keys get computed once and are cached in the song until it
+    changes.
+
+    Args:
+        header (str): the column header name
+        tag (str or callable or None): the result of get_sort_tag(header)
+    Returns:
+        Callable[[AudioFile], object]
+    """
+
+    if tag is None:
+        tag = get_sort_tag(header)
+    if tag == "":
+        return lambda song: song.sort_key
+
+    func = AudioFile.sort_by_func(tag)
+    # patterns get a new callable each time
+    name = tag if isinstance(tag, str) else header
+    if not _can_cache_key(name):
+        return func
+
+    def get_key(song):
+        keys = song.column_sort_keys
+        try:
+            return keys[name]
+        except KeyError:
+            key = keys[name] = func(song)
+            return key
+
+    return get_key
+
+
+def get_sort_key_func(orders):
+    """Returns a function returning a key for a song, which sorts songs
+    the same way SongList._sort_songs() does for the given sort orders.
+
+    Args:
+        orders (List[Tuple[str, bool]]): as returned by
+            SongList.get_sort_orders()
+    Returns:
+        Callable[[AudioFile], tuple]
+    """
+
+    # songs get sorted by the default key first and by each order after
+    # that, so the last order is the most significant one
+    stages = [("", "", "", orders[0][1])] if orders else []
+    for header, reverse in orders:
+        tag = get_sort_tag(header)
+        name = tag if isinstance(tag, str) else header
+        stages.append((name, header, tag, reverse))
+
+    funcs = []
+    seen = set()
+    for name, header, tag, reverse in reversed(stages):
+        # songs with equal values are already equal for this one
+        if name in seen:
+            continue
+        seen.add(name)
+        funcs.append((get_column_key_func(header, tag), reverse))
+
+    def get_key(song):
+        return tuple(
+            _Reversed(func(song)) if reverse else func(song)
+            for func, reverse in funcs)
+
+    return get_key
+
+
 def header_tag_split(header):
     """Split a pattern or a tied tag into separate tags"""
 
@@ -405,7 +502,14 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
         # A priority list of how to apply the sort keys.
         # might contain column header names not present...
         self._sort_sequence = []
+        # sort key function for the current sort orders, see add_songs()
+        self.__sort_key_func = None
+        # changed songs waiting for their rows to get updated
+        self.__changed_songs = set()
+        self.__changed_idle = None
+        self.connect('orders-changed', self.__orders_changed)
         self.set_column_headers(self.headers)
+        self.__library = library
         librarian = library.librarian or library
 
         connect_destroy(librarian, 'changed', self.__song_updated)
@@ -567,6 +671,10 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
         self.emit("orders-changed")
 
     def __destroy(self, *args):
+        if self.__changed_idle is not None:
+            GLib.source_remove(self.__changed_idle)
+            self.__changed_idle = None
+        self.__changed_songs.clear()
         self.info.destroy()
         self.info = None
         self.handler_block(self.__csig)
@@ -750,8 +858,9 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
         last_tag = None
         last_order = None
         first = True
-        for tag, reverse in self.get_sort_orders():
-            tag = get_sort_tag(tag)
+        columns = getattr(self.__library, "numeric_columns", None)
+        for header, reverse in self.get_sort_orders():
+            tag = get_sort_tag(header)
 
             # always sort using the default sort key first
             if first:
@@ -768,10 +877,22 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
 
             if tag == "":
                 songs.sort(key=lambda s: s.sort_key, reverse=reverse)
-            else:
-                sort_func = AudioFile.sort_by_func(tag)
+            elif columns is None or not columns.sort(songs, tag, reverse):
+                sort_func = get_column_key_func(header, tag)
                 songs.sort(key=sort_func, reverse=reverse)
 
+    def __orders_changed(self, *args):
+        self.__sort_key_func = None
+
+    def _get_sort_key(self, song):
+        """Returns the key of the song for the current sort orders, see
+        get_sort_key_func()
+        """
+
+        if self.__sort_key_func is None:
+            self.__sort_key_func = get_sort_key_func(self.get_sort_orders())
+        return self.__sort_key_func(song)
+
     def add_songs(self, songs):
         """Add songs to the list in the right order and position"""
 
@@ -787,14 +908,24 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
             model.append_many(songs)
             return
 
-        # FIXME: Replace with something fast
-        old_songs = self.get_songs()
-        old_songs.extend(songs)
-
-        self._sort_songs(old_songs)
-
-        for index, song in sorted(zip(map(old_songs.index, songs), songs)):
-            model.insert(index, row=[song])
+        # Insert the sorted songs one by one, finding the position by
+        # a binary search starting after the previous one. Songs get added
+        # after existing ones with an equal key like a stable sort would.
+        get_key = self._get_sort_key
+        get_song = model.get_value
+        nth_row = model.iter_nth_child
+        start = 0
+        for song in sorted(songs, key=get_key):
+            key = get_key(song)
+            end = len(model)
+            while start < end:
+                middle = (start + end) // 2
+                if key < get_key(get_song(nth_row(None, middle))):
+                    end = middle
+                else:
+                    start = middle + 1
+            model.insert(start, row=[song])
+            start += 1
 
     def set_songs(self, songs, sorted=False, scroll=True, scroll_select=False):
         """Fill the song list.
@@ -896,19 +1027,45 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
         return songs
 
     def __song_updated(self, librarian, songs):
-        """Only update rows that are currently displayed.
+        """Collects the changed songs, so that many signals in a row,
+        as emitted for bulk changes, only lead to one update of the rows.
+        """
+
+        self.__changed_songs.update(songs)
+        if self.__changed_idle is None:
+            # before the next redraw
+            self.__changed_idle = GLib.idle_add(
+                self.__update_changed_rows, priority=GLib.PRIORITY_HIGH_IDLE)
+
+    def __update_changed_rows(self):
+        """Only update rows that are currently displayed, the play order
+        gets told about all changed songs instead.
         Warning: This makes the row-changed signal useless.
         """
 
+        self.__changed_idle = None
+        songs = self.__changed_songs
+        self.__changed_songs = set()
+
+        model = self.get_model()
+        model.songs_changed(songs)
+
         vrange = self.get_visible_range()
         if vrange is None:
-            return
+            return False
         (start,), (end,) = vrange
-        model = self.get_model()
-        for path in range(start, end + 1):
-            row = model[path]
-            if row[0] in songs:
-                model.row_changed(row.path, row.iter)
+        if len(songs) <= end - start:
+            # look up the rows of the songs through the index of the model
+            for iter_ in model.find_all(songs):
+                path = model.get_path(iter_)
+                if start <= path.get_indices()[0] <= end:
+                    model.row_changed(path, iter_)
+        else:
+            for path in range(start, end + 1):
+                row = model[path]
+                if row[0] in songs:
+                    model.row_changed(row.path, row.iter)
+        return False
 
     def __song_added(self, librarian, songs):
         window = qltk.get_top_parent(self)
@@ -931,6 +1088,7 @@ class SongList(AllTreeView, SongListDnDMixin, DragScroll,
             return
 
         songs = set(songs)
+        self.__changed_songs -= songs
 
         # search in the selection first
         # speeds up common case: select songs and remove them
@@ -150,20 +150,77 @@ class TrackCurrentModel(ObjectStore):
         super(TrackCurrentModel, self).__init__(*args, **kwargs)
         self.__iter = None
 
+        # song -> {row key: iter}, built on the first lookup and then kept
+        # up to date, so lookups don't have to go through all rows
+        self.__index = None
+        # row key -> song
+        self.__rows = {}
+        self.__index_sigs = [
+            self.connect('row-inserted', self.__row_inserted),
+            self.connect('row-deleted', self.__row_deleted),
+            self.connect('row-changed', self.__row_changed),
+        ]
+
     last_current = None
     """The last valid current song"""
 
+    def __get_index(self):
+        if self.__index is None:
+            self.__index = {}
+            self.__rows = {}
+            for iter_, value in self.iterrows():
+                self.__add_row(iter_, value)
+        return self.__index
+
+    def __add_row(self, iter_, value):
+        key = iter_.user_data
+        self.__rows[key] = value
+        self.__index.setdefault(value, {})[key] = iter_
+
+    def __remove_row(self, iter_):
+        key = iter_.user_data
+        value = self.__rows.pop(key)
+        rows = self.__index[value]
+        del rows[key]
+        if not rows:
+            del self.__index[value]
+
+    def __row_inserted(self, model, path, iter_):
+        if self.__index is not None:
+            self.__add_row(iter_, self.get_value(iter_))
+
+    def __row_deleted(self, model, path):
+        # rows removed through remove() are handled there, for the rest we
+        # don't know which song is gone
+        self.__index = None
+
+    def __row_changed(self, model, path, iter_):
+        if self.__index is None:
+            return
+        value = self.get_value(iter_)
+        key = iter_.user_data
+        if key in self.__rows:
+            if self.__rows[key] is value:
+                return
+            self.__remove_row(iter_)
+        self.__add_row(iter_, value)
+
     def set(self, songs):
         """Clear the model and add the passed songs"""
 
         print_d("Filling view model with %d songs." % len(songs))
         self.clear()
         self.__iter = None
+        self.__index = None
 
         oldsong = self.last_current
+        for signal_id in self.__index_sigs:
+            self.handler_block(signal_id)
         for iter_, song in zip(self.iter_append_many(songs), songs):
             if song is oldsong:
                 self.__iter = iter_
+        for signal_id in self.__index_sigs:
+            self.handler_unblock(signal_id)
 
     def get(self):
         """A list of all contained songs"""
@@ -208,36 +265,57 @@ class TrackCurrentModel(ObjectStore):
         if self.current == song:
             return self.current_iter
 
-        # search the rest
-        for iter_, value in self.iterrows():
-            if value == song:
-                return iter_
-        return
+        rows = self.__get_index().get(song)
+        if not rows:
+            return
+        elif len(rows) == 1:
+            return next(iter(rows.values()))
+        return min(rows.values(), key=self.__get_position)
+
+    def __get_position(self, iter_):
+        return self.get_path(iter_).get_indices()[0]
 
     def find_all(self, songs):
         """Returns a list of iters for all occurrences of all songs.
         (since a song can be in the model multiple times)
         """
 
-        songs = set(songs)
+        index = self.__get_index()
         found = []
-        append = found.append
-        for iter_, value in self.iterrows():
-            if value in songs:
-                append(iter_)
+        for song in set(songs):
+            rows = index.get(song)
+            if rows:
+                found.extend(rows.values())
+        found.sort(key=self.__get_position)
         return found
 
     def remove(self, iter_):
         if self.__iter and self[iter_].path == self[self.__iter].path:
             self.__iter = None
-        super(TrackCurrentModel, self).remove(iter_)
+        if self.__index is not None:
+            self.__remove_row(iter_)
+        for signal_id in self.__index_sigs:
+            self.handler_block(signal_id)
+        try:
+            super(TrackCurrentModel, self).remove(iter_)
+        finally:
+            for signal_id in self.__index_sigs:
+                self.handler_unblock(signal_id)
 
     def clear(self):
         self.__iter = None
-        super(TrackCurrentModel, self).clear()
+        for signal_id in self.__index_sigs:
+            self.handler_block(signal_id)
+        try:
+            super(TrackCurrentModel, self).clear()
+        finally:
+            for signal_id in self.__index_sigs:
+                self.handler_unblock(signal_id)
+        self.__index = {}
+        self.__rows = {}
 
     def __contains__(self, song):
-        return bool(self.find(song))
+        return bool(self.__get_index().get(song))
 
 
 class PlaylistModel(TrackCurrentModel):
@@ -254,11 +332,28 @@ class PlaylistModel(TrackCurrentModel):
         self.order = order_cls()
 
         # The playorder plugins use paths atm to remember songs so
-        # we need to reset them if the paths change somehow.
-        self.__sigs = []
-        for sig in ['row-deleted', 'row-inserted', 'rows-reordered']:
-            s = self.connect(sig, lambda pl, *x: self.order.reset(pl))
-            self.__sigs.append(s)
+        # we need to tell them if the paths change somehow.
+        self.__sigs = [
+            self.connect('row-inserted', self.__row_inserted),
+            self.connect('row-deleted', self.__row_deleted),
+            self.connect('row-changed', self.__row_changed),
+            self.connect('rows-reordered',
+                         lambda pl, *x: self.order.reset(pl)),
+        ]
+
+    def __row_inserted(self, model, path, iter_):
+        self.order.row_inserted(self, path.get_indices()[0])
+
+    def __row_deleted(self, model, path):
+        self.order.row_deleted(self, path.get_indices()[0])
+
+    def __row_changed(self, model, path, iter_):
+        self.order.row_changed(self, path.get_indices()[0])
+
+    def songs_changed(self, songs):
+        """Tells the play order about songs changed in the library"""
+
+        self.order.songs_changed(self, songs)
 
     def next(self):
         """Switch to the next song"""
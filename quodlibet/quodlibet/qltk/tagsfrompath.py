@@ -18,17 +18,16 @@ from quodlibet import config
 from quodlibet import qltk
 from quodlibet import util
 
-from quodlibet.formats import AudioFileError
 from quodlibet.plugins import PluginManager
 from quodlibet.qltk._editutils import FilterPluginBox, FilterCheckButton
 from quodlibet.qltk._editutils import EditingPluginHandler, OverwriteWarning
-from quodlibet.qltk._editutils import WriteFailedError
-from quodlibet.qltk.wlw import WritingWindow
+from quodlibet.qltk._editutils import write_batch, changed_outside
 from quodlibet.qltk.views import TreeViewColumn
 from quodlibet.qltk.cbes import ComboBoxEntrySave
 from quodlibet.qltk.models import ObjectStore
 from quodlibet.qltk import Icons
 from quodlibet.util.tagsfrompath import TagsFromPattern
+from quodlibet.util.tagwriter import WriteBatch
 from quodlibet.util.string.splitters import split_value
 from quodlibet.util import connect_obj
 
@@ -274,23 +273,21 @@ class TagsFromPath(Gtk.VBox):
         pattern = TagsFromPattern(pattern_text)
         model = self.view.get_model()
         add = bool(addreplace.get_active())
-        win = WritingWindow(self, len(model))
-        win.show()
-
-        was_changed = set()
+        batch = WriteBatch(library)
+        to_write = []
 
         all_done = False
         for entry in ((model and model.values()) or []):
             song = entry.song
             changed = False
-            if not song.valid():
-                win.hide()
+            if changed_outside(song):
                 dialog = OverwriteWarning(self, song)
                 resp = dialog.run()
-                win.show()
                 if resp != OverwriteWarning.RESPONSE_SAVE:
                     break
 
+            batch.record(song)
+
             for i, h in enumerate(pattern.headers):
                 text = entry.get_match(h)
                 if text:
@@ -305,23 +302,16 @@ class TagsFromPath(Gtk.VBox):
                                 changed = True
 
             if changed:
-                try:
-                    song.write()
-                except AudioFileError:
-                    util.print_exc()
-                    WriteFailedError(self, song).run()
-                    library.reload(song, changed=was_changed)
-                    break
-                was_changed.add(song)
-
-            if win.step():
-                break
+                to_write.append(song)
         else:
             all_done = True
 
-        win.destroy()
-        library.changed(was_changed)
-        self.save.set_sensitive(not all_done)
+        self.save.set_sensitive(False)
+
+        def written_cb(batch):
+            self.save.set_sensitive(not all_done or bool(batch.failed))
+
+        write_batch(self, batch, to_write, written_cb)
 
     def __row_edited(self, renderer, path, new, model, header):
         entry = model[path][0]
@@ -9,16 +9,15 @@ from gi.repository import Gtk
 from senf import fsn2text
 
 from quodlibet import qltk
-from quodlibet import util
 from quodlibet import _
-from quodlibet.formats import AudioFileError
-from quodlibet.qltk._editutils import OverwriteWarning, WriteFailedError
+from quodlibet.qltk._editutils import OverwriteWarning, write_batch, \
+    changed_outside
 from quodlibet.qltk.views import HintedTreeView, TreeViewColumn
-from quodlibet.qltk.wlw import WritingWindow
 from quodlibet.qltk.x import Button, Align
 from quodlibet.qltk.models import ObjectStore
 from quodlibet.qltk import Icons
 from quodlibet.util import connect_obj
+from quodlibet.util.tagwriter import WriteBatch
 
 
 class Entry(object):
@@ -150,39 +149,33 @@ class TrackNumbers(Gtk.VBox):
             model.path_changed(path)
 
     def __save_files(self, parent, model, library):
-        win = WritingWindow(parent, len(model))
-        was_changed = set()
+        batch = WriteBatch(library)
+        to_write = []
         all_done = False
         for entry in model.values():
             song, track = entry.song, entry.tracknumber
             if song.get("tracknumber") == track:
-                win.step()
                 continue
-            if not song.valid():
-                win.hide()
+            if changed_outside(song):
                 dialog = OverwriteWarning(self, song)
                 resp = dialog.run()
-                win.show()
                 if resp != OverwriteWarning.RESPONSE_SAVE:
                     break
+            batch.record(song)
             song["tracknumber"] = track
-            try:
-                song.write()
-            except AudioFileError:
-                util.print_exc()
-                WriteFailedError(self, song).run()
-                library.reload(song, changed=was_changed)
-                break
-            was_changed.add(song)
-            if win.step():
-                break
+            to_write.append(song)
         else:
             all_done = True
 
-        library.changed(was_changed)
-        win.destroy()
-        self.save.set_sensitive(not all_done)
-        self.revert.set_sensitive(not all_done)
+        self.save.set_sensitive(False)
+        self.revert.set_sensitive(False)
+
+        def written_cb(batch):
+            not_done = not all_done or bool(batch.failed)
+            self.save.set_sensitive(not_done)
+            self.revert.set_sensitive(not_done)
+
+        write_batch(self, batch, to_write, written_cb)
 
     def __preview_tracks(self, ctx, start, total, model, save, revert):
         start = start.get_value_as_int()
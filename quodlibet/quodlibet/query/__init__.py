@@ -4,6 +4,7 @@
 # (at your option) any later version.
 
 from ._query import Query, QueryType
+from ._index import TagIndex
 
 
-Query, QueryType
+Query, QueryType, TagIndex
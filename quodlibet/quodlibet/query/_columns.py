@@ -0,0 +1,295 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""A column based snapshot of the numeric tags of all songs in a library,
+used for evaluating numeric comparisons and sorting many songs at once.
+
+Uses NumPy if available, plain lists otherwise.
+"""
+
+import math
+import operator
+import time
+from array import array
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from quodlibet import config
+from quodlibet import print_d
+from quodlibet.formats import TIME_TAGS
+
+
+TOLERANCE = 0.05
+"""Results of comparisons within this distance get included, to make up for
+the rounding the per-song evaluation does"""
+
+NAN = float("nan")
+
+
+def can_store(tag):
+    """If the numeric values of `tag` can be kept in a column"""
+
+    return (isinstance(tag, str) and tag.startswith("~#") and
+            ":" not in tag and "~" not in tag[2:])
+
+
+class _Column(object):
+
+    def __init__(self, tag):
+        self.tag = tag
+        # NaN for missing values
+        self.values = array("d")
+        # songs with values which can't be represented by a float
+        self.unknown = set()
+
+    def get_value(self, song):
+        if self.tag == "~#rating":
+            # the default rating can change, so fill it in when used
+            value = dict.get(song, self.tag)
+        else:
+            value = song(self.tag, None)
+
+        if value is None:
+            return NAN
+        try:
+            value = float(value)
+        except (TypeError, ValueError, OverflowError):
+            value = NAN
+        if not math.isfinite(value):
+            self.unknown.add(song)
+        return value
+
+    @property
+    def default(self):
+        """The value missing values get sorted as"""
+
+        if self.tag == "~#rating":
+            return config.RATINGS.default
+        return 0
+
+
+class NumericColumns(object):
+    """Keeps the values of numeric tags of all songs in a library in
+    arrays, one per tag. The column for a tag gets created the first time
+    it is used and is kept up to date through the library signals
+    afterwards.
+    """
+
+    def __init__(self, library):
+        self._library = library
+        self._songs = []
+        # id(song) -> row, ids are faster than the Python level song hash
+        self._rows = {}
+        self._columns = {}
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self._loaded = True
+            self.add(self._library.values())
+
+    def destroy(self):
+        self._songs = []
+        self._rows.clear()
+        self._columns.clear()
+        self._loaded = False
+
+    def add(self, songs):
+        if not self._loaded:
+            return
+        rows = self._rows
+        all_songs = self._songs
+        columns = self._columns.values()
+        for song in songs:
+            if id(song) in rows:
+                continue
+            rows[id(song)] = len(all_songs)
+            all_songs.append(song)
+            for column in columns:
+                column.values.append(column.get_value(song))
+
+    def remove(self, songs):
+        rows = self._rows
+        all_songs = self._songs
+        columns = self._columns.values()
+        for song in songs:
+            row = rows.pop(id(song), None)
+            if row is None:
+                continue
+            # move the last row into the free one
+            last = all_songs.pop()
+            for column in columns:
+                column.unknown.discard(song)
+                value = column.values.pop()
+                if last is not song:
+                    column.values[row] = value
+            if last is not song:
+                all_songs[row] = last
+                rows[id(last)] = row
+
+    def changed(self, songs):
+        rows = self._rows
+        columns = self._columns.values()
+        for song in songs:
+            row = rows.get(id(song))
+            if row is None:
+                continue
+            for column in columns:
+                column.unknown.discard(song)
+                column.values[row] = column.get_value(song)
+
+    def _get_column(self, tag):
+        self._ensure_loaded()
+        column = self._columns.get(tag)
+        if column is None:
+            print_d("Building numeric column for %r" % tag)
+            column = _Column(tag)
+            column.values.extend(column.get_value(s) for s in self._songs)
+            self._columns[tag] = column
+        return column
+
+    def _get_unknown(self):
+        unknown = set()
+        for column in self._columns.values():
+            unknown.update(column.unknown)
+        return unknown
+
+    def get(self, tag):
+        """Returns the values of `tag` for all songs (NaN if missing), as
+        used by `NumexprTag`, or None if `tag` isn't supported.
+        """
+
+        if not can_store(tag):
+            return None
+
+        column = self._get_column(tag)
+        values = column.values
+        if numpy is not None:
+            values = numpy.array(values, dtype=numpy.float64)
+            if tag in TIME_TAGS:
+                values = time.time() - values
+            elif tag == "~#rating":
+                values[numpy.isnan(values)] = column.default
+        else:
+            values = list(values)
+            if tag in TIME_TAGS:
+                now = time.time()
+                values = [now - v for v in values]
+            elif tag == "~#rating":
+                default = column.default
+                values = [default if v != v else v for v in values]
+        return values
+
+    def negate(self, values):
+        """Negates the result of get() or a number"""
+
+        if isinstance(values, list):
+            return [-v for v in values]
+        return -values
+
+    def binary(self, op, values, values2):
+        """Combines the result of get() or numbers, or returns None if `op`
+        isn't supported.
+        """
+
+        if op not in (operator.add, operator.sub):
+            return None
+
+        if numpy is not None or not (isinstance(values, list) or
+                                     isinstance(values2, list)):
+            return op(values, values2)
+
+        if not isinstance(values, list):
+            return [op(values, v) for v in values2]
+        elif not isinstance(values2, list):
+            return [op(v, values2) for v in values]
+        return [op(v, v2) for v, v2 in zip(values, values2)]
+
+    def compare(self, values, op, values2):
+        """Returns a set of songs for which the comparison of the results
+        of get() might be True, or None in case it can't be evaluated.
+        """
+
+        # only numbers, or non finite ones we can't handle
+        for value in (values, values2):
+            if isinstance(value, (int, float)) and not math.isfinite(value):
+                return None
+        if isinstance(values, (int, float)) and \
+                isinstance(values2, (int, float)):
+            return None
+
+        # missing values are NaN and never match
+        diff = self.binary(operator.sub, values, values2)
+        if numpy is not None:
+            if op is operator.lt:
+                mask = diff < TOLERANCE
+            elif op is operator.le:
+                mask = diff <= TOLERANCE
+            elif op is operator.gt:
+                mask = diff > -TOLERANCE
+            elif op is operator.ge:
+                mask = diff >= -TOLERANCE
+            elif op is operator.eq:
+                mask = numpy.abs(diff) <= TOLERANCE
+            else:
+                mask = ~numpy.isnan(diff)
+            found = set(map(self._songs.__getitem__,
+                            numpy.flatnonzero(mask).tolist()))
+        else:
+            if op in (operator.lt, operator.le):
+                match = lambda d: d < TOLERANCE
+            elif op in (operator.gt, operator.ge):
+                match = lambda d: d > -TOLERANCE
+            elif op is operator.eq:
+                match = lambda d: abs(d) <= TOLERANCE
+            else:
+                match = lambda d: d == d
+            found = {s for s, d in zip(self._songs, diff) if match(d)}
+
+        return found | self._get_unknown()
+
+    def sort(self, songs, tag, reverse=False):
+        """Sorts `songs` in place like `AudioFile.sort_by_func(tag)` would.
+
+        Returns False and leaves `songs` alone in case some songs aren't
+        known or the tag isn't supported.
+        """
+
+        if not can_store(tag):
+            return False
+
+        column = self._get_column(tag)
+        if column.unknown and not column.unknown.isdisjoint(songs):
+            return False
+        rows = map(self._rows.__getitem__, map(id, songs))
+        default = column.default
+        try:
+            if numpy is not None:
+                indices = numpy.fromiter(
+                    rows, dtype=numpy.intp, count=len(songs))
+            else:
+                indices = list(rows)
+        except KeyError:
+            return False
+
+        if numpy is not None:
+            keys = numpy.array(column.values, dtype=numpy.float64)
+            keys = keys.take(indices)
+            keys[numpy.isnan(keys)] = default
+            if reverse:
+                keys = -keys
+            order = numpy.argsort(keys, kind="stable").tolist()
+        else:
+            values = column.values
+            keys = [values[i] for i in indices]
+            keys = [default if k != k else k for k in keys]
+            order = sorted(
+                range(len(keys)), key=keys.__getitem__, reverse=reverse)
+
+        songs[:] = list(map(songs.__getitem__, order))
+        return True
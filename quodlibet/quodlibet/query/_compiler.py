@@ -0,0 +1,116 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import math
+import time
+from contextlib import contextmanager
+
+from senf import fsn2text, fsnative
+
+from quodlibet.util import parse_date
+
+
+class QueryCompiler(object):
+    """Compiles a tree of query nodes into a single Python function taking
+    a song and returning whether it matches.
+
+    Tag lookups and numeric comparisons get inlined with all the
+    information known beforehand (tag names, operators, constant
+    expressions) resolved, nodes which don't know how to compile
+    themselves get called through their search() method.
+    """
+
+    def __init__(self):
+        self._scope = {
+            "_time": time.time,
+            "_fsn2text": fsn2text,
+            "_fs_default": fsnative(),
+            "_parse_date": parse_date,
+            "_inf": float("inf"),
+        }
+        self._bound = {}
+        self._functions = []
+        self._variables = 0
+        self._time = None
+        self.source = None
+
+    def bind(self, obj):
+        """Makes `obj` available to the generated code and returns the
+        name under which it can be accessed
+        """
+
+        key = id(obj)
+        if key not in self._bound:
+            name = "_b%d" % len(self._bound)
+            self._scope[name] = obj
+            # keep a reference so the id stays valid
+            self._bound[key] = (name, obj)
+        return self._bound[key][0]
+
+    def constant(self, value):
+        """Returns an expression for a numeric constant"""
+
+        if isinstance(value, (int, float)) and math.isfinite(value):
+            return repr(value)
+        return self.bind(value)
+
+    def variable(self):
+        """Returns a new unique local variable name"""
+
+        self._variables += 1
+        return "_v%d" % self._variables
+
+    @contextmanager
+    def time_scope(self, lines):
+        """All time() calls in the context will refer to one value, which
+        gets computed at the start of `lines` if needed
+        """
+
+        old = self._time
+        self._time = None
+        start = len(lines)
+        try:
+            yield
+        finally:
+            if self._time is not None:
+                lines.insert(start, "%s = _time()" % self._time)
+            self._time = old
+
+    def time(self):
+        """Returns an expression for the current time"""
+
+        if self._time is None:
+            self._time = self.variable()
+        return self._time
+
+    def function(self, lines):
+        """Defines a function taking a song `s` with the body `lines` and
+        returns its name
+        """
+
+        name = "_f%d" % len(self._functions)
+        self._functions.append(self._define(name, lines))
+        return name
+
+    def _define(self, name, lines):
+        body = "\n".join("    " + l for l in lines)
+        return "def %s(s):\n%s\n" % (name, body)
+
+    def compile(self, node):
+        """Returns a function taking a song and returning whether `node`
+        matches it, same as `node.search`
+        """
+
+        lines = node._compile_guard(self) + ["return True"]
+        main = self._define("search", lines)
+        self.source = code = "\n".join(self._functions + [main])
+        exec(compile(code, "<query>", "exec"), self._scope)
+        return self._scope["search"]
+
+
+def compile_query(node):
+    """Returns a compiled version of `node.search`"""
+
+    return QueryCompiler().compile(node)
@@ -0,0 +1,356 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""An inverted index of the words in tag values, which can be used to
+narrow down the songs a query has to be checked against.
+
+Words get folded (case, diacritics and the variants used by the
+asymmetric search in `quodlibet.unisearch`) so that everything a query
+regex can match is a superset of what the index returns.
+"""
+
+import re
+import sre_parse
+import unicodedata
+from collections import OrderedDict
+
+from senf import fsn2text, fsnative
+
+from quodlibet import print_d
+from quodlibet.formats import FILESYSTEM_TAGS
+from quodlibet.unisearch.db import get_replacement_mapping
+from quodlibet.util import cached_func, tagsplit
+from ._columns import NumericColumns
+
+
+MIN_WORD_LENGTH = 3
+"""Literal parts of a query shorter than this don't get looked up"""
+
+SONG_TAGS = {
+    "~people", "~people:real", "~people:roles", "~peoplesort",
+    "~peoplesort:roles", "~performer", "~performers", "~performersort",
+    "~performerssort", "~performer:roles", "~performers:roles",
+    "~performersort:roles", "~performerssort:roles", "~length", "~uri",
+    "~format", "~codec", "~encoding", "~language", "~bitrate", "~year",
+    "~originalyear", "~filesize",
+}
+"""Synthesized tags whose values only depend on the song itself"""
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def _simple_case(char):
+    # only use 1:1 case mappings, like the re module does
+    lower = char.lower()
+    if len(lower) == 1:
+        char = lower
+    upper = char.upper()
+    if len(upper) == 1:
+        char = upper
+    lower = char.lower()
+    return lower if len(lower) == 1 else char
+
+
+def _strip_marks(text):
+    return u"".join(c for c in unicodedata.normalize("NFKD", text)
+                    if not unicodedata.combining(c))
+
+
+@cached_func
+def _get_variant_mapping():
+    """Returns a dict mapping each char sequence which is a variant of
+    another one (see `get_replacement_mapping`) to a representative of
+    all sequences that are variants of each other.
+    """
+
+    parent = {}
+
+    def find(x):
+        while parent.get(x, x) != x:
+            x = parent[x]
+        return x
+
+    def rank(x):
+        # prefer long sequences, so that single chars fold to the
+        # sequences they can replace
+        return (-len(x), not all(ord(c) < 128 for c in x), x)
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a == b:
+            return
+        if rank(a) < rank(b):
+            parent[b] = a
+        else:
+            parent[a] = b
+
+    for key, variants in get_replacement_mapping().items():
+        key = u"".join(map(_simple_case, key))
+        parent.setdefault(key, key)
+        for variant in variants:
+            variant = u"".join(map(_simple_case, variant))
+            parent.setdefault(variant, variant)
+            union(key, variant)
+
+    return {k: find(k) for k in parent}
+
+
+_fold_cache = {}
+
+
+def _fold_char(char):
+    try:
+        return _fold_cache[char]
+    except KeyError:
+        pass
+
+    # guard against cycles
+    _fold_cache[char] = char
+
+    case = _simple_case(char)
+    if case != char:
+        folded = _fold_char(case)
+    else:
+        rep = _get_variant_mapping().get(char)
+        if rep is not None:
+            if rep != char:
+                folded = u"".join(map(_fold_char, rep))
+            else:
+                folded = char
+        else:
+            stripped = _strip_marks(char)
+            if stripped and stripped != char:
+                folded = u"".join(map(_fold_char, stripped))
+            else:
+                folded = char
+
+    _fold_cache[char] = folded
+    return folded
+
+
+def fold(text):
+    """Returns a normalized version of `text` where all chars which
+    a search regex can match the same way (case insensitive, with
+    diacritics) are replaced by the same char sequence.
+    """
+
+    text = unicodedata.normalize("NFC", text)
+    return u"".join(map(_fold_char, text))
+
+
+def get_words(text):
+    """Returns a set of folded words contained in `text`"""
+
+    return set(_WORD.findall(fold(text)))
+
+
+def get_required_words(pattern):
+    """Returns a list of folded (partial) words, which any text matching the
+    regex `pattern` has to contain, or an empty list in case that can't be
+    determined.
+    """
+
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return []
+
+    literals = []
+    run = []
+    for op, av in parsed:
+        if op == sre_parse.LITERAL:
+            run.append(chr(av))
+        elif run:
+            literals.append(u"".join(run))
+            run = []
+    if run:
+        literals.append(u"".join(run))
+
+    words = set()
+    for literal in literals:
+        words.update(get_words(literal))
+    return [w for w in words if len(w) >= MIN_WORD_LENGTH]
+
+
+def can_index(name):
+    """If the values of the tag `name` only depend on the song itself"""
+
+    if not name or name[:1] == "#" or name[:2] == "~#":
+        return False
+    if name[:1] != "~" or name in FILESYSTEM_TAGS or name in SONG_TAGS:
+        return True
+    if "~" in name[1:]:
+        # tied tags
+        return all(can_index(tag) for tag in tagsplit(name))
+    return False
+
+
+def get_tag_text(song, name):
+    """The text `Tag.search` uses for searching in the tag `name`"""
+
+    if name[:1] == "~":
+        return fsn2text(song(name, fsnative()))
+
+    value = song.get(name)
+    if value is None:
+        if name in ("filename", "mountpoint"):
+            value = fsn2text(song.get("~" + name, fsnative()))
+        else:
+            value = song.get("~" + name, u"")
+    return value
+
+
+class _TagWords(object):
+    """Maps words of one tag to songs"""
+
+    MAX_LOOKUPS = 64
+
+    def __init__(self, name):
+        self.name = name
+        # word -> set of songs
+        self._songs = {}
+        # song -> set of words
+        self._words = {}
+        # recent word lookups, part of word -> set of words
+        self._lookups = OrderedDict()
+
+    def add(self, songs):
+        new = []
+        index = self._songs
+        for song in songs:
+            words = get_words(get_tag_text(song, self.name))
+            self._words[song] = words
+            for word in words:
+                entry = index.get(word)
+                if entry is None:
+                    entry = index[word] = set()
+                    new.append(word)
+                entry.add(song)
+
+        if new:
+            for part, words in self._lookups.items():
+                words.update(w for w in new if part in w)
+
+    def remove(self, songs):
+        index = self._songs
+        for song in songs:
+            for word in self._words.pop(song, ()):
+                entry = index[word]
+                entry.discard(song)
+                if not entry:
+                    del index[word]
+
+    def _lookup(self, part):
+        lookups = self._lookups
+        words = lookups.get(part)
+        if words is not None:
+            lookups.move_to_end(part)
+            return words
+
+        # while typing, a shorter version of the same part was likely
+        # looked up before
+        source = self._songs
+        for other, other_words in lookups.items():
+            if other in part and len(other_words) < len(source):
+                source = other_words
+
+        words = {w for w in source if part in w}
+        lookups[part] = words
+        if len(lookups) > self.MAX_LOOKUPS:
+            lookups.popitem(last=False)
+        return words
+
+    def find(self, parts):
+        index = self._songs
+        result = None
+        for part in sorted(parts, key=len, reverse=True):
+            found = set()
+            for word in self._lookup(part):
+                found.update(index.get(word, ()))
+            result = found if result is None else result & found
+            if not result:
+                break
+        return result
+
+
+class TagIndex(object):
+    """An index of the words in tag values of all songs in a library.
+
+    The index for a tag gets built the first time it is used and is kept
+    up to date through the library signals afterwards.
+
+    Numeric tags are kept in `columns`, a `NumericColumns`.
+    """
+
+    def __init__(self, library):
+        self._library = library
+        self._tags = {}
+        self.columns = NumericColumns(library)
+        self._sigs = [
+            library.connect('added', self.__added),
+            library.connect('removed', self.__removed),
+            library.connect('changed', self.__changed),
+        ]
+
+    def destroy(self):
+        for sig in self._sigs:
+            self._library.disconnect(sig)
+        self._sigs = []
+        self._tags.clear()
+        self.columns.destroy()
+
+    def __added(self, library, songs):
+        for tag in self._tags.values():
+            tag.add(songs)
+        self.columns.add(songs)
+
+    def __removed(self, library, songs):
+        for tag in self._tags.values():
+            tag.remove(songs)
+        self.columns.remove(songs)
+
+    def __changed(self, library, songs):
+        for tag in self._tags.values():
+            tag.remove(songs)
+            tag.add(songs)
+        self.columns.changed(songs)
+
+    def find(self, name, words):
+        """Returns a set of songs which contain all (partial) `words` in the
+        tag `name`, or None if that tag can't be indexed.
+
+        The result can contain songs which don't match, but it includes
+        all songs which do.
+        """
+
+        tag = self._tags.get(name)
+        if tag is None:
+            if not can_index(name):
+                return None
+            print_d("Building query index for %r" % name)
+            tag = _TagWords(name)
+            tag.add(self._library.values())
+            self._tags[name] = tag
+        return tag.find(words)
+
+    def scan(self, names, search):
+        """Returns a set of songs for which `search` matches the text of
+        one of the tags `names`, checking all songs.
+        """
+
+        result = set()
+        for song in self._library.values():
+            for name in names:
+                if search(get_tag_text(song, name)):
+                    result.add(song)
+                    break
+        return result
+
+    def candidates(self, query):
+        """Returns a set of songs which includes all songs matching the
+        query or None if the index can't help for this query.
+        """
+
+        return query.candidates(self)
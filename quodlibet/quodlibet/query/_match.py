@@ -15,8 +15,9 @@ import operator
 from senf import fsn2text, fsnative
 
 from quodlibet.unisearch import compile
-from quodlibet.util import parse_date
+from quodlibet.util import parse_date, cached_property
 from quodlibet.formats import FILESYSTEM_TAGS, TIME_TAGS
+from ._index import get_required_words, can_index
 
 
 class error(ValueError):
@@ -29,12 +30,45 @@ class ParseError(error):
 
 class Node(object):
 
+    cost = 50
+    """Estimated relative cost of a search() call, used for deciding in which
+    order to evaluate nodes. Cheap numeric comparisons are 1.
+    """
+
     def search(self, data):
         raise NotImplementedError
 
     def filter(self, sequence):
         return [s for s in sequence if self.search(s)]
 
+    def candidates(self, index):
+        """Returns a set of songs from the `TagIndex` which includes all
+        songs matching, or None if the index can't tell.
+        """
+
+        return None
+
+    def tag_candidates(self, index, name):
+        """Like candidates(), but for a value matched against the tag
+        `name`.
+        """
+
+        return None
+
+    def _compile(self, compiler):
+        """Returns a Python expression for the result of search(s),
+        see `QueryCompiler`.
+        """
+
+        return "%s(s)" % compiler.bind(self.search)
+
+    def _compile_guard(self, compiler):
+        """Returns lines of Python code which return False in case
+        search(s) would be False.
+        """
+
+        return ["if not %s:" % self._compile(compiler), "    return False"]
+
     def _unpack(self):
         return self
 
@@ -63,6 +97,15 @@ class Regex(Node):
             raise ParseError(
                 "The regular expression /%s/ is invalid." % self.pattern)
 
+    @cached_property
+    def _words(self):
+        return get_required_words(self.pattern)
+
+    def tag_candidates(self, index, name):
+        if not self._words:
+            return None
+        return index.find(name, self._words)
+
     def __repr__(self):
         return "<Regex pattern=%s mod=%s>" % (self.pattern, self.mod_string)
 
@@ -70,12 +113,20 @@ class Regex(Node):
 class True_(Node):
     """Always True"""
 
+    cost = 0
+
     def search(self, data):
         return True
 
     def filter(self, list_):
         return list(list_)
 
+    def _compile(self, compiler):
+        return "True"
+
+    def _compile_guard(self, compiler):
+        return []
+
     def __repr__(self):
         return "<True>"
 
@@ -90,12 +141,26 @@ class True_(Node):
 class False_(Node):
     """Always False"""
 
+    cost = 0
+
     def search(self, data):
         return False
 
     def filter(self, list_):
         return []
 
+    def candidates(self, index):
+        return set()
+
+    def tag_candidates(self, index, name):
+        return set()
+
+    def _compile(self, compiler):
+        return "False"
+
+    def _compile_guard(self, compiler):
+        return ["return False"]
+
     def __repr__(self):
         return "<False>"
 
@@ -113,12 +178,39 @@ class Union(Node):
     def __init__(self, res):
         self.res = res
 
+    @property
+    def cost(self):
+        return sum(r.cost for r in self.res)
+
     def search(self, data):
         for re in self.res:
             if re.search(data):
                 return True
         return False
 
+    def candidates(self, index):
+        result = set()
+        for re in self.res:
+            found = re.candidates(index)
+            if found is None:
+                return None
+            result |= found
+        return result
+
+    def tag_candidates(self, index, name):
+        result = set()
+        for re in self.res:
+            found = re.tag_candidates(index, name)
+            if found is None:
+                return None
+            result |= found
+        return result
+
+    def _compile(self, compiler):
+        if not self.res:
+            return "False"
+        return "(%s)" % " or ".join(r._compile(compiler) for r in self.res)
+
     def __repr__(self):
         return "<Union %r>" % self.res
 
@@ -147,6 +239,10 @@ class Inter(Node):
     def __init__(self, res):
         self.res = res
 
+    @property
+    def cost(self):
+        return sum(r.cost for r in self.res)
+
     def search(self, data):
         for re in self.res:
             if not re.search(data):
@@ -161,6 +257,33 @@ class Inter(Node):
             current = list(current)
         return current
 
+    def candidates(self, index):
+        result = None
+        for re in self.res:
+            found = re.candidates(index)
+            if found is not None:
+                result = found if result is None else result & found
+        return result
+
+    def tag_candidates(self, index, name):
+        result = None
+        for re in self.res:
+            found = re.tag_candidates(index, name)
+            if found is not None:
+                result = found if result is None else result & found
+        return result
+
+    def _compile(self, compiler):
+        if not self.res:
+            return "True"
+        return "(%s)" % " and ".join(r._compile(compiler) for r in self.res)
+
+    def _compile_guard(self, compiler):
+        lines = []
+        for re in self.res:
+            lines.extend(re._compile_guard(compiler))
+        return lines
+
     def __repr__(self):
         return "<Inter %r>" % self.res
 
@@ -188,9 +311,16 @@ class Neg(Node):
     def __init__(self, res):
         self.res = res
 
+    @property
+    def cost(self):
+        return self.res.cost
+
     def search(self, data):
         return not self.res.search(data)
 
+    def _compile(self, compiler):
+        return "(not %s)" % self.res._compile(compiler)
+
     def __repr__(self):
         return "<Neg %r>" % self.res
 
@@ -213,6 +343,8 @@ class Neg(Node):
 class Numcmp(Node):
     """Numeric comparisons"""
 
+    cost = 1
+
     operators = {
         "<": operator.lt,
         "<=": operator.le,
@@ -223,6 +355,15 @@ class Numcmp(Node):
         "!=": operator.ne,
     }
 
+    symbols = {
+        operator.lt: "<",
+        operator.le: "<=",
+        operator.gt: ">",
+        operator.ge: ">=",
+        operator.eq: "==",
+        operator.ne: "!=",
+    }
+
     def __init__(self, expr, op, expr2):
         self._expr = expr
         self._op = self.operators[op]
@@ -237,6 +378,31 @@ class Numcmp(Node):
             return self._op(val, val2)
         return False
 
+    def candidates(self, index):
+        columns = index.columns
+        use_date = self._expr.use_date() or self._expr2.use_date()
+        val = self._expr._vectorize(columns, use_date)
+        val2 = self._expr2._vectorize(columns, use_date)
+        if val is None or val2 is None:
+            return None
+        return columns.compare(val, self._op, val2)
+
+    def _compile(self, compiler):
+        lines = self._compile_guard(compiler) + ["return True"]
+        return "%s(s)" % compiler.function(lines)
+
+    def _compile_guard(self, compiler):
+        use_date = self._expr.use_date() or self._expr2.use_date()
+        lines = []
+        with compiler.time_scope(lines):
+            val = self._expr._compile(compiler, lines, use_date)
+            val2 = self._expr2._compile(compiler, lines, use_date)
+        lines.extend([
+            "if not %s %s %s:" % (val, self.symbols[self._op], val2),
+            "    return False",
+        ])
+        return lines
+
     def __repr__(self):
         return "<Numcmp expr=%r, op=%r, expr2=%r>" % (
             self._expr, self._op.__name__, self._expr2)
@@ -269,6 +435,35 @@ class Numexpr(object):
         values instead of the number values."""
         return False
 
+    def constant(self, use_date):
+        """Returns the value in case it doesn't depend on the song or the
+        current time, otherwise None"""
+        return None
+
+    def _vectorize(self, columns, use_date):
+        """Returns the values for all songs in the `NumericColumns`, a
+        number if they are all the same, or None if not supported"""
+        return self.constant(use_date)
+
+    def _compile(self, compiler, lines, use_date):
+        """Appends lines of Python code to `lines` which compute the value
+        (and return False in case it is None) and returns an expression for
+        the result, see `QueryCompiler`.
+        """
+
+        value = self.constant(use_date)
+        if value is not None:
+            return compiler.constant(value)
+
+        var = compiler.variable()
+        lines.extend([
+            "%s = %s(s, %s, %r)" % (
+                var, compiler.bind(self.evaluate), compiler.time(), use_date),
+            "if %s is None:" % var,
+            "    return False",
+        ])
+        return var
+
 
 class NumexprTag(Numexpr):
     """Numeric tag"""
@@ -297,6 +492,40 @@ class NumexprTag(Numexpr):
             return round(num, 2)
         return None
 
+    def _vectorize(self, columns, use_date):
+        if self._tag == 'date':
+            return None
+        return columns.get(self._ftag)
+
+    def _compile(self, compiler, lines, use_date):
+        var = compiler.variable()
+        if self._tag == 'date':
+            lines.extend([
+                "%s = s('date')" % var,
+                "if not %s:" % var,
+                "    return False",
+                "try:",
+                "    %s = _parse_date(%s)" % (var, var),
+                "except ValueError:",
+                "    return False",
+                "%s = round(%s, 2)" % (var, var),
+            ])
+            return var
+
+        lines.extend([
+            "%s = s(%r, None)" % (var, self._ftag),
+            "if %s is None:" % var,
+            "    return False",
+        ])
+        func_start = self._ftag.find(":")
+        tag = self._ftag[:func_start] if func_start >= 0 else self._ftag
+        if tag in TIME_TAGS:
+            lines.append("%s = round(%s - %s, 2)" % (
+                var, compiler.time(), var))
+        else:
+            lines.append("%s = round(%s, 2)" % (var, var))
+        return var
+
     def __repr__(self):
         return "<NumexprTag tag=%r>" % self._tag
 
@@ -321,6 +550,24 @@ class NumexprUnary(Numexpr):
             return self.__op(val)
         return None
 
+    def constant(self, use_date):
+        val = self.__expr.constant(use_date)
+        if val is not None:
+            return self.__op(val)
+        return None
+
+    def _vectorize(self, columns, use_date):
+        val = self.__expr._vectorize(columns, use_date)
+        if val is not None:
+            return columns.negate(val)
+        return None
+
+    def _compile(self, compiler, lines, use_date):
+        value = self.constant(use_date)
+        if value is not None:
+            return compiler.constant(value)
+        return "(-%s)" % self.__expr._compile(compiler, lines, use_date)
+
     def __repr__(self):
         return "<NumexprUnary op=%r expr=%r>" % (self.__op, self.__expr)
 
@@ -345,6 +592,13 @@ class NumexprBinary(Numexpr):
         operator.floordiv: 2,
     }
 
+    symbols = {
+        operator.sub: "-",
+        operator.add: "+",
+        operator.mul: "*",
+        operator.floordiv: "//",
+    }
+
     def __init__(self, op, expr, expr2):
         self.__op = self.operators[op]
         self.__expr = expr
@@ -370,6 +624,46 @@ class NumexprBinary(Numexpr):
                 return val * float('inf')
         return None
 
+    def constant(self, use_date):
+        val = self.__expr.constant(use_date)
+        val2 = self.__expr2.constant(use_date)
+        if val is not None and val2 is not None:
+            try:
+                return self.__op(val, val2)
+            except ZeroDivisionError:
+                return val * float('inf')
+        return None
+
+    def _vectorize(self, columns, use_date):
+        value = self.constant(use_date)
+        if value is not None:
+            return value
+        val = self.__expr._vectorize(columns, use_date)
+        val2 = self.__expr2._vectorize(columns, use_date)
+        if val is not None and val2 is not None:
+            return columns.binary(self.__op, val, val2)
+        return None
+
+    def _compile(self, compiler, lines, use_date):
+        value = self.constant(use_date)
+        if value is not None:
+            return compiler.constant(value)
+
+        val = self.__expr._compile(compiler, lines, use_date)
+        val2 = self.__expr2._compile(compiler, lines, use_date)
+        var = compiler.variable()
+        if self.__op is operator.floordiv:
+            lines.extend([
+                "try:",
+                "    %s = %s // %s" % (var, val, val2),
+                "except ZeroDivisionError:",
+                "    %s = %s * _inf" % (var, val),
+            ])
+        else:
+            lines.append("%s = %s %s %s" % (
+                var, val, self.symbols[self.__op], val2))
+        return var
+
     def __repr__(self):
         return "<NumexprBinary op=%r expr=%r expr2=%r>" % (
             self.__op, self.__expr, self.__expr2)
@@ -387,6 +681,15 @@ class NumexprGroup(Numexpr):
     def evaluate(self, data, time, use_date):
         return self.__expr.evaluate(data, time, use_date)
 
+    def constant(self, use_date):
+        return self.__expr.constant(use_date)
+
+    def _vectorize(self, columns, use_date):
+        return self.__expr._vectorize(columns, use_date)
+
+    def _compile(self, compiler, lines, use_date):
+        return self.__expr._compile(compiler, lines, use_date)
+
     def __repr__(self):
         return "<NumexprGroup expr=%r>" % (self.__expr)
 
@@ -403,8 +706,11 @@ class NumexprNumber(Numexpr):
     def evaluate(self, data, time, use_date):
         return self._value
 
+    def constant(self, use_date):
+        return self._value
+
     def __repr__(self):
-        return "<NumexprNumber value=%.2f>" % (self._value)
+        return "<NumexprNumber value=%r>" % (self._value)
 
 
 class NumexprNow(Numexpr):
@@ -416,6 +722,13 @@ class NumexprNow(Numexpr):
     def evaluate(self, data, time, use_date):
         return time - self.__offset
 
+    def _vectorize(self, columns, use_date):
+        return time.time() - self.__offset
+
+    def _compile(self, compiler, lines, use_date):
+        return "(%s - %s)" % (
+            compiler.time(), compiler.constant(self.__offset))
+
     def __repr__(self):
         return "<NumexprNow offset=%r>" % (self.__offset)
 
@@ -439,6 +752,9 @@ class NumexprNumberOrDate(Numexpr):
         else:
             return self.number
 
+    def constant(self, use_date):
+        return self.evaluate(None, None, use_date)
+
     def __repr__(self):
         return ('<NumexprNumberOrDate number=%r date=%r>' %
             (self.number, self.date))
@@ -501,6 +817,11 @@ class Tag(Node):
              "d": "date",
              }
 
+    # relative costs of looking up the different kinds of tags
+    COST_TAG = 2
+    COST_INTERN = 4
+    COST_FS = 8
+
     def __init__(self, names, res):
         self.res = res
         self._names = []
@@ -519,6 +840,12 @@ class Tag(Node):
             else:
                 self._names.append(name)
 
+    @property
+    def cost(self):
+        return (self.COST_TAG * len(self._names) +
+                self.COST_INTERN * len(self.__intern) +
+                self.COST_FS * len(self.__fs))
+
     def search(self, data):
         search = self.res.search
         fs_default = fsnative()
@@ -544,8 +871,61 @@ class Tag(Node):
 
         return False
 
+    def _compile(self, compiler):
+        lines = self._compile_guard(compiler) + ["return True"]
+        return "%s(s)" % compiler.function(lines)
+
+    def _compile_guard(self, compiler):
+        search = compiler.bind(self.res.search)
+
+        values = []
+        for name in self._names:
+            if name in ("filename", "mountpoint"):
+                default = "_fsn2text(s.get(%r, _fs_default))" % ("~" + name)
+            else:
+                default = "s.get(%r, u'')" % ("~" + name)
+            values.append([
+                "v = s.get(%r)" % name,
+                "if v is None:",
+                "    v = " + default,
+            ])
+        for name in self.__intern:
+            values.append(["v = s(%r)" % name])
+        for name in self.__fs:
+            values.append(["v = _fsn2text(s(%r, _fs_default))" % name])
+
+        # check the next tag only if the previous one didn't match
+        lines = []
+        indent = ""
+        for value in values:
+            lines.extend(indent + l for l in value)
+            lines.append(indent + "if not %s(v):" % search)
+            indent += "    "
+        lines.append(indent + "return False")
+        return lines
+
+    def candidates(self, index):
+        names = self._names + self.__intern + self.__fs
+        result = set()
+        unindexed = []
+        for name in names:
+            if not can_index(name):
+                unindexed.append(name)
+                continue
+            found = self.res.tag_candidates(index, name)
+            if found is None:
+                return None
+            result |= found
+
+        if unindexed:
+            if len(unindexed) == len(names):
+                return None
+            # only these tags need to be checked for all songs
+            result |= index.scan(unindexed, self.res.search)
+        return result
+
     def __repr__(self):
-        names = self._names + self.__intern
+        names = self._names + self.__intern + self.__fs
         return ("<Tag names=%r, res=%r>" % (names, self.res))
 
     def __and__(self, other):
@@ -569,6 +949,8 @@ class Extension(Node):
     Raises a ParseError if no plugin is loaded for the name, or if the plugin
     fails to parse the body"""
 
+    cost = 50
+
     def __init__(self, name, body):
         # pulls in gtk+
         from quodlibet.plugins.query import QUERY_HANDLER, QueryPluginError
@@ -0,0 +1,124 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Reordering of the children of intersections and unions, so that the
+ones which are cheap and likely to decide the result get evaluated first.
+"""
+
+import threading
+from collections import OrderedDict
+
+from . import _match as match
+
+
+SAMPLE_SIZE = 64
+"""Number of songs used for measuring how many songs a node matches"""
+
+MIN_RATE = 0.01
+"""Lower bound for match rates, to keep the ordering stable"""
+
+
+class Selectivity(object):
+    """Remembers the fraction of songs nodes matched in recent queries"""
+
+    MAX_ENTRIES = 256
+
+    def __init__(self):
+        self._rates = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, node):
+        return repr(node) in self._rates
+
+    def get(self, node, default=0.5):
+        """Returns the fraction of songs `node` matches or `default`"""
+
+        key = repr(node)
+        with self._lock:
+            rate = self._rates.get(key)
+            if rate is None:
+                return default
+            self._rates.move_to_end(key)
+            return rate
+
+    def set(self, node, rate):
+        key = repr(node)
+        with self._lock:
+            self._rates[key] = rate
+            self._rates.move_to_end(key)
+            if len(self._rates) > self.MAX_ENTRIES:
+                self._rates.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._rates.clear()
+
+
+SELECTIVITY = Selectivity()
+"""The selectivity shared by all queries"""
+
+
+def _get_children(node):
+    """Yields all direct and indirect children of intersections and
+    unions in `node`
+    """
+
+    if isinstance(node, (match.Inter, match.Union)):
+        for child in node.res:
+            yield child
+            for sub in _get_children(child):
+                yield sub
+    elif isinstance(node, match.Neg):
+        for sub in _get_children(node.res):
+            yield sub
+
+
+def learn(node, songs, selectivity=SELECTIVITY):
+    """Measures how many songs the children of intersections and unions in
+    `node` match, using a sample of the list `songs`.
+
+    Returns True if anything new was learned.
+    """
+
+    if len(songs) < SAMPLE_SIZE:
+        return False
+
+    children = []
+    for child in _get_children(node):
+        if child not in selectivity and child not in children:
+            children.append(child)
+    if not children:
+        return False
+
+    sample = songs[::len(songs) // SAMPLE_SIZE][:SAMPLE_SIZE]
+    for child in children:
+        search = child.search
+        matched = sum(1 for song in sample if search(song))
+        selectivity.set(child, float(matched) / len(sample))
+    return True
+
+
+def optimize(node, selectivity=SELECTIVITY):
+    """Returns a node matching the same songs as `node`, but with the
+    children of intersections and unions ordered by their cost and the
+    likelihood of deciding the result.
+    """
+
+    def rate(child):
+        return max(MIN_RATE, min(1 - MIN_RATE, selectivity.get(child)))
+
+    if isinstance(node, match.Inter):
+        res = [optimize(r, selectivity) for r in node.res]
+        # the ones failing most often for the least cost first
+        res.sort(key=lambda r: r.cost / (1 - rate(r)))
+        return match.Inter(res)
+    elif isinstance(node, match.Union):
+        res = [optimize(r, selectivity) for r in node.res]
+        # the ones matching most often for the least cost first
+        res.sort(key=lambda r: r.cost / rate(r))
+        return match.Union(res)
+    elif isinstance(node, match.Neg):
+        return match.Neg(optimize(node.res, selectivity))
+    return node
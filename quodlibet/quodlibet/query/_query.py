@@ -11,6 +11,8 @@ from quodlibet import print_d
 from quodlibet.util.dprint import frame_info
 from . import _match as match
 from ._match import error, Node, False_
+from ._compiler import compile_query
+from ._optimize import optimize, learn
 from ._parser import QueryParser
 from quodlibet.util import re_escape, enum, cached_property
 
@@ -102,11 +104,21 @@ class Query(Node):
 
     @cached_property
     def search(self):
-        return self._match.search
+        return compile_query(optimize(self._match))
 
     @cached_property
     def filter(self):
-        return self._match.filter
+
+        def filter_(sequence):
+            if not isinstance(sequence, list):
+                sequence = list(sequence)
+            if "search" not in self.__dict__ and learn(self._match, sequence):
+                print_d("Reordering query %r" % self.string)
+            return list(filter(self.search, sequence))
+        return filter_
+
+    def candidates(self, index):
+        return self._match.candidates(index)
 
     @property
     def valid(self):
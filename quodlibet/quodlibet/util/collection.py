@@ -11,19 +11,21 @@ from __future__ import absolute_import
 
 import os
 import random
+from itertools import count
 
 from senf import fsnative, fsn2bytes, bytes2fsn
 
 from quodlibet import ngettext, _
 from quodlibet import util
 from quodlibet import config
-from quodlibet.formats._audio import TAG_TO_SORT, NUMERIC_ZERO_DEFAULT
+from quodlibet.formats._audio import TAG_TO_SORT, NUMERIC_ZERO_DEFAULT, \
+    get_change_serial
 from quodlibet.formats._audio import PEOPLE as _PEOPLE
 from collections import Iterable
 from quodlibet.util.path import escape_filename, unescape_filename
 from quodlibet.util.dprint import print_d
 from quodlibet.util.misc import total_ordering, hashable
-from .collections import HashedList
+from .collections import HashedList, LRUCache
 
 
 PEOPLE = list(_PEOPLE)
@@ -70,6 +72,56 @@ NUM_FUNCS = {
     "bav": bayesian_average
 }
 
+VALUE_CACHE_SIZE = 100000
+"""Number of synthesized values VALUE_CACHE holds at most"""
+
+VALUE_CACHE = LRUCache(VALUE_CACHE_SIZE)
+"""Synthesized values of all collections, keyed by (collection id, key).
+See `VALUE_CACHE.stats()` for the hit rate of collection lookups"""
+
+_ids = count()
+_MISSING = object()
+
+_FORMATTED_KEYS = {"length", "long-length", "tracks", "discs", "rating",
+                   "filesize"}
+
+_STORED_NUMERIC = NUMERIC_ZERO_DEFAULT | {"~#rating"}
+
+
+def _depends_on(key, tag):
+    """If the collection value for `key` can depend on the song tag `tag`,
+    None meaning any tag.
+    """
+
+    if tag is None or key == tag:
+        return True
+    elif key in ("~#tracks", "~tracks"):
+        # the number of songs
+        return False
+    elif tag[:1] == "~" and tag[:2] != "~#":
+        # ~filename and the like, e.g. the title falls back to it
+        return True
+    elif key[:1] != "~":
+        return False
+
+    numeric = tag[:2] == "~#"
+    base = key.split(":")[0]
+    if base in ("~people", "~peoplesort"):
+        return not numeric
+    elif base[:2] == "~#":
+        name = base[2:]
+    elif base[1:] in _FORMATTED_KEYS:
+        name = base[1:].replace("long-", "", 1)
+    else:
+        # anything else synthesized might use any tag
+        return True
+
+    if not numeric:
+        # only derived ones like ~#year (from date) use regular tags
+        return "~#" + name not in _STORED_NUMERIC
+    return (tag == "~#" + name or (name == "bitrate" and tag == "~#length")
+            or (name == "discs" and tag == "~#disc"))
+
 
 class Collection(object):
     """A collection of songs which implements some methods similar to the
@@ -79,22 +131,37 @@ class Collection(object):
     the songs attribute.
     """
 
-    _cache_size = 6
     songs = ()
 
     def __init__(self):
-        """Cache in _cache, LRU key order in _used, keys that return default
-        are in _default"""
-        self.__cache = {}
-        self.__default = set()
-        self.__used = []
+        """Values are cached in VALUE_CACHE, the change serial of each
+        cached key tells which song changes they already include"""
+        self.__id = next(_ids)
+        self.__serials = {}
 
-    def finalize(self):
+    def finalize(self, changed=None):
         """Finalize the collection.
-        Call this after songs get added or removed"""
-        self.__cache.clear()
-        self.__default.clear()
-        self.__used = []
+        Call this after songs get added or removed, or pass the songs
+        of which only tags changed. In the latter case only the values
+        depending on the changed tags get computed again.
+        """
+
+        serials = self.__serials
+        if changed is None:
+            keys = list(serials)
+        else:
+            changes = [song.get_tag_changes() for song in changed]
+            if None in changes:
+                # we don't know what changed
+                keys = list(serials)
+            else:
+                keys = [key for key, serial in serials.items()
+                        if any(s > serial and _depends_on(key, tag)
+                               for c in changes for tag, s in c.items())]
+
+        for key in keys:
+            del serials[key]
+            VALUE_CACHE.pop((self.__id, key), None)
 
     def get(self, key, default=u"", connector=u" - "):
         if not self.songs:
@@ -136,24 +203,18 @@ class Collection(object):
         return [] if v == "" else str(v).split("\n")
 
     def __get_cached_value(self, key):
-        if key in self.__cache:
-            self.__used.remove(key)
-            self.__used.insert(0, key)
-            return self.__cache[key]
-        elif key in self.__default:
-            return None
-        else:
+        cache_key = (self.__id, key)
+        val = VALUE_CACHE.get(cache_key, _MISSING)
+        if val is _MISSING:
+            # None (for default) gets cached as well
             val = self.__get_value(key)
-            if val is None:
-                self.__default.add(key)
-            else:
-                self.__used.insert(0, key)
-                self.__cache[key] = val
-            # Remove the oldest if the cache is full
-            if len(self.__used) > self._cache_size:
-                self.__cache.pop(self.__used.pop(-1))
+            self.__cache_value(key, val)
         return val
 
+    def __cache_value(self, key, value):
+        VALUE_CACHE[(self.__id, key)] = value
+        self.__serials[key] = get_change_serial()
+
     def __get_value(self, key):
         """This is similar to __call__ in the AudioFile class.
         All internal tags are changed to represent a collection of songs.
@@ -226,13 +287,8 @@ class Collection(object):
 
                 other, values = keys.popitem()
                 other = "~" + other
-                if not values:
-                    self.__default.add(other)
-                else:
-                    if other in self.__used:
-                        self.__used.remove(other)
-                    self.__used.append(other)
-                    self.__cache[other] = "\n".join(values)
+                self.__cache_value(
+                    other, (values and "\n".join(values)) or None)
                 return ret
             elif numkey == "length":
                 length = self.__get_value("~#" + key)
@@ -305,9 +361,10 @@ class Album(Collection):
     def str_key(self):
         return str(self.key)
 
-    def finalize(self):
-        """Finalize this album. Call after songs get added or removed"""
-        super(Album, self).finalize()
+    def finalize(self, changed=None):
+        """Finalize this album. Call after songs get added or removed,
+        or with the songs of which only tags changed"""
+        super(Album, self).finalize(changed)
         self.__dict__.pop("peoplesort", None)
         self.__dict__.pop("genre", None)
 
@@ -8,7 +8,9 @@
 
 from __future__ import absolute_import
 
-from collections import MutableSequence, defaultdict
+from bisect import bisect_right
+from collections import MutableSequence, defaultdict, OrderedDict
+from itertools import accumulate
 
 from .misc import total_ordering
 
@@ -207,3 +209,268 @@ class HashedList(MutableSequence):
 
     def __repr__(self):
         return repr(self._data)
+
+
+class LRUCache(object):
+    """A dict-like cache holding at most `max_size` items, dropping the
+    least recently used ones first.
+
+    Counts hits, misses and evictions for profiling.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value and marks it as recently used"""
+
+        data = self._data
+        try:
+            value = data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def __setitem__(self, key, value):
+        data = self._data
+        data[key] = value
+        data.move_to_end(key)
+        if len(data) > self.max_size:
+            data.popitem(last=False)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def pop(self, key, default=None):
+        """Removes the value and returns it, doesn't count as a lookup"""
+
+        return self._data.pop(key, default)
+
+    def clear(self):
+        self._data.clear()
+
+    @property
+    def hit_rate(self):
+        """The fraction of lookups which were hits"""
+
+        total = self.hits + self.misses
+        return float(self.hits) / total if total else 0.0
+
+    def stats(self):
+        """Returns a dict of the counters, for profiling"""
+
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hit_rate,
+        }
+
+    def reset_stats(self):
+        self.hits = self.misses = self.evictions = 0
+
+
+def _build_tree(values):
+    """Returns a binary tree of sums as a list, with the root at index 1
+    and the values as leaves starting at len(tree) // 2
+    """
+
+    values = list(values)
+    size = 1
+    while size < len(values):
+        size *= 2
+    tree = [0] * size + values + [0] * (size - len(values))
+    for p in range(size - 1, 0, -1):
+        tree[p] = tree[2 * p] + tree[2 * p + 1]
+    return tree
+
+
+def _set_leaf(tree, i, value):
+    """Sets the value of leaf `i` and updates the sums above it"""
+
+    p = len(tree) // 2 + i
+    tree[p] = value
+    p //= 2
+    while p:
+        tree[p] = tree[2 * p] + tree[2 * p + 1]
+        p //= 2
+
+
+def _find_leaf(tree, value):
+    """Returns the first leaf for which the sum of the leaves up to and
+    including it is larger than `value`, and `value` minus the sum of
+    the leaves before it.
+    """
+
+    size = len(tree) // 2
+    p = 1
+    while p < size:
+        p *= 2
+        if not value < tree[p]:
+            value -= tree[p]
+            p += 1
+    return p - size, value
+
+
+def _sum_before(tree, i):
+    """Returns the sum of the leaves before leaf `i`"""
+
+    p = len(tree) // 2 + i
+    total = 0
+    while p > 1:
+        if p & 1:
+            total += tree[p - 1]
+        p //= 2
+    return total
+
+
+class WeightedList(object):
+    """A list of non-negative weights which allows picking an index with a
+    probability proportional to its weight.
+
+    The weights are split into blocks, each keeping the running sums of
+    its weights. Trees of the block sums and block lengths find the block
+    for a pick or an index, so picking is O(log n). Changing, inserting
+    and removing weights is O(sqrt(n)) for updating the running sums of a
+    block, done by list operations.
+    """
+
+    BLOCK_SIZE = 512
+
+    def __init__(self, weights=()):
+        weights = list(weights)
+        size = self.BLOCK_SIZE
+        self._blocks = [
+            weights[i:i + size] for i in range(0, len(weights), size)]
+        self._sums = [list(accumulate(b)) for b in self._blocks]
+        self._len = len(weights)
+        self._rebuild()
+
+    def _rebuild(self):
+        """Builds the trees again after blocks got added or removed"""
+
+        self._sum_tree = _build_tree(s[-1] for s in self._sums)
+        self._len_tree = _build_tree(len(b) for b in self._blocks)
+
+    def _update(self, i):
+        """Updates the running sums and the trees after block `i` changed"""
+
+        block = self._blocks[i]
+        sums = self._sums[i]
+        sums[:] = accumulate(block)
+        _set_leaf(self._sum_tree, i, sums[-1])
+        _set_leaf(self._len_tree, i, len(block))
+
+    def __len__(self):
+        return self._len
+
+    def _locate(self, index):
+        """Returns the block number and the position in that block"""
+
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError(index)
+        return _find_leaf(self._len_tree, index)
+
+    def __getitem__(self, index):
+        i, pos = self._locate(index)
+        return self._blocks[i][pos]
+
+    def __setitem__(self, index, weight):
+        i, pos = self._locate(index)
+        self._blocks[i][pos] = weight
+        self._update(i)
+
+    def __delitem__(self, index):
+        i, pos = self._locate(index)
+        block = self._blocks[i]
+        del block[pos]
+        self._len -= 1
+        if block:
+            self._update(i)
+        else:
+            del self._blocks[i]
+            del self._sums[i]
+            self._rebuild()
+
+    def insert(self, index, weight):
+        if index < 0:
+            index = max(0, index + self._len)
+        if not self._blocks:
+            self._blocks.append([weight])
+            self._sums.append([weight])
+            self._len += 1
+            self._rebuild()
+            return
+
+        if index >= self._len:
+            i, pos = len(self._blocks) - 1, len(self._blocks[-1])
+        else:
+            i, pos = self._locate(index)
+
+        block = self._blocks[i]
+        block.insert(pos, weight)
+        self._len += 1
+        if len(block) > self.BLOCK_SIZE * 2:
+            half = len(block) // 2
+            self._blocks[i:i + 1] = [block[:half], block[half:]]
+            self._sums[i:i + 1] = [
+                list(accumulate(block[:half])),
+                list(accumulate(block[half:]))]
+            self._rebuild()
+        else:
+            self._update(i)
+
+    def append(self, weight):
+        self.insert(self._len, weight)
+
+    def __iter__(self):
+        for block in self._blocks:
+            for weight in block:
+                yield weight
+
+    @property
+    def total(self):
+        """The sum of all weights"""
+
+        return self._sum_tree[1]
+
+    def pick(self, value):
+        """Returns the first index for which the sum of the weights up to
+        and including it is larger than `value`, skipping zero weights.
+
+        Passing `random.random() * total` picks an index with a probability
+        proportional to its weight. Raises ValueError if all weights are
+        zero.
+        """
+
+        if not self.total > 0:
+            raise ValueError("all weights are zero")
+
+        i, value = _find_leaf(self._sum_tree, max(value, 0))
+        if i >= len(self._blocks) or not self._sums[i][-1] > 0:
+            # rounding errors, use the last non-zero weight before
+            i = min(i, len(self._blocks) - 1)
+            while not self._sums[i][-1] > 0:
+                i -= 1
+            value = self._sums[i][-1]
+
+        block = self._blocks[i]
+        pos = min(bisect_right(self._sums[i], value), len(block) - 1)
+        while not block[pos] > 0:
+            pos -= 1
+        return _sum_before(self._len_tree, i) + pos
@@ -14,15 +14,14 @@ import sre_constants
 from senf import fsn2text
 
 from quodlibet import _
+from quodlibet import app
+from quodlibet.library.coverindex import COVER_EXTS, COVER_SUBDIRS, \
+    list_cover_candidates
 from quodlibet.plugins.cover import CoverSourcePlugin
 from quodlibet.util.dprint import print_w
 from quodlibet import config
 
 
-def get_ext(s):
-    return os.path.splitext(s)[1].lstrip('.')
-
-
 def prefer_embedded():
     return config.getboolean("albumart", "prefer_embedded", False)
 
@@ -56,9 +55,8 @@ class FilesystemCover(CoverSourcePlugin):
     PLUGIN_DESC = _("Uses commonly named images found in common directories " +
                     "alongside the song.")
 
-    cover_subdirs = frozenset(
-        ["scan", "scans", "images", "covers", "artwork"])
-    cover_exts = frozenset(["jpg", "jpeg", "png", "gif"])
+    cover_subdirs = COVER_SUBDIRS
+    cover_exts = COVER_EXTS
 
     cover_positive_words = ["front", "cover", "frontcover", "jacket",
                             "folder", "albumart", "edited"]
@@ -84,6 +82,16 @@ class FilesystemCover(CoverSourcePlugin):
     def priority():
         return 0.80
 
+    @staticmethod
+    def _get_candidates(base):
+        # use the index built while scanning the library if up to date
+        index = getattr(app.library, "cover_index", None)
+        if index is not None:
+            fns = index.get(base)
+            if fns is not None:
+                return fns
+        return list_cover_candidates(base)[0]
+
     @property
     def cover(self):
         # TODO: Deserves some refactoring
@@ -105,28 +113,7 @@ class FilesystemCover(CoverSourcePlugin):
                 path = os.path.join(base, config.get("albumart", "filename"))
                 images = [(100, path)]
         else:
-            entries = []
-            try:
-                entries = os.listdir(base)
-            except EnvironmentError:
-                print_w("Can't list album art directory %s" % base)
-
-            fns = []
-            for entry in entries:
-                lentry = entry.lower()
-                if get_ext(lentry) in self.cover_exts:
-                    fns.append((None, entry))
-                if lentry in self.cover_subdirs:
-                    subdir = os.path.join(base, entry)
-                    sub_entries = []
-                    try:
-                        sub_entries = os.listdir(subdir)
-                    except EnvironmentError:
-                        pass
-                    for sub_entry in sub_entries:
-                        lsub_entry = sub_entry.lower()
-                        if get_ext(lsub_entry) in self.cover_exts:
-                            fns.append((entry, sub_entry))
+            fns = self._get_candidates(base)
 
             for sub, fn in fns:
                 dec_lfn = fsn2text(fn).lower()
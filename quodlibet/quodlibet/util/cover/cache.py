@@ -0,0 +1,208 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""A memory and disk cache for scaled cover pixbufs."""
+
+import os
+import json
+import hashlib
+import threading
+
+from gi.repository import GdkPixbuf, GLib
+
+import quodlibet
+from quodlibet.util.collections import LRUCache
+from quodlibet.util.path import mtime, mkdir
+
+
+STAMP_OPTION = "tEXt::QL::Stamp"
+
+
+def get_cover_cache_folder():
+    """Returns a path to the cover cache folder.
+
+    The returned path might not exist.
+    """
+
+    return os.path.join(quodlibet.get_cache_dir(), "covers")
+
+
+def get_key(songs, settings=()):
+    """Returns a key for a set of songs, the same for the same songs no
+    matter the order.
+
+    `settings` is a list of texts which influence the cover found for the
+    songs, and are part of the key as well.
+    """
+
+    hash_ = hashlib.md5()
+    for key in sorted(s.key for s in songs):
+        hash_.update(key.encode("utf-8", "surrogatepass"))
+        hash_.update(b"\0")
+    hash_.update(b"\1")
+    for value in settings:
+        hash_.update(value.encode("utf-8", "surrogatepass"))
+        hash_.update(b"\0")
+    return hash_.hexdigest()
+
+
+def get_stamp(paths):
+    """Returns a text describing the state of the given paths, see
+    is_valid_stamp()
+    """
+
+    return json.dumps([[p, mtime(p)] for p in sorted(set(paths))])
+
+
+def is_valid_stamp(stamp):
+    """If none of the paths passed to get_stamp() has changed since"""
+
+    try:
+        entries = json.loads(stamp)
+    except (TypeError, ValueError):
+        return False
+
+    try:
+        for path, path_mtime in entries:
+            if mtime(path) != path_mtime:
+                return False
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+class CoverCache(object):
+    """Caches scaled cover pixbufs in memory and on disk.
+
+    Entries are stored together with a stamp of the files the cover was
+    resolved from (the image file, the song files for embedded images and
+    the song directories, as adding images changes their mtime) and get
+    ignored once one of them has changed.
+
+    The memory cache also remembers if no cover was found. The disk cache
+    holds at most MAX_FILES images and drops the least recently used ones.
+    Thread-safe.
+    """
+
+    MEMORY_SIZE = 500
+
+    MAX_FILES = 10000
+
+    PRUNE_INTERVAL = 500
+    """Number of stored images after which the disk cache gets pruned"""
+
+    def __init__(self, folder=None):
+        self._folder = folder
+        self._lock = threading.Lock()
+        # (key, size) -> (pixbuf or None, stamp)
+        self._memory = LRUCache(self.MEMORY_SIZE)
+        # prune with the first store
+        self._stored = -1
+
+    @property
+    def folder(self):
+        if self._folder is None:
+            return get_cover_cache_folder()
+        return self._folder
+
+    def _get_path(self, key, size):
+        return os.path.join(self.folder, "%dx%d" % size, key + ".png")
+
+    def lookup(self, key, size):
+        """Returns a tuple (found, pixbuf or None)"""
+
+        with self._lock:
+            entry = self._memory.get((key, size))
+        if entry is not None:
+            pixbuf, stamp = entry
+            if is_valid_stamp(stamp):
+                return True, pixbuf
+            with self._lock:
+                self._memory.pop((key, size))
+
+        path = self._get_path(key, size)
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(path)
+        except GLib.GError:
+            return False, None
+
+        stamp = pixbuf.get_option(STAMP_OPTION)
+        if stamp is None or not is_valid_stamp(stamp):
+            return False, None
+
+        # the mtime marks the last use, see prune()
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        with self._lock:
+            self._memory[(key, size)] = (pixbuf, stamp)
+        return True, pixbuf
+
+    def store(self, key, size, pixbuf, stamp):
+        """Caches the pixbuf, or that there is no cover in case it is None,
+        given the stamp from before the cover was looked up.
+        """
+
+        with self._lock:
+            self._memory[(key, size)] = (pixbuf, stamp)
+
+        if pixbuf is None:
+            return
+
+        path = self._get_path(key, size)
+        temp_path = "%s.%d.%d.tmp" % (
+            path, os.getpid(), threading.current_thread().ident)
+        try:
+            mkdir(os.path.dirname(path), 0o700)
+            pixbuf.savev(temp_path, "png", [STAMP_OPTION], [stamp])
+            os.replace(temp_path, path)
+        except (OSError, GLib.GError):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+        with self._lock:
+            self._stored = (self._stored + 1) % self.PRUNE_INTERVAL
+            prune = not self._stored
+        if prune:
+            self.prune()
+
+    def prune(self, max_files=None):
+        """Removes the least recently used images on disk, leaving
+        max_files (MAX_FILES by default)
+        """
+
+        if max_files is None:
+            max_files = self.MAX_FILES
+
+        try:
+            size_dirs = os.listdir(self.folder)
+        except OSError:
+            return
+
+        paths = []
+        for size_dir in size_dirs:
+            size_path = os.path.join(self.folder, size_dir)
+            try:
+                names = os.listdir(size_path)
+            except OSError:
+                continue
+            paths.extend(os.path.join(size_path, n) for n in names)
+        if len(paths) <= max_files:
+            return
+
+        paths.sort(key=mtime)
+        for path in paths[:len(paths) - max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
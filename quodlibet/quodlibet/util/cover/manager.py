@@ -6,15 +6,18 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import os
 from itertools import chain
 
 from gi.repository import GObject
 
 from quodlibet import _
+from quodlibet import config
 from quodlibet.formats import AudioFile
 from quodlibet.plugins import PluginManager, PluginHandler
 from quodlibet.qltk.notif import Task
 from quodlibet.util.cover import built_in
+from quodlibet.util.cover.cache import CoverCache, get_key, get_stamp
 from quodlibet.util import print_d
 from quodlibet.util.thread import call_async
 from quodlibet.util.thumbnails import get_thumbnail_from_file
@@ -69,6 +72,7 @@ class CoverManager(GObject.Object):
     def __init__(self, use_built_in=True):
         super(CoverManager, self).__init__()
         self.plugin_handler = CoverPluginHandler(use_built_in)
+        self.cache = CoverCache()
 
     def init_plugins(self):
         """Register the cover sources plugin handler with the global
@@ -90,6 +94,7 @@ class CoverManager(GObject.Object):
         to re-fetch the cover and do a display update.
         """
 
+        self.cache.clear_memory()
         self.emit("cover-changed", songs)
 
     def acquire_cover(self, callback, cancellable, song):
@@ -150,6 +155,15 @@ class CoverManager(GObject.Object):
         """Same as acquire_cover_sync but returns a cover for multiple
         images"""
 
+        return self._acquire_cover_source_sync_many(
+            songs, embedded, external)[0]
+
+    def _acquire_cover_source_sync_many(self, songs, embedded=True,
+                                        external=True):
+        """Returns a tuple of the cover and the CoverSourcePlugin class
+        which found it, or (None, None)
+        """
+
         for plugin in self.sources:
             if not embedded and plugin.embedded:
                 continue
@@ -167,7 +181,8 @@ class CoverManager(GObject.Object):
                 song = sorted(group, key=lambda s: s.key)[0]
                 cover = plugin(song).cover
                 if cover:
-                    return cover
+                    return cover, plugin
+        return None, None
 
     def get_cover(self, song):
         """Returns a cover file object for one song or None.
@@ -187,18 +202,70 @@ class CoverManager(GObject.Object):
 
         return self.acquire_cover_sync_many(songs)
 
+    def get_cover_source_many(self, songs):
+        """Like get_cover_many() but returns a tuple of the cover and the
+        CoverSourcePlugin class which found it, or (None, None)
+        """
+
+        return self._acquire_cover_source_sync_many(songs)
+
+    def get_cache_key(self, songs):
+        """Returns the key of the songs in the cover cache, which depends
+        on the album art settings and the enabled cover sources as well.
+        """
+
+        settings = [
+            str(config.getboolean("albumart", "prefer_embedded", False)),
+            str(config.getboolean("albumart", "force_filename", False)),
+            config.get("albumart", "filename", ""),
+        ]
+        settings.extend(source.__name__ for source in self.sources)
+        return get_key(songs, settings)
+
     def get_pixbuf_many(self, songs, width, height):
         """Returns a Pixbuf which fits into the boundary defined by width
         and height or None.
 
-        Uses the thumbnail cache if possible.
+        Uses the cover cache if possible. Thread-safe as long as the cover
+        sources are.
         """
 
-        fileobj = self.get_cover_many(songs)
+        songs = list(songs)
+        key = self.get_cache_key(songs)
+        size = (width, height)
+        found, pixbuf = self.cache.lookup(key, size)
+        if found:
+            return pixbuf
+
+        # adding images to the directories changes their mtime, so get
+        # their state before looking for the cover
+        dirs = {os.path.dirname(s("~filename")) for s in songs}
+        dir_stamp = get_stamp(dirs)
+        filenames = [s("~filename") for s in songs]
+
+        fileobj, source = self.get_cover_source_many(songs)
         if fileobj is None:
-            return
+            pixbuf = None
+            sources = filenames
+        else:
+            try:
+                pixbuf = get_thumbnail_from_file(fileobj, size)
+                path = getattr(fileobj, "name", None)
+            finally:
+                fileobj.close()
+            if pixbuf is None:
+                return
+
+            # embedded images depend on the song files
+            if isinstance(path, str) and not source.embedded:
+                sources = [path]
+            else:
+                sources = filenames
 
-        return get_thumbnail_from_file(fileobj, (width, height))
+        if get_stamp(dirs) == dir_stamp:
+            self.cache.store(
+                key, size, pixbuf, get_stamp(list(dirs) + sources))
+        return pixbuf
 
     def get_pixbuf(self, song, width, height):
         """see get_pixbuf_many()"""
@@ -207,17 +274,19 @@ class CoverManager(GObject.Object):
 
     def get_pixbuf_many_async(self, songs, width, height, cancel, callback):
         """Async variant; callback gets called with a pixbuf or not called
-        in case of an error. cancel is a Gio.Cancellable.
+        in case of an error or if there is no cover. cancel is a
+        Gio.Cancellable.
 
-        The callback will be called in the main loop.
+        Looking up, loading and scaling the cover happens in a thread,
+        the callback will be called in the main loop.
         """
 
-        fileobj = self.get_cover_many(songs)
-        if fileobj is None:
-            return
+        def done_cb(pixbuf):
+            if pixbuf is not None:
+                callback(pixbuf)
 
-        call_async(get_thumbnail_from_file, cancel, callback,
-                   args=(fileobj, (width, height)))
+        call_async(self.get_pixbuf_many, cancel, done_cb,
+                   args=(list(songs), width, height))
 
     def search_cover(self, cancellable, songs):
         """Search for all the covers applicable to `songs` across all providers
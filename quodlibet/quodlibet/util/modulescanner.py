@@ -60,12 +60,15 @@ class ModuleScanner(object):
     rescan() - Update the module list. Returns added/removed module names
     failures - A dict of Name: (Exception, Text) for all modules that failed
     modules - A dict of Name: Module for all successfully loaded modules
+    skipped - A dict of Name: dependency paths for all modules which
+              weren't loaded as requested by the last rescan()
 
     """
     def __init__(self, folders):
         self.__folders = folders
         self.__modules = {}  # name: module
         self.__failures = {}  # name: exception
+        self.__skipped = {}  # name: dependency paths
 
     @property
     def failures(self):
@@ -79,11 +82,23 @@ class ModuleScanner(object):
 
         return self.__modules
 
-    def rescan(self):
+    @property
+    def skipped(self):
+        """A name: dependency paths dict of all modules which weren't
+        loaded because of `skip`, see rescan()
+        """
+
+        return self.__skipped
+
+    def rescan(self, skip=None):
         """Rescan all folders for changed/new/removed modules.
 
         The caller should release all references to removed modules.
 
+        `skip` gets called with the name and the dependency paths of each
+        module which isn't loaded yet and can return True to not load it.
+        Skipped modules get loaded by the next rescan() not skipping them.
+
         Returns a tuple: (removed, added)
         """
 
@@ -119,12 +134,17 @@ class ModuleScanner(object):
                 removed.append(name)
 
         self.__failures.clear()
+        self.__skipped.clear()
 
         # add new ones
         for (name, (path, deps)) in info.items():
             if name in self.__modules:
                 continue
 
+            if skip is not None and skip(name, deps):
+                self.__skipped[name] = deps
+                continue
+
             try:
                 # add a real module, so that pickle works
                 # https://github.com/quodlibet/quodlibet/issues/1093
@@ -145,7 +165,8 @@ class ModuleScanner(object):
                 added.append(name)
                 self.__modules[name] = Module(name, mod, deps, path)
 
-        print_d("Rescanning done: %d added, %d removed, %d error(s)" %
-                (len(added), len(removed), len(self.__failures)))
+        print_d("Rescanning done: %d added, %d removed, %d skipped, "
+                "%d error(s)" % (len(added), len(removed), len(self.__skipped),
+                                 len(self.__failures)))
 
         return removed, added
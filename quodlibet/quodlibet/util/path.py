@@ -13,6 +13,8 @@ import sys
 import errno
 import codecs
 import shlex
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, quote, unquote
 
 from senf import fsnative, bytes2fsn, fsn2bytes, expanduser, sep, expandvars, \
@@ -88,6 +90,86 @@ def listdir(path, hidden=False):
             if filt(basename)]
 
 
+def scan_dir(path):
+    """Lists a directory using the file type information os.scandir()
+    provides, so most entries don't need a stat call.
+
+    Symlinks pointing to directories are left out.
+
+    Args:
+        path (fsnative)
+    Returns:
+        Tuple[List[fsnative], List[fsnative], List[fsnative]]:
+            The names of the sub directories, of the files and of the
+            symlinks pointing to files (or nowhere).
+    Raises:
+        OSError
+    """
+
+    dnames = []
+    fnames = []
+    links = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dnames.append(entry.name)
+                elif not entry.is_symlink():
+                    fnames.append(entry.name)
+                elif not entry.is_dir():
+                    links.append(entry.name)
+            except OSError:
+                continue
+    return dnames, fnames, links
+
+
+def walk_dirs(root, workers=0, scan_func=scan_dir):
+    """Like os.walk() but breadth first, without following directory
+    symlinks and yielding (path, dnames, fnames, links) tuples, see
+    scan_dir().
+
+    Directories which can't be listed are skipped. The sub directory names
+    can be changed in place to skip them.
+
+    Args:
+        root (fsnative)
+        workers (int): If > 0, the number of threads listing directories
+            ahead of time, which helps hiding the latency of network file
+            systems.
+        scan_func (callable): Like scan_dir(), called from the worker
+            threads if there are any.
+    """
+
+    executor = ThreadPoolExecutor(workers) if workers > 0 else None
+    pending = deque()
+
+    def queue(path):
+        if executor is not None:
+            pending.append((path, executor.submit(scan_func, path)))
+        else:
+            pending.append((path, None))
+
+    queue(root)
+    try:
+        while pending:
+            path, future = pending.popleft()
+            try:
+                if future is None:
+                    dnames, fnames, links = scan_func(path)
+                else:
+                    dnames, fnames, links = future.result()
+            except OSError:
+                continue
+            yield path, dnames, fnames, links
+            for name in dnames:
+                queue(os.path.join(path, name))
+    finally:
+        if executor is not None:
+            for path, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+
 def mtime(filename):
     """Return the mtime of a file, or 0 if an error occurs."""
     try:
@@ -0,0 +1,294 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Writing changed tags of songs to their files in background threads.
+
+Songs get changed in memory first, then a copy of each one gets written
+by a small thread pool while the main loop keeps running::
+
+    batch = WriteBatch(library)
+    for song in songs:
+        batch.record(song)
+        song["genre"] = u"Jazz"
+    batch.write(songs, callback)
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from gi.repository import GLib
+
+from quodlibet import _
+from quodlibet import util
+from quodlibet.formats import AudioFileError
+from quodlibet.qltk.notif import Task
+from quodlibet.util.dprint import print_d
+
+
+MAX_WORKERS = 4
+"""Number of files written at the same time. More mostly leads to more
+seeking on hard drives and network shares."""
+
+CHANGED_INTERVAL = 250
+"""Milliseconds between library 'changed' signals while writing"""
+
+
+def copy_song(song):
+    """Returns a copy of the song with the same tags, which can be written
+    in another thread while the song itself keeps being used.
+    """
+
+    copy = dict.__new__(type(song))
+    dict.update(copy, song)
+    return copy
+
+
+class TagWriter(object):
+    """A shared queue writing songs in a thread pool, see WriteBatch"""
+
+    instance = None
+
+    def __init__(self, max_workers=MAX_WORKERS):
+        self._max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        # song -> future of its last write, so writes of the same song
+        # happen in order
+        self._pending = {}
+        # handlers of finished writes, waiting for the main loop
+        self._completed = []
+
+    @classmethod
+    def get(cls):
+        if cls.instance is None:
+            cls.instance = cls()
+        return cls.instance
+
+    def submit(self, song, done_func):
+        """Writes a copy of the song in a thread and calls
+        done_func(future) in the main loop afterwards. The future result
+        is the copy, or raises AudioFileError.
+
+        Returns the future.
+        """
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self._max_workers)
+
+        copy = copy_song(song)
+        with self._lock:
+            previous = self._pending.get(song)
+            future = self._pool.submit(self._write, copy, previous)
+            self._pending[song] = future
+
+        def main_done(future):
+            with self._lock:
+                if self._pending.get(song) is future:
+                    del self._pending[song]
+            done_func(future)
+            return False
+
+        def done(future):
+            with self._lock:
+                self._completed.append((main_done, future))
+            GLib.idle_add(self._run_completed)
+
+        future.add_done_callback(done)
+        return future
+
+    def _run_completed(self):
+        with self._lock:
+            completed = self._completed
+            self._completed = []
+        for main_done, future in completed:
+            main_done(future)
+        return False
+
+    def _write(self, copy, previous):
+        if previous is not None:
+            wait([previous])
+        try:
+            copy.write()
+        except AudioFileError:
+            raise
+        except Exception as e:
+            util.print_exc()
+            raise AudioFileError(e)
+        return copy
+
+    def is_pending(self, song):
+        """If a write of the song hasn't been handled in the main loop yet"""
+
+        with self._lock:
+            return song in self._pending
+
+    def shutdown(self, wait=True):
+        """Waits for all writes to finish if wait is True.
+
+        Finished writes get handled right away, since the main loop
+        might not run anymore.
+        """
+
+        if self._pool is not None:
+            self._pool.shutdown(wait)
+            self._pool = None
+        self._run_completed()
+
+
+class WriteBatch(object):
+    """Songs changed together, which get written to their files in the
+    background.
+
+    Call record() before changing a song, so that the change can be
+    reverted in case writing fails or gets cancelled.
+    """
+
+    def __init__(self, library, writer=None):
+        self.library = library
+        self._writer = writer or TagWriter.get()
+        # song -> copy of the song before it was changed
+        self._journal = {}
+        # future of the running write -> song
+        self._futures = {}
+        self._changed = set()
+        self._changed_id = None
+        self._task = None
+        self._callback = None
+        self.written = []
+        """Songs written successfully"""
+        self.failed = []
+        """Songs which couldn't be written and got reloaded"""
+        self.cancelled = []
+        """Songs which didn't get written, reverted unless a newer write of
+        them is pending"""
+
+    def __len__(self):
+        return len(self._journal)
+
+    @property
+    def done(self):
+        """If all songs passed to write() are handled"""
+
+        return not self._futures
+
+    def record(self, song):
+        """Remembers the tags of the song, call before changing it"""
+
+        if song not in self._journal:
+            self._journal[song] = copy_song(song)
+
+    def write(self, songs, callback=None):
+        """Writes the recorded songs in the background.
+
+        The library gets notified of written songs in batches while
+        writing. Songs which fail to be written get reloaded, and the
+        ones not written because of cancelling get reverted.
+
+        callback(batch) gets called once all songs are handled.
+        """
+
+        songs = list(songs)
+        assert all(song in self._journal for song in songs)
+        self._callback = callback
+        if not songs:
+            self._finish()
+            return
+
+        print_d("Writing %d songs" % len(songs))
+        self._total = len(songs)
+        self._task = Task(_("Library"), _("Saving tags"), stop=self.cancel)
+        for song in songs:
+            future = self._writer.submit(song, self.__written_cb)
+            self._futures[future] = song
+
+    def cancel(self):
+        """Cancels writing the songs which haven't been started yet"""
+
+        for future in list(self._futures):
+            future.cancel()
+
+    def _revert_song(self, song):
+        original = self._journal[song]
+        song.clear()
+        for key, value in original.items():
+            song[key] = value
+
+    def __written_cb(self, future):
+        song = self._futures.pop(future, None)
+        if song is None:
+            return
+
+        if future.cancelled():
+            # a newer write includes our changes, so memory and disk
+            # will agree once it's done
+            if not self._writer.is_pending(song):
+                self._revert_song(song)
+                self._changed.add(song)
+            self.cancelled.append(song)
+        else:
+            try:
+                copy = future.result()
+            except AudioFileError:
+                self.library.reload(song, changed=self._changed)
+                self.failed.append(song)
+            else:
+                # the copy got the stats of the new file
+                for key in ["~#mtime", "~#filesize"]:
+                    if key in copy:
+                        song[key] = copy[key]
+                self._changed.add(song)
+                self.written.append(song)
+
+        self._task.update(1.0 - float(len(self._futures)) / self._total)
+        if not self._futures:
+            self._finish()
+        elif self._changed_id is None:
+            self._changed_id = GLib.timeout_add(
+                CHANGED_INTERVAL, self.__emit_changed)
+
+    def __emit_changed(self):
+        self._changed_id = None
+        changed = self._changed
+        self._changed = set()
+        if changed:
+            self.library.changed(changed)
+        return False
+
+    def _finish(self):
+        if self._changed_id is not None:
+            GLib.source_remove(self._changed_id)
+        self.__emit_changed()
+        if self._task is not None:
+            self._task.finish()
+            self._task = None
+        print_d("Wrote %d songs, %d failed, %d cancelled" % (
+            len(self.written), len(self.failed), len(self.cancelled)))
+        if self._callback is not None:
+            self._callback(self)
+
+    def revert(self, callback=None):
+        """Reverts the recorded songs to the state before they were
+        changed and writes the written ones again. Songs which failed to be
+        written were already reloaded and stay as they are.
+
+        Returns the WriteBatch writing them.
+        """
+
+        assert self.done
+        batch = WriteBatch(self.library, self._writer)
+        failed = set(self.failed)
+        written = set(self.written)
+        unwritten = []
+        for song in self._journal:
+            if song in failed:
+                continue
+            batch.record(song)
+            self._revert_song(song)
+            if song not in written:
+                unwritten.append(song)
+        if unwritten:
+            self.library.changed(unwritten)
+        batch.write(self.written, callback)
+        return batch
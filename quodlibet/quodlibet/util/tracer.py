@@ -0,0 +1,230 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+"""Finding out where the time goes during startup.
+
+Set QUODLIBET_TRACE to print the time spent in each startup phase and the
+slowest imports once the main window is shown. If it is set to a path
+ending in ".json" the trace also gets written there in the Chrome trace
+event format, which chrome://tracing or https://ui.perfetto.dev can show.
+
+Allocations get recorded as well in case tracemalloc is tracing, for
+example by setting PYTHONTRACEMALLOC=1.
+"""
+
+import builtins
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import wraps
+
+from senf import environ
+
+from quodlibet.util.dprint import print_, print_w
+
+
+Event = namedtuple(
+    "Event", ["name", "category", "start", "wall", "cpu", "alloc", "tid"])
+"""A finished span, times in seconds relative to the start of the tracer,
+CPU time of the whole process and allocated bytes"""
+
+
+def _get_allocated():
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()[0]
+    return 0
+
+
+class Tracer(object):
+    """Records spans of time, for startup phases and imports"""
+
+    def __init__(self):
+        self.events = []
+        self._origin = time.perf_counter()
+        self._original_import = None
+
+    @contextmanager
+    def span(self, name, category="phase"):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        alloc = _get_allocated()
+        try:
+            yield
+        finally:
+            self.events.append(Event(
+                name, category, wall - self._origin,
+                time.perf_counter() - wall, time.process_time() - cpu,
+                _get_allocated() - alloc, threading.get_ident()))
+
+    def install_import_hook(self):
+        """Records a span for each module imported through the import
+        statement from now on, including the time of nested imports
+        """
+
+        if self._original_import is not None:
+            return
+        original_import = self._original_import = builtins.__import__
+
+        def traced_import(name, globals=None, locals=None, fromlist=(),
+                          level=0):
+            fullname = name
+            if level > 0:
+                package = globals.get("__package__") if globals else None
+                try:
+                    fullname = importlib.util.resolve_name(
+                        "." * level + name, package)
+                except (ImportError, ValueError):
+                    pass
+            if fullname in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+            with self.span(fullname, "import"):
+                return original_import(name, globals, locals, fromlist, level)
+
+        builtins.__import__ = traced_import
+
+    def uninstall_import_hook(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _get_depth(self, event, events):
+        depth = 0
+        for other in events:
+            if other is not event and other.tid == event.tid and \
+                    other.start <= event.start and \
+                    other.start + other.wall >= event.start + event.wall:
+                depth += 1
+        return depth
+
+    def get_report(self, limit=25):
+        """Returns a text listing all phases and the slowest imports"""
+
+        phases = sorted((e for e in self.events if e.category == "phase"),
+                        key=lambda e: e.start)
+        imports = sorted((e for e in self.events if e.category == "import"),
+                         key=lambda e: e.wall, reverse=True)
+
+        def format_event(event, indent=0):
+            name = "  " * indent + event.name
+            return "%-44s %9.1f %9.1f %9d" % (
+                name[:44], event.wall * 1000, event.cpu * 1000,
+                event.alloc // 1024)
+
+        header = "%-44s %9s %9s %9s" % ("", "wall ms", "CPU ms", "KiB")
+        lines = ["Startup phases:", header]
+        for event in phases:
+            lines.append(format_event(event, self._get_depth(event, phases)))
+        lines.append("")
+        lines.append("Slowest imports (including nested imports):")
+        lines.append(header)
+        for event in imports[:limit]:
+            lines.append(format_event(event))
+        return "\n".join(lines)
+
+    def get_chrome_trace(self):
+        """Returns a JSON compatible dict in the Chrome trace event format"""
+
+        pid = os.getpid()
+        trace_events = []
+        for event in self.events:
+            trace_events.append({
+                "name": event.name,
+                "cat": event.category,
+                "ph": "X",
+                "ts": event.start * 1e6,
+                "dur": event.wall * 1e6,
+                "pid": pid,
+                "tid": event.tid,
+                "args": {
+                    "cpu_ms": round(event.cpu * 1000, 3),
+                    "alloc_kib": event.alloc // 1024,
+                },
+            })
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+
+class _NoSpan(object):
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+_tracer = None
+
+
+def start():
+    """Starts tracing in case QUODLIBET_TRACE is set"""
+
+    global _tracer
+
+    if _tracer is not None or "QUODLIBET_TRACE" not in environ:
+        return
+    _tracer = Tracer()
+    _tracer.install_import_hook()
+
+
+def is_tracing():
+    return _tracer is not None
+
+
+def span(name):
+    """Returns a context manager recording the time spent in it as a
+    startup phase, which does nothing if not tracing.
+    """
+
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name)
+
+
+def traced(name):
+    """Decorator recording each call of the function as startup phase,
+    see span()
+    """
+
+    def wrap(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return func(*args, **kwargs)
+            with _tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return wrap
+
+
+def finish():
+    """Stops tracing, prints the report and writes the Chrome trace if
+    requested. Does nothing if not tracing.
+    """
+
+    global _tracer
+
+    tracer = _tracer
+    if tracer is None:
+        return
+    _tracer = None
+    tracer.uninstall_import_hook()
+
+    print_(tracer.get_report())
+
+    path = environ.get("QUODLIBET_TRACE", "")
+    if path.endswith(".json"):
+        try:
+            with open(path, "w", encoding="utf-8") as h:
+                json.dump(tracer.get_chrome_trace(), h)
+        except EnvironmentError as e:
+            print_w("Couldn't write startup trace to %r: %s" % (path, e))
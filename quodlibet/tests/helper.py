@@ -12,6 +12,7 @@ import sys
 import shutil
 import locale
 import errno
+import time
 from io import StringIO
 
 from gi.repository import Gtk, Gdk
@@ -30,6 +31,29 @@ def dummy_path(path):
     return path
 
 
+def Song(num, **kwargs):
+    """An AudioFile with the given tags and a filename unique to num"""
+
+    from quodlibet.formats import AudioFile
+
+    song = AudioFile(kwargs)
+    song["~filename"] = fsnative(u"/dir/file%d.mp3" % num)
+    return song
+
+
+def set_old_mtime(path, age=None):
+    """Moves the mtime of path far enough into the past for the directory
+    cache to trust it.
+    """
+
+    from quodlibet.library.dircache import RACY_SECONDS
+
+    if age is None:
+        age = RACY_SECONDS * 10
+    old = time.time() - age
+    os.utime(path, (old, old))
+
+
 @contextlib.contextmanager
 def locale_numeric_conv(
         decimal_point=".", grouping=[3, 3, 0], thousands_sep=","):
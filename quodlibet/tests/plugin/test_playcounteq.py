@@ -0,0 +1,40 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from quodlibet.formats import AudioFile
+from quodlibet.qltk.songmodel import PlaylistModel
+from tests.plugin import PluginTestCase
+
+
+class TPlaycountEqualizer(PluginTestCase):
+
+    def setUp(self):
+        self.order = self.plugins["playcounteq"].cls()
+        self.songs = [AudioFile({"~#playcount": c}) for c in [0, 5, 10]]
+        self.pl = PlaylistModel()
+        self.pl.set(self.songs)
+
+    def test_prefers_less_played(self):
+        for i in range(20):
+            self.order.reset(self.pl)
+            cur = self.order.next_explicit(self.pl, None)
+            self.assertIsNot(self.pl[cur][0], self.songs[2])
+
+    def test_max_of_remaining(self):
+        # weights are relative to the most played song not played yet
+        for i in range(20):
+            self.order.reset(self.pl)
+            cur = self.order.set(self.pl, self.pl.get_iter((2,)))
+            cur = self.order.next_explicit(self.pl, cur)
+            self.assertIs(self.pl[cur][0], self.songs[0])
+
+    def test_all_played(self):
+        cur = None
+        played = set()
+        for i in range(3):
+            cur = self.order.next_explicit(self.pl, cur)
+            played.add(self.pl[cur][0])
+        self.assertEqual(played, set(self.songs))
+        self.assertIsNone(self.order.next_explicit(self.pl, cur))
@@ -6,9 +6,13 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import os
+import shutil
+
 from gi.repository import Gst
 
 from quodlibet.library.libraries import Library
+from tests import mkdtemp, mkstemp
 from tests.plugin import PluginTestCase
 from tests.helper import visible
 
@@ -65,3 +69,64 @@ class TWaveformSeekBar(PluginTestCase):
 
         message = FakeRMSMessage()
         bar._on_bus_message(None, message, 1234)
+
+
+class TWaveformCache(PluginTestCase):
+
+    def setUp(self):
+        self.mod = self.modules["WaveformSeekBar"]
+        self.folder = mkdtemp()
+        self.cache = self.mod.WaveformCache(self.folder)
+        fd, self.filename = mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        os.remove(self.filename)
+        del self.mod
+
+    def test_levels(self):
+        levels = self.mod.build_levels([0.5] * 300, 64)
+        self.assertEqual([len(l) for l in levels], [300, 150, 75])
+        self.assertEqual(self.mod.decimate([0.0, 1.0, 0.5]), [0.5, 0.5])
+        self.assertEqual(len(self.mod.get_level(levels, 100)), 150)
+        self.assertEqual(len(self.mod.get_level(levels, 10)), 75)
+        self.assertEqual(len(self.mod.get_level(levels, 1000)), 300)
+
+    def test_store_lookup(self):
+        assert self.cache.lookup(self.filename, 10) is None
+        levels = self.mod.build_levels([i / 200.0 for i in range(200)], 64)
+        self.cache.store(self.filename, 200, levels)
+
+        cached = self.cache.lookup(self.filename, 200)
+        self.assertEqual([len(l) for l in cached], [len(l) for l in levels])
+        for level, cached_level in zip(levels, cached):
+            for value, cached_value in zip(level, cached_level):
+                self.assertAlmostEqual(value, cached_value, places=4)
+
+        assert self.cache.lookup(self.filename, 100) is not None
+        assert self.cache.lookup(self.filename, 300) is None
+
+    def test_changed(self):
+        self.cache.store(self.filename, 10, [[0.5] * 10])
+        st = os.stat(self.filename)
+        os.utime(self.filename, (st.st_atime, st.st_mtime - 10))
+        assert self.cache.lookup(self.filename, 10) is None
+
+    def test_invalid(self):
+        self.cache.store(self.filename, 10, [[0.5] * 10])
+        path, = [os.path.join(self.folder, n)
+                 for n in os.listdir(self.folder)]
+        with open(path, "rb") as h:
+            data = h.read()
+        for broken in [b"", data[:10], data[:-1], b"x" + data[1:]]:
+            with open(path, "wb") as h:
+                h.write(broken)
+            assert self.cache.lookup(self.filename, 10) is None
+
+    def test_prune(self):
+        self.cache.store(self.filename, 10, [[0.5] * 10])
+        self.cache.prune(1)
+        self.assertEqual(len(os.listdir(self.folder)), 1)
+        self.cache.prune(0)
+        self.assertEqual(os.listdir(self.folder), [])
@@ -59,6 +59,7 @@ class TPanedBrowser(TestCase):
         for af in SONGS:
             af.sanitize()
         library.add(SONGS)
+        self.library = library
         self.bar = self.Bar(library)
 
         self.last = None
@@ -113,6 +114,40 @@ class TPanedBrowser(TestCase):
         self._wait()
         self.failUnlessEqual(set(self.last), set(expected))
 
+    def test_change_hidden_song(self):
+        song = AudioFile({
+            "artist": "hidden", "~filename": fsnative(u"/bin/hidden")})
+        self.library.add([song])
+        self.bar.activate()
+
+        self.bar.filter_text("artist=boris")
+        self._wait()
+        song["artist"] = "visible"
+        self.library.changed([song])
+
+        self.bar.filter_text("")
+        self._wait()
+        artists = self.bar._panes[0].list("artist")
+        self.assertTrue("visible" in artists)
+        self.assertFalse("hidden" in artists)
+
+    def test_change_song_out_of_search(self):
+        song = AudioFile({
+            "artist": "hidden", "~filename": fsnative(u"/bin/hidden")})
+        self.library.add([song])
+
+        self.bar.filter_text("artist=hidden")
+        self._wait()
+        song["artist"] = "visible"
+        self.library.changed([song])
+        self.assertFalse("hidden" in self.bar._panes[0].list("artist"))
+
+        self.bar.filter_text("")
+        self._wait()
+        artists = self.bar._panes[0].list("artist")
+        self.assertTrue("visible" in artists)
+        self.assertFalse("hidden" in artists)
+
     def test_restore(self):
         config.set("browsers", "query_text", "foo")
         self.bar.restore()
@@ -535,6 +570,58 @@ class TPaneModel(TestCase):
         self._verify_model(m)
         self.assertTrue(m.matches([len(m) - 1], UNKNOWN_ARTIST))
 
+    def test_set_songs(self):
+        conf = PaneConfig("artist")
+        m = PaneModel(conf)
+        m.set_songs(SONGS[:2])
+        self._verify_model(m)
+        self.assertEqual(m.get_songs([0]), set(SONGS[:2]))
+
+        m.set_songs(SONGS[1:])
+        self._verify_model(m)
+        expected = PaneModel(conf)
+        expected.add_songs(SONGS[1:])
+        self.assertEqual([e.key for e in m.itervalues()],
+                         [e.key for e in expected.itervalues()])
+        self.assertEqual(m.get_songs([0]), set(SONGS[1:]))
+
+        m.set_songs([UNKNOWN_ARTIST])
+        self._verify_model(m)
+        self.assertEqual(len(m), 1)
+
+        m.set_songs([])
+        self.assertEqual(len(m), 0)
+
+    def test_remove_only_touches_entries(self):
+        conf = PaneConfig("artist")
+        m = PaneModel(conf)
+        m.add_songs(SONGS)
+        changed = []
+        m.connect("row-changed", lambda m, path, iter_: changed.append(
+            m.get_value(iter_).key))
+        m.remove_songs([SONGS[0]], False)
+        self.assertEqual(changed, ["boris"])
+        m.remove_songs([SONGS[0]], False)
+        self.assertEqual(changed, ["boris"])
+
+    def test_change_songs(self):
+        conf = PaneConfig("artist")
+        m = PaneModel(conf)
+        songs = [AudioFile(s) for s in SONGS]
+        m.add_songs(songs)
+
+        # like the browser handles changed songs
+        m.remove_songs([songs[0]], False)
+        songs[0]["artist"] = "zzz"
+        m.add_songs([songs[0]])
+        m.remove_songs([], True)
+        self._verify_model(m)
+
+        keys = [e.key for e in m.itervalues()]
+        self.assertEqual(keys, [None, "mu", "piman", "zzz", ""])
+        self.assertTrue(m.matches([3], songs[0]))
+        self.assertFalse(m.matches([1], songs[0]))
+
 
 class TPanedPreferences(TestCase):
 
@@ -5,16 +5,19 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import pickle
 import sys
+import time
+import tracemalloc
 
 from senf import fsnative
 
-from tests import TestCase, get_data_path
+from tests import TestCase, get_data_path, skip
 from .helper import capture_output
 
 from quodlibet import formats
 from quodlibet.formats import AudioFile, load_audio_files, dump_audio_files, \
-    SerializationError
+    SerializationError, is_legacy_data
 from quodlibet.util.picklehelper import pickle_dumps
 from quodlibet import config
 
@@ -168,3 +171,89 @@ class TPickle(TestCase):
             data = pickle_dumps([42], protocol)
             with self.assertRaises(SerializationError):
                 load_audio_files(data)
+
+    def _get_songs(self, count):
+        songs = []
+        for i in range(count):
+            song = AudioFile.__new__(list(formats.types)[i % 3])
+            dict.__init__(song, {
+                "~filename": fsnative(u"/music/%d.ogg" % i),
+                "~mountpoint": fsnative(u"/music"),
+                "title": u"Title %d" % i,
+                "artist": u"Artist %d" % (i // 10),
+                "album": u"Album %d" % (i // 10),
+                "tracknumber": u"%d/10" % (i % 10),
+                "~#length": 200 + i % 100,
+                "~#rating": 0.5,
+                "~#added": 1500000000 + i,
+            })
+            songs.append(song)
+        return songs
+
+    def test_current_format(self):
+        songs = self._get_songs(30)
+        data = dump_audio_files(songs, legacy=False)
+        assert not is_legacy_data(data)
+        assert is_legacy_data(dump_audio_files(songs))
+
+        items = load_audio_files(data)
+        self.assertEqual([dict(i) for i in items], [dict(s) for s in songs])
+        self.assertEqual([type(i) for i in items], [type(s) for s in songs])
+        # keys are shared between items
+        assert all(a is b for a, b in zip(
+            sorted(items[0].keys()), sorted(items[1].keys())))
+
+    def test_current_format_empty(self):
+        data = dump_audio_files([], legacy=False)
+        assert not is_legacy_data(data)
+        self.assertEqual(load_audio_files(data), [])
+
+    def test_current_format_missing_class(self):
+        data = dump_audio_files(self.instances, legacy=False)
+        broken = data.replace(b"SPCFile", b"FooFile")
+        items = load_audio_files(broken)
+        self.assertEqual(len(items), len(formats.types) - 1)
+        assert all(isinstance(i, AudioFile) for i in items)
+
+        broken = data.replace(b"quodlibet.formats", b"quodlibet.foomats")
+        with self.assertRaises(SerializationError):
+            load_audio_files(broken)
+
+    def test_current_format_invalid(self):
+        data = dump_audio_files(self.instances, legacy=False)
+        not_dict = data[:6] + pickle.dumps(([("os", "stat")], [(0, {})]), 4)
+        for broken in [data[:5], data[:-10], data[:4] + b"\xff" + data[5:],
+                       not_dict]:
+            with self.assertRaises(SerializationError):
+                load_audio_files(broken)
+
+    def test_current_format_foreign_class(self):
+        data = dump_audio_files(self.instances, legacy=False)
+        for type_name in [("collections", "OrderedDict"),
+                          ("this", "AudioFile"),
+                          ("quodlibet.util.collection", "Album"),
+                          ("quodlibet.formats", "MusicFile")]:
+            broken = data[:6] + pickle.dumps(([type_name], [(0, {})]), 4)
+            with self.assertRaises(SerializationError):
+                load_audio_files(broken)
+        # modules outside of quodlibet don't get imported
+        assert "this" not in sys.modules
+
+    @skip("Enable for basic benchmarking of the library formats")
+    def test_performance(self):
+        songs = self._get_songs(20000)
+        for name, legacy in [("legacy", True), ("current", False)]:
+            t = time.time()
+            data = dump_audio_files(songs, legacy=legacy)
+            dump_time = time.time() - t
+
+            tracemalloc.start()
+            t = time.time()
+            items = load_audio_files(data)
+            load_time = time.time() - t
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            assert len(items) == len(songs)
+            print("\n%-8s %6d KiB, dump %.3fs, load %.3fs, peak %6d KiB" % (
+                name, len(data) // 1024, dump_time, load_time, peak // 1024))
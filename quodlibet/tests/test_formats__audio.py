@@ -12,7 +12,7 @@ from senf import fsnative, fsn2text, bytes2fsn, mkstemp, mkdtemp
 
 from quodlibet import config
 from quodlibet.formats import AudioFile, types as format_types, AudioFileError
-from quodlibet.formats._audio import NUMERIC_ZERO_DEFAULT
+from quodlibet.formats._audio import NUMERIC_ZERO_DEFAULT, get_change_serial
 from quodlibet.formats import decode_value, MusicFile, FILESYSTEM_TAGS
 from quodlibet.util.tags import _TAGS as TAGS
 from quodlibet.util.path import normalize_path, mkdir, get_home_dir, unquote, \
@@ -900,6 +900,46 @@ class TAudioFile(TestCase):
         album_sort_2 = tuple(copy.album_key)
         self.failIfEqual(album_sort_1, album_sort_2)
 
+    def test_tag_changes(self):
+        song = AudioFile(bar_1_1)
+        self.assertEqual(list(song.get_tag_changes()), [None])
+
+        serial = get_change_serial()
+        song["title"] = u"foo"
+        del song["album"]
+        song.pop("artist")
+        song.pop("nothing", None)
+        song.setdefault("~#playcount", 1)
+        song.setdefault("~#playcount", 2)
+        changes = song.get_tag_changes()
+        self.assertEqual(
+            {tag for tag, s in changes.items() if s > serial},
+            {"title", "album", "artist", "~#playcount"})
+
+        serial = get_change_serial()
+        song.update({"title": u"bar"})
+        self.assertEqual(
+            [tag for tag, s in song.get_tag_changes().items() if s > serial],
+            [None])
+
+    def test_tag_changes_loaded(self):
+        song = AudioFile(bar_1_1)
+        song.sanitize(fsnative(u"/dir/fn"))
+        self.assertEqual(list(song.get_tag_changes()), [None])
+        song = dict.__new__(AudioFile)
+        dict.update(song, bar_1_1)
+        self.assertTrue(song.get_tag_changes() is None)
+
+    def test_column_sort_keys_cache(self):
+        copy = AudioFile(bar_1_1)
+        copy.column_sort_keys["title"] = "foo"
+        self.assertEqual(copy.column_sort_keys, {"title": "foo"})
+        copy["title"] = "bar"
+        self.assertEqual(copy.column_sort_keys, {})
+        copy.column_sort_keys["title"] = "foo"
+        del copy["title"]
+        self.assertEqual(copy.column_sort_keys, {})
+
     def test_cache_attributes(self):
         x = AudioFile()
         x.multisong = not x.multisong
@@ -0,0 +1,98 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import shutil
+
+from senf import fsnative
+
+from tests import TestCase, get_data_path, mkdtemp
+from .helper import capture_output
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.formats import _pool
+from quodlibet.formats._pool import LoaderPool, get_pool
+from quodlibet.library.libraries import SongFileLibrary
+
+
+FILES = ["empty.flac", "empty.ogg", "silence-44-s.mp3", "silence-44-s.flac",
+         "silence-44-s.wv"]
+
+
+class TLoaderPool(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.dir = mkdtemp()
+        self.files = []
+        for name in FILES:
+            path = os.path.join(self.dir, name)
+            shutil.copy(get_data_path(name), path)
+            self.files.append(path)
+        self.broken = os.path.join(self.dir, fsnative(u"broken.mp3"))
+        with open(self.broken, "wb") as h:
+            h.write(b"nope")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        config.quit()
+
+    def _load(self, pool, filenames):
+        results = []
+        try:
+            for batch in pool.load(filenames, batch_size=2):
+                if batch is not None:
+                    results.extend(batch)
+        finally:
+            pool.shutdown()
+        return results
+
+    def test_load(self):
+        results = self._load(LoaderPool(2), self.files + [self.broken])
+        self.assertEqual(
+            sorted(f for f, s in results), sorted(self.files + [self.broken]))
+        for filename, song in results:
+            if filename == self.broken:
+                self.assertTrue(song is None)
+            else:
+                self.assertTrue(isinstance(song, AudioFile))
+                self.assertEqual(song("~filename"), filename)
+                self.assertTrue(song("~#length"))
+
+    def test_get_pool(self):
+        self.assertTrue(get_pool(0, 10000) is None)
+        self.assertTrue(get_pool(2, _pool.MIN_FILES - 1) is None)
+        pool = get_pool(2, _pool.MIN_FILES)
+        try:
+            self.assertTrue(isinstance(pool, LoaderPool))
+        finally:
+            pool.shutdown()
+
+    def test_library(self):
+        min_files = _pool.MIN_FILES
+        _pool.MIN_FILES = 0
+        library = SongFileLibrary()
+        library.scan_workers = 2
+        try:
+            with capture_output():
+                for x in library.scan([self.dir]):
+                    pass
+            self.assertEqual(
+                sorted(s("~filename") for s in library), sorted(self.files))
+
+            song = library[self.files[0]]
+            song["~#playcount"] = 3
+            song["title"] = u"foo"
+            with capture_output():
+                for x in library.rebuild([], force=True):
+                    pass
+            self.assertEqual(len(library), len(self.files))
+            self.assertTrue(library[self.files[0]] is song)
+            self.assertEqual(song("~#playcount"), 3)
+            self.assertFalse("title" in song)
+        finally:
+            _pool.MIN_FILES = min_files
+            library.destroy()
@@ -0,0 +1,115 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import shutil
+
+from tests import TestCase, mkdtemp, mkstemp, get_data_path
+from tests.helper import set_old_mtime
+
+from quodlibet import config
+from quodlibet.library import SongFileLibrary
+from quodlibet.library.coverindex import CoverIndex, list_cover_candidates
+
+
+class TCoverIndex(TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(mkdtemp())
+        self.scans = os.path.join(self.root, "Scans")
+        os.mkdir(self.scans)
+        os.mkdir(os.path.join(self.root, "other"))
+        for path in ["cover.jpg", "song.ogg", "Scans/back.PNG",
+                     "other/front.jpg"]:
+            with open(os.path.join(self.root, path), "wb"):
+                pass
+        self.age()
+        self.index = CoverIndex()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def age(self):
+        set_old_mtime(self.scans)
+        set_old_mtime(self.root)
+
+    def test_list(self):
+        fns, subdirs = list_cover_candidates(self.root)
+        self.assertEqual(
+            set(fns), {(None, "cover.jpg"), ("Scans", "back.PNG")})
+        self.assertEqual(subdirs, [("Scans", os.stat(self.scans).st_mtime)])
+        self.assertEqual(list_cover_candidates(self.root + "nope"), ([], []))
+
+    def test_update(self):
+        assert self.index.get(self.root) is None
+        fns = self.index.update(self.root)
+        self.assertEqual(set(self.index.get(self.root)), set(fns))
+        assert self.index.dirty
+
+        with open(os.path.join(self.scans, "front.jpg"), "wb"):
+            pass
+        assert self.index.get(self.root) is None
+        set_old_mtime(self.scans)
+        self.assertEqual(len(self.index.update(self.root)), 3)
+
+        os.remove(os.path.join(self.root, "cover.jpg"))
+        assert self.index.get(self.root) is None
+
+    def test_racy(self):
+        os.utime(self.root, None)
+        self.assertEqual(len(self.index.update(self.root)), 2)
+        assert self.index.get(self.root) is None
+        self.assertEqual(len(self.index), 0)
+
+    def test_save_load(self):
+        fd, filename = mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        self.index.update(self.root)
+        self.index.save(filename)
+        assert not self.index.dirty
+
+        index = CoverIndex()
+        index.load(filename)
+        self.assertEqual(len(index), 1)
+        assert index.get(self.root) is not None
+
+        with open(filename, "wb") as h:
+            h.write(b"nope")
+        index.load(filename)
+        self.assertEqual(len(index), 0)
+
+
+class TFileLibraryCoverIndex(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.root = os.path.realpath(mkdtemp())
+        self.filename = os.path.join(self.root, "empty.flac")
+        shutil.copy(get_data_path("empty.flac"), self.filename)
+        shutil.copy(get_data_path("image.jpg"),
+                    os.path.join(self.root, "folder.jpg"))
+        set_old_mtime(self.root)
+        self.library = SongFileLibrary()
+        self.library.enable_cover_index()
+
+    def tearDown(self):
+        self.library.destroy()
+        shutil.rmtree(self.root)
+        config.quit()
+
+    def _rebuild(self, force=False):
+        for i in self.library.rebuild([self.root], force):
+            pass
+
+    def test_rebuild(self):
+        self._rebuild()
+        self.assertEqual(self.library.cover_index.get(self.root),
+                         [(None, "folder.jpg")])
+
+    def test_save(self):
+        self.library.filename = os.path.join(self.root, "songs")
+        self._rebuild()
+        assert os.path.exists(self.library.filename + ".covers")
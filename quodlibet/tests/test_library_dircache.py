@@ -0,0 +1,199 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import shutil
+import time
+
+from tests import TestCase, mkdtemp, mkstemp, get_data_path
+from tests.helper import set_old_mtime
+
+from quodlibet import config
+from quodlibet.library import SongFileLibrary
+from quodlibet.library.dircache import DirectoryCache, RACY_SECONDS
+from quodlibet.library.libraries import iter_paths
+
+
+class TDirectoryCache(TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(mkdtemp())
+        self.child = os.path.join(self.root, "child")
+        os.mkdir(self.child)
+        for path in [self.root, self.child]:
+            with open(os.path.join(path, "file"), "wb"):
+                pass
+        self.age()
+        self.cache = DirectoryCache()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def age(self):
+        set_old_mtime(self.child)
+        set_old_mtime(self.root)
+
+    def _walk(self):
+        return [(p, sorted(d), sorted(f)) for p, d, f, l in
+                self.cache.walk(self.root)]
+
+    def test_walk(self):
+        self.assertEqual(self._walk(), [
+            (self.root, ["child"], ["file"]),
+            (self.child, [], ["file"]),
+        ])
+        self.cache.commit()
+        assert self.cache.dirty
+        self.assertEqual(self._walk(), [
+            (self.root, ["child"], []),
+            (self.child, [], []),
+        ])
+
+        with open(os.path.join(self.child, "new"), "wb"):
+            pass
+        set_old_mtime(self.child, RACY_SECONDS * 5)
+        self.assertEqual(self._walk(), [
+            (self.root, ["child"], []),
+            (self.child, [], ["file", "new"]),
+        ])
+
+    def test_prune(self):
+        for path, dnames, fnames, links in self.cache.walk(self.root):
+            del dnames[:]
+        self.cache.commit()
+        self.assertEqual(len(self.cache), 1)
+
+    def test_not_committed(self):
+        self._walk()
+        self.cache.discard()
+        self.assertEqual(self._walk()[0], (self.root, ["child"], ["file"]))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_racy(self):
+        os.utime(self.child, None)
+        self._walk()
+        self.cache.commit()
+        self.assertEqual(self._walk(), [
+            (self.root, ["child"], []),
+            (self.child, [], ["file"]),
+        ])
+
+    def test_set_checked(self):
+        mtime = os.stat(self.child).st_mtime
+        self.cache.set_checked(self.child, mtime)
+        assert not self.cache.is_unchanged(self.child, mtime)
+        self.cache.commit()
+        assert self.cache.is_unchanged(self.child, mtime)
+        assert not self.cache.is_unchanged(self.child, mtime + 1)
+        # still needs to be listed
+        self.assertEqual(self._walk()[1], (self.child, [], ["file"]))
+
+        self.cache.set_checked(self.child, time.time())
+        assert not self.cache.is_unchanged(self.child, mtime)
+
+    def test_invalidate(self):
+        self._walk()
+        self.cache.commit()
+        self.cache.invalidate(self.child)
+        self.assertEqual(self._walk()[1], (self.child, [], ["file"]))
+
+    def test_save_load(self):
+        fd, filename = mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        self._walk()
+        self.cache.commit()
+        self.cache.save(filename)
+        assert not self.cache.dirty
+
+        cache = DirectoryCache()
+        cache.load(filename)
+        self.assertEqual(len(cache), 2)
+        self.cache = cache
+        self.assertEqual(self._walk()[0], (self.root, ["child"], []))
+
+        with open(filename, "wb") as h:
+            h.write(b"nope")
+        cache.load(filename)
+        self.assertEqual(len(cache), 0)
+
+    def test_iter_paths(self):
+        expected = sorted(iter_paths(self.root))
+        self.assertEqual(
+            sorted(iter_paths(self.root, dir_cache=self.cache)), expected)
+        self.cache.commit()
+        self.assertEqual(list(iter_paths(self.root, dir_cache=self.cache)), [])
+
+    def test_iter_paths_excluded(self):
+        excluded = os.path.join(self.child, "file")
+        paths = list(iter_paths(
+            self.root, exclude=[excluded], dir_cache=self.cache))
+        self.assertEqual(paths, [os.path.join(self.root, "file")])
+        self.cache.commit()
+        # might not be excluded next time
+        self.assertEqual(
+            list(iter_paths(self.root, dir_cache=self.cache)), [excluded])
+
+
+class TFileLibraryDirCache(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.root = os.path.realpath(mkdtemp())
+        self.filename = os.path.join(self.root, "empty.flac")
+        shutil.copy(get_data_path("empty.flac"), self.filename)
+        set_old_mtime(self.root)
+        self.library = SongFileLibrary()
+        self.library.enable_dir_cache()
+
+    def tearDown(self):
+        self.library.destroy()
+        shutil.rmtree(self.root)
+        config.quit()
+
+    def _rebuild(self, force=False):
+        for i in self.library.rebuild([self.root], force):
+            pass
+
+    def test_scan(self):
+        self._rebuild()
+        song = self.library[self.filename]
+        assert self.library._dir_cache.is_unchanged(
+            self.root, os.stat(self.root).st_mtime)
+
+        # unchanged directory, so not checked
+        song.valid = lambda: self.fail("checked")
+        self._rebuild()
+        del song.valid
+
+        # gets added again on the next scan
+        self.library.remove([song])
+        self._rebuild()
+        assert self.filename in self.library
+
+    def test_force(self):
+        self._rebuild()
+        song = self.library[self.filename]
+        song["title"] = u"foo"
+        self._rebuild(force=True)
+        assert "title" not in self.library[self.filename]
+
+    def test_save(self):
+        self.library.filename = os.path.join(self.root, "songs")
+        self._rebuild()
+        assert os.path.exists(self.library.filename + ".dirs")
+
+    def test_failed_retried(self):
+        broken = os.path.join(self.root, "broken.flac")
+        with open(broken, "wb") as h:
+            h.write(b"nope")
+        set_old_mtime(self.root)
+        self._rebuild()
+        assert broken not in self.library
+
+        shutil.copy(get_data_path("empty.flac"), broken)
+        set_old_mtime(self.root)
+        self._rebuild()
+        assert broken in self.library
@@ -7,18 +7,23 @@ from gi.repository import Gtk
 
 import os
 import shutil
+import time
 from senf import fsnative
 
 from quodlibet.formats import AudioFileError
 from quodlibet import config
+from quodlibet import formats
 from quodlibet.util import connect_obj, is_windows
-from quodlibet.formats import AudioFile
+from quodlibet.util.path import ishidden
+from quodlibet.util.collection import VALUE_CACHE
+from quodlibet.formats import AudioFile, dump_audio_files, load_audio_files, \
+    is_legacy_data
 
-from tests import TestCase, get_data_path, mkstemp, mkdtemp, skipIf
+from tests import TestCase, get_data_path, mkstemp, mkdtemp, skipIf, skip
 from .helper import capture_output, get_temp_copy
 
 from quodlibet.library.libraries import Library, PicklingMixin, SongLibrary, \
-    FileLibrary, AlbumLibrary, SongFileLibrary, iter_paths
+    FileLibrary, AlbumLibrary, SongFileLibrary, iter_paths, JournalingMixin
 
 
 class Fake(int):
@@ -306,6 +311,137 @@ class TPicklingMixin(TestCase):
         finally:
             os.unlink(filename)
 
+    def test_migrate_legacy(self):
+        fd, filename = mkstemp()
+        os.close(fd)
+        self.addCleanup(os.unlink, filename)
+        backup = filename + ".legacy"
+        self.addCleanup(lambda: os.path.exists(backup) and os.unlink(backup))
+        with open(filename, "wb") as h:
+            h.write(dump_audio_files(self.Frange(10)))
+
+        library = self.Library()
+        library.load(filename)
+        self.assertEqual(len(library), 10)
+        assert library.dirty
+        library.save()
+        assert not library.dirty
+
+        with open(filename, "rb") as h:
+            assert not is_legacy_data(h.read())
+        with open(backup, "rb") as h:
+            assert len(load_audio_files(h.read())) == 10
+
+        library = self.Library()
+        library.load(filename)
+        self.assertEqual(len(library), 10)
+        assert not library.dirty
+
+
+class TJournalingMixin(TestCase):
+
+    class JournalingMockLibrary(JournalingMixin, Library):
+        pass
+
+    def setUp(self):
+        self.temp = mkdtemp()
+        self.filename = os.path.join(self.temp, "songs")
+        self.journal = self.filename + ".journal"
+
+    def tearDown(self):
+        shutil.rmtree(self.temp)
+
+    def _reload(self):
+        library = self.JournalingMockLibrary()
+        library.load(self.filename)
+        return library
+
+    def test_load_noexist(self):
+        library = self._reload()
+        assert len(library) == 0
+
+    def test_save_load(self):
+        library = self._reload()
+        library.add(FakeAudioFileRange(30))
+        library.save()
+        assert not library.dirty
+        assert os.path.exists(self.filename)
+        assert not os.path.exists(self.journal)
+        assert sorted(self._reload().keys()) == sorted(library.keys())
+
+    def test_migrate_pickle(self):
+        library = TPicklingMixin.PicklingMockLibrary()
+        library.add(FakeAudioFileRange(10))
+        library.save(self.filename)
+        assert sorted(self._reload().keys()) == sorted(library.keys())
+
+    def test_journal(self):
+        library = self._reload()
+        songs = FakeAudioFileRange(10)
+        library.add(songs)
+        library.save()
+        size = os.path.getsize(self.filename)
+
+        songs[0]["title"] = "foo"
+        library.changed([songs[0]])
+        library.remove([songs[1]])
+        library.add(FakeAudioFileRange(20, 22))
+        library.save()
+        assert os.path.getsize(self.filename) == size
+        assert os.path.exists(self.journal)
+
+        other = self._reload()
+        assert sorted(other.keys()) == sorted(library.keys())
+        assert other[songs[0].key]("title") == "foo"
+
+    def test_journal_rename(self):
+        library = self._reload()
+        song = FakeAudioFile(1)
+        library.add([song])
+        library.save()
+
+        del library._contents[song.key]
+        song["~filename"] = fsnative(u"42")
+        library._contents[song.key] = song
+        library.changed([song])
+        library.save()
+
+        assert list(self._reload().keys()) == [fsnative(u"42")]
+
+    def test_journal_truncated(self):
+        library = self._reload()
+        library.add(FakeAudioFileRange(5))
+        library.save()
+        library.add(FakeAudioFileRange(5, 6))
+        library.save()
+        library.add(FakeAudioFileRange(6, 7))
+        library.save()
+
+        with open(self.journal, "rb+") as h:
+            h.truncate(os.path.getsize(self.journal) - 1)
+
+        with capture_output():
+            other = self._reload()
+        assert len(other) == 6
+        assert not os.path.exists(self.journal)
+        assert len(self._reload()) == 6
+
+    def test_compact(self):
+        library = self._reload()
+        library.add(FakeAudioFileRange(10))
+        library.save()
+        library.remove([library[fsnative(u"3")]])
+        library.add(FakeAudioFileRange(10, 12))
+        library.save()
+
+        library.compact()
+        assert not os.path.exists(self.journal)
+        assert sorted(self._reload().keys()) == sorted(library.keys())
+
+        library.add(FakeAudioFileRange(12, 13))
+        library.save()
+        assert sorted(self._reload().keys()) == sorted(library.keys())
+
 
 class TSongLibrary(TLibrary):
     Fake = FakeSong
@@ -622,6 +758,19 @@ class TAlbumLibrary(TestCase):
         self.failUnlessEqual(album2.key, key)
         self.failUnlessEqual(len(album2.songs), 4)
 
+    def test_changed_tags(self):
+        song = self.underlying.get("file_1.mp3")
+        album = self.library[song.album_key]
+        self.failUnlessEqual(album("~#playcount"), 0)
+        self.failUnlessEqual(album("artist"), "Fakeman")
+
+        song["~#playcount"] = 3
+        self.underlying.changed([song])
+        misses = VALUE_CACHE.stats()["misses"]
+        self.failUnlessEqual(album("artist"), "Fakeman")
+        self.failUnlessEqual(VALUE_CACHE.stats()["misses"], misses)
+        self.failUnlessEqual(album("~#playcount"), 3)
+
     def test_misc(self):
         # It shouldn't implement FileLibrary etc
         self.failIf(getattr(self.library, "filename", None))
@@ -750,3 +899,66 @@ class Titer_paths(TestCase):
         os.close(fd)
 
         assert list(iter_paths(self.root)) == []
+
+    def test_filter_func(self):
+        child = mkdtemp(dir=self.root)
+        fd, name = mkstemp(dir=child, suffix=".flac")
+        os.close(fd)
+        fd, other = mkstemp(dir=self.root, suffix=".txt")
+        os.close(fd)
+        is_flac = lambda p: p.endswith(".flac")
+        assert list(iter_paths(self.root, filter_func=is_flac)) == [name]
+
+    @skipIf(is_windows(), "no symlink")
+    def test_filter_func_symlink(self):
+        fd, name = mkstemp(dir=self.root, suffix=".flac")
+        os.close(fd)
+        os.symlink(name, os.path.join(self.root, "foo"))
+        is_flac = lambda p: p.endswith(".flac")
+        assert list(iter_paths(self.root, filter_func=is_flac)) == \
+            [name, name]
+
+    def test_workers(self):
+        names = []
+        for i in range(5):
+            child = mkdtemp(dir=mkdtemp(dir=self.root))
+            fd, name = mkstemp(dir=child)
+            os.close(fd)
+            names.append(name)
+        exclude = [os.path.dirname(names[0])]
+        for workers in [0, 2]:
+            self.assertEqual(
+                sorted(iter_paths(self.root, workers=workers)), sorted(names))
+            self.assertEqual(
+                sorted(iter_paths(self.root, exclude, workers=workers)),
+                sorted(names[1:]))
+
+    @skip("Enable for basic benchmarking of iter_paths")
+    def test_performance(self):
+        for i in range(200):
+            child = os.path.join(self.root, str(i))
+            os.mkdir(child)
+            for j in range(50):
+                with open(os.path.join(child, "%d.mp3" % j), "wb"):
+                    pass
+
+        def legacy():
+            for path, dnames, fnames in os.walk(self.root):
+                dnames[:] = [d for d in dnames
+                             if not ishidden(os.path.join(path, d))]
+                for filename in fnames:
+                    fullfilename = os.path.realpath(
+                        os.path.join(path, filename))
+                    if formats.filter(fullfilename):
+                        yield fullfilename
+
+        for name, func in [
+                ("os.walk", legacy),
+                ("iter_paths", lambda: iter_paths(
+                    self.root, filter_func=formats.filter)),
+                ("iter_paths 4 workers", lambda: iter_paths(
+                    self.root, filter_func=formats.filter, workers=4))]:
+            t = time.time()
+            for i in range(10):
+                count = len(list(func()))
+            print("%s: %d files/s" % (name, count * 10 / (time.time() - t)))
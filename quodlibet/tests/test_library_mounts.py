@@ -0,0 +1,137 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import threading
+import time
+
+from senf import fsnative
+
+from tests import TestCase
+
+from quodlibet.library import mounts
+from quodlibet.library.libraries import FileLibrary
+from quodlibet.library.mounts import MountProber
+
+
+class FakeItem(object):
+
+    def __init__(self, key, mountpoint):
+        self.key = key
+        self.mountpoint = mountpoint
+
+    def exists(self):
+        return True
+
+
+class TMountProber(TestCase):
+
+    def setUp(self):
+        self.hung = threading.Event()
+        self.calls = []
+
+        def ismount(point):
+            self.calls.append(point)
+            if point == fsnative(u"/hung"):
+                self.hung.wait()
+            return point in (fsnative(u"/"), fsnative(u"/hung"))
+
+        self.ismount = mounts.ismount
+        self.timeout = mounts.PROBE_TIMEOUT
+        mounts.ismount = ismount
+        mounts.PROBE_TIMEOUT = 0.05
+        self.prober = MountProber()
+
+    def tearDown(self):
+        self.hung.set()
+        mounts.ismount = self.ismount
+        mounts.PROBE_TIMEOUT = self.timeout
+
+    def test_probe(self):
+        assert self.prober.probe(fsnative(u"/")) is True
+        assert self.prober.probe(fsnative(u"/gone")) is False
+
+    def test_check(self):
+        checked = []
+        assert self.prober.probe(
+            fsnative(u"/gone"), lambda: checked.append(True)) is False
+        assert checked
+
+    def test_cached(self):
+        self.prober.probe(fsnative(u"/"))
+        self.prober.probe(fsnative(u"/"))
+        self.assertEqual(self.calls, [fsnative(u"/")])
+
+    def test_timeout(self):
+        t = time.time()
+        result = self.prober.probe_all(
+            {fsnative(u"/hung"): None, fsnative(u"/"): None})
+        assert time.time() - t < 1.0
+        self.assertEqual(
+            result, {fsnative(u"/hung"): None, fsnative(u"/"): True})
+
+        # still running, so not started again
+        assert self.prober.probe(fsnative(u"/hung"), timeout=0) is None
+        self.assertEqual(self.calls.count(fsnative(u"/hung")), 1)
+
+        self.hung.set()
+        assert self.prober.get(fsnative(u"/hung"), timeout=1.0) is True
+
+
+class TFileLibraryMounts(TMountProber):
+
+    def setUp(self):
+        super(TFileLibraryMounts, self).setUp()
+        self.library = FileLibrary()
+
+    def tearDown(self):
+        self.library.destroy()
+        super(TFileLibraryMounts, self).tearDown()
+
+    def test_load_init(self):
+        items = [FakeItem(fsnative(u"/a"), fsnative(u"/")),
+                 FakeItem(fsnative(u"/hung/a"), fsnative(u"/hung")),
+                 FakeItem(fsnative(u"/gone/a"), fsnative(u"/gone"))]
+        self.library._load_init(items)
+        assert items[0] in self.library
+        assert self.library.masked(items[1])
+        assert self.library.masked(items[2])
+
+        self.hung.set()
+        self.library._mounts.get(fsnative(u"/hung"), timeout=1.0)
+        assert self.library._poll_masked()
+        assert items[1] in self.library
+        assert self.library.masked(items[2])
+
+    def test_masked_unmounted(self):
+        gone = FakeItem(fsnative(u"/gone/a"), fsnative(u"/gone"))
+        other = FakeItem(fsnative(u"/gonex/a"), fsnative(u"/gonex"))
+        assert not self.library.masked(gone)
+        assert not self.library.masked(gone.key)
+
+        # not masked, but the mount point went away since
+        assert self.library._mounts.probe(gone.mountpoint) is False
+        assert self.library.masked(gone)
+        assert self.library.masked(gone.key)
+        assert not self.library.masked(other.key)
+        assert not self.library.masked(
+            FakeItem(fsnative(u"/b"), fsnative(u"/")))
+
+    def test_poll_automount(self):
+        automounted = []
+
+        def ismount(point):
+            return point == fsnative(u"/auto") and bool(automounted)
+        mounts.ismount = ismount
+
+        # accessing an item mounts it, like with an expired autofs mount
+        item = FakeItem(fsnative(u"/auto/a"), fsnative(u"/auto"))
+        item.exists = lambda: automounted.append(True) or True
+        self.library._masked[item.mountpoint] = {item.key: item}
+
+        self.library._poll_masked()
+        self.library._mounts.get(item.mountpoint, timeout=1.0)
+        self.library._poll_masked()
+        assert automounted
+        assert item in self.library
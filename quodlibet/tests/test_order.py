@@ -8,7 +8,7 @@ from collections import defaultdict
 from quodlibet.formats import AudioFile
 from quodlibet.order import OrderInOrder
 from quodlibet.order.reorder import OrderWeighted, OrderShuffle
-from quodlibet.order.repeat import OneSong
+from quodlibet.order.repeat import OneSong, RepeatListForever
 from quodlibet.qltk.songmodel import PlaylistModel
 from tests import TestCase
 
@@ -51,6 +51,29 @@ class TOrderShuffle(TestCase):
         cur = order.next_explicit(pl, cur)
         self.failUnlessEqual(len(order.remaining(pl)), len(songs))
 
+    def test_row_changes(self):
+        order = OrderShuffle()
+        pl = PlaylistModel()
+        pl.order = order
+        pl.set([r0, r1, r2])
+        cur = order.next_explicit(pl, None)
+        cur = order.next_explicit(pl, cur)
+        played = pl[order._played[0]][0]
+
+        # history survives inserting and removing other songs
+        pl.insert(0, [r3])
+        self.failUnlessEqual(pl[order._played[0]][0], played)
+        self.failUnlessEqual(len(order.remaining(pl)), 3)
+        pl.remove(pl.get_iter_first())
+        self.failUnlessEqual(pl[order._played[0]][0], played)
+        self.failUnlessEqual(len(order.remaining(pl)), 2)
+
+        seen = {played}
+        while cur is not None:
+            seen.add(pl[cur][0])
+            cur = order.next_explicit(pl, cur)
+        self.failUnlessEqual(seen, {r0, r1, r2})
+
 
 class TOrderOneSong(TestCase):
 
@@ -60,3 +83,52 @@ class TOrderOneSong(TestCase):
         pl.set([r0, r1])
         for i in range(2):
             self.failUnlessEqual(order.next(pl, pl.current_iter), None)
+
+
+class TWeightedReorder(TestCase):
+
+    def test_zero_weights(self):
+        pl = PlaylistModel()
+        pl.set([r0, r0, r0])
+        order = OrderWeighted()
+        cur = None
+        played = []
+        for i in range(3):
+            cur = order.next_explicit(pl, cur)
+            played.append(pl.get_path(cur).get_indices()[0])
+        self.failUnlessEqual(sorted(played), [0, 1, 2])
+        self.failUnless(order.next_explicit(pl, cur) is None)
+
+    def test_rating_changed(self):
+        pl = PlaylistModel()
+        songs = [AudioFile({'~#rating': 0}), AudioFile({'~#rating': 1.0})]
+        pl.order = order = OrderWeighted()
+        pl.set(songs)
+        self.failUnlessEqual(pl[order.next_explicit(pl, None)][0], songs[1])
+        songs[0]['~#rating'] = 1.0
+        songs[1]['~#rating'] = 0
+        for iter_, song in pl.iterrows():
+            pl.row_changed(pl.get_path(iter_), iter_)
+        self.failUnlessEqual(pl[order.next_explicit(pl, None)][0], songs[0])
+
+    def test_songs_changed(self):
+        pl = PlaylistModel()
+        songs = [AudioFile({'~#rating': 0}), AudioFile({'~#rating': 1.0})]
+        pl.order = order = OrderWeighted()
+        pl.set(songs)
+        self.failUnlessEqual(pl[order.next_explicit(pl, None)][0], songs[1])
+        songs[0]['~#rating'] = 1.0
+        songs[1]['~#rating'] = 0
+        pl.songs_changed([songs[0], songs[1], AudioFile()])
+        self.failUnlessEqual(pl[order.next_explicit(pl, None)][0], songs[0])
+
+    def test_songs_changed_repeat(self):
+        pl = PlaylistModel()
+        songs = [AudioFile({'~#rating': 0}), AudioFile({'~#rating': 1.0})]
+        pl.order = order = RepeatListForever(OrderWeighted())
+        pl.set(songs)
+        self.failUnlessEqual(pl[order.next_explicit(pl, None)][0], songs[1])
+        songs[0]['~#rating'] = 1.0
+        songs[1]['~#rating'] = 0
+        pl.songs_changed(songs)
+        self.failUnlessEqual(pl[order.next_explicit(pl, None)][0], songs[0])
@@ -3,14 +3,15 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
-from tests import TestCase, mkstemp
+from tests import TestCase, mkstemp, mkdtemp
 
 import os
+import shutil
 
 from quodlibet import config
 from quodlibet.formats import AudioFile
 from quodlibet.util.songwrapper import SongWrapper, ListWrapper
-from quodlibet.plugins import PluginConfig
+from quodlibet.plugins import PluginConfig, PluginManager, PluginManifest
 
 
 class TSongWrapper(TestCase):
@@ -162,3 +163,69 @@ class TPluginConfig(TestCase):
         c = PluginConfig("some")
         c.defaults.set("hm", "mh")
         self.assertEqual(c.get("hm"), "mh")
+
+
+PLUGIN_MODULE = b"""
+class LazyPlugin(object):
+    PLUGIN_ID = "lazy_plugin"
+    PLUGIN_NAME = "Lazy"
+    PLUGIN_DESC = "Foo"
+"""
+
+
+class TPluginManagerLazy(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.dir = mkdtemp()
+        self.folder = os.path.join(self.dir, "plugins")
+        os.mkdir(self.folder)
+        with open(os.path.join(self.folder, "qllazy.py"), "wb") as h:
+            h.write(PLUGIN_MODULE)
+        self.manifest = os.path.join(self.dir, "manifest")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        config.quit()
+
+    def _rescan(self):
+        pm = PluginManager([self.folder], self.manifest)
+        pm.rescan(lazy=True)
+        return pm
+
+    def test_manifest(self):
+        self._rescan()
+        manifest = PluginManifest()
+        manifest.load(self.manifest)
+        path = os.path.join(self.folder, "qllazy.py")
+        entries = manifest.get("qllazy", [path])
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]["id"], "lazy_plugin")
+        self.assertEqual(entries[0]["description"], "Foo")
+        self.assertEqual(entries[0]["types"], ["object"])
+        assert manifest.get("qllazy", [path, path + "c"]) is None
+
+        os.utime(path, (0, 0))
+        assert manifest.get("qllazy", [path]) is None
+
+    def test_lazy(self):
+        pm = self._rescan()
+        self.assertEqual([p.id for p in pm._plugins], ["lazy_plugin"])
+
+        # disabled, so not loaded the next time
+        pm = self._rescan()
+        self.assertEqual(pm._plugins, [])
+        pm.load_all()
+        self.assertEqual([p.id for p in pm._plugins], ["lazy_plugin"])
+
+    def test_enabled(self):
+        self._rescan()
+        config.set("plugins", "active_plugins", "lazy_plugin")
+        pm = self._rescan()
+        self.assertEqual([p.id for p in pm._plugins], ["lazy_plugin"])
+
+    def test_no_manifest(self):
+        for i in range(2):
+            pm = PluginManager([self.folder])
+            pm.rescan(lazy=True)
+            self.assertEqual(len(pm._plugins), 1)
@@ -3,11 +3,18 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
-from tests import TestCase
+import os
 
-from quodlibet.formats import DUMMY_SONG
+from gi.repository import Gtk
+
+from tests import TestCase, mkstemp
+
+from quodlibet.formats import AudioFile, DUMMY_SONG
 from quodlibet.qltk._editutils import FilterCheckButton, \
-    OverwriteWarning, WriteFailedError, FilterPluginBox, EditingPluginHandler
+    OverwriteWarning, WriteFailedError, FilterPluginBox, \
+    EditingPluginHandler, WriteBatchFailedError, write_batch, changed_outside
+from quodlibet.util.path import mtime
+from quodlibet.util.tagwriter import WriteBatch
 
 
 class FCB(FilterCheckButton):
@@ -68,6 +75,52 @@ class TEditDialogs(TestCase):
     def test_write_failed(self):
         WriteFailedError(None, DUMMY_SONG).destroy()
 
+    def test_write_batch_failed(self):
+        batch = WriteBatch(None)
+        batch.failed.append(DUMMY_SONG)
+        WriteBatchFailedError(None, batch).destroy()
+
+
+class FakeBatch(object):
+
+    failed = []
+
+    def write(self, songs, callback):
+        self.callback = callback
+
+
+class TWriteBatch(TestCase):
+
+    def test_done(self):
+        widget = Gtk.Label()
+        done = []
+        batch = FakeBatch()
+        write_batch(widget, batch, [], done.append)
+        batch.callback(batch)
+        self.assertEqual(done, [batch])
+        widget.destroy()
+
+    def test_destroyed(self):
+        widget = Gtk.Label()
+        done = []
+        batch = FakeBatch()
+        write_batch(widget, batch, [], done.append)
+        widget.destroy()
+        batch.callback(batch)
+        self.assertFalse(done)
+
+
+class TChangedOutside(TestCase):
+
+    def test_main(self):
+        fd, filename = mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, filename)
+        song = AudioFile({"~filename": filename, "~#mtime": mtime(filename)})
+        self.assertFalse(changed_outside(song))
+        song["~#mtime"] = 42
+        self.assertTrue(changed_outside(song))
+
 
 class TFilterPluginBox(TestCase):
 
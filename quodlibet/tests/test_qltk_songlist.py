@@ -3,14 +3,17 @@
 # the Free Software Foundation; either version 2 of the License, or
 # (at your option) any later version.
 
+import time
+
 from gi.repository import Gtk
 from senf import fsnative
 
-from tests import TestCase
+from tests import TestCase, skip
+from .helper import visible
 
 from quodlibet.library import SongLibrary
 from quodlibet.qltk.songlist import SongList, set_columns, get_columns, \
-    header_tag_split, get_sort_tag
+    header_tag_split, get_sort_tag, get_sort_key_func, get_column_key_func
 from quodlibet.formats import AudioFile
 from quodlibet import config
 
@@ -169,6 +172,136 @@ class TSongList(TestCase):
 
         self.assertEqual(self.songlist.get_songs(), [song] * 4)
 
+    def _get_songs(self):
+        songs = []
+        for i in range(20):
+            songs.append(AudioFile({
+                "~filename": fsnative(u"/dev/%d" % i),
+                "artist": u"artist %d" % (i % 3),
+                "album": u"album %d" % (i % 4),
+                "~#rating": (i % 5) / 4.0,
+            }))
+        return songs
+
+    def test_add_songs_sorted(self):
+        songs = self._get_songs()
+        s = self.songlist
+        s.set_column_headers(["artist", "album", "~#rating"])
+        for orders in [[("artist", False)],
+                       [("artist", True), ("~#rating", False)],
+                       [("album", False), ("artist", True)]]:
+            s.set_sort_orders(orders)
+            s.set_songs(songs[:7])
+            s.add_songs(songs[7:12])
+            s.add_songs(songs[12:])
+            expected = list(songs)
+            s._sort_songs(expected)
+            self.assertEqual(s.get_songs(), expected)
+
+    def _sort_by_columns(self, songs, orders):
+        # sort by the default key and then by each column, like the
+        # song list used to do
+        songs = list(songs)
+        songs.sort(key=lambda s: s.sort_key, reverse=orders[0][1])
+        for header, reverse in orders:
+            tag = get_sort_tag(header)
+            if tag == "":
+                songs.sort(key=lambda s: s.sort_key, reverse=reverse)
+            else:
+                songs.sort(key=AudioFile.sort_by_func(tag), reverse=reverse)
+        return songs
+
+    def test_sort_songs(self):
+        songs = self._get_songs()
+        s = self.songlist
+        s.set_column_headers(["~#rating", "~#track", "artist", "<album>"])
+        for orders in [[("~#rating", True)], [("~#track", False)],
+                       [("artist", False), ("<album>", True)],
+                       [("<album>", True), ("artist", True)],
+                       [("artist", True), ("~#rating", False)]]:
+            s.set_sort_orders(orders)
+            expected = self._sort_by_columns(songs, orders)
+            result = list(songs)
+            s._sort_songs(result)
+            self.assertEqual(result, expected)
+            self.assertEqual(
+                sorted(songs, key=get_sort_key_func(orders)), expected)
+
+        s.clear_sort()
+        result = list(songs)
+        s._sort_songs(result)
+        self.assertEqual(result, songs)
+
+    def test_sort_songs_changed(self):
+        songs = self._get_songs()
+        s = self.songlist
+        s.set_column_headers(["artist"])
+        s.set_sort_orders([("artist", False)])
+        s._sort_songs(songs)
+        songs[0]["artist"] = u"zzz"
+        s._sort_songs(songs)
+        self.assertEqual(songs[-1]["artist"], u"zzz")
+
+    def test_song_updated(self):
+        songs = self._get_songs()
+        library = SongLibrary()
+        songlist = SongList(library)
+        songlist.set_songs(songs, sorted=True)
+        changed = []
+        songlist.get_model().connect(
+            "row-changed", lambda m, p, i: changed.append(p.get_indices()[0]))
+
+        with visible(songlist, 400, 800):
+            del changed[:]
+            library.emit("changed", songs[:2])
+            library.emit("changed", [songs[1], songs[3]])
+            # updated once for all signals
+            self.assertEqual(changed, [])
+            while Gtk.events_pending():
+                Gtk.main_iteration()
+            self.assertEqual(changed, [0, 1, 3])
+
+            del changed[:]
+            library.emit("changed", songs)
+            library.emit("changed", songs[:5])
+            while Gtk.events_pending():
+                Gtk.main_iteration()
+            self.assertEqual(changed, list(range(len(songs))))
+
+        songlist.destroy()
+
+    def test_column_key_func(self):
+        song = AudioFile({"~filename": fsnative(u"/dev/null"),
+                          "title": u"foo", "~#rating": 0.5})
+        self.assertEqual(get_column_key_func("~#track")(song), song.sort_key)
+        self.assertEqual(get_column_key_func("~#rating")(song), 0.5)
+        self.assertEqual(song.column_sort_keys, {})
+        self.assertEqual(get_column_key_func("title")(song), (u"foo",))
+        self.assertEqual(song.column_sort_keys, {"title": (u"foo",)})
+        self.assertEqual(get_column_key_func("<title>")(song), (u"foo",))
+        assert "<title>" in song.column_sort_keys
+
+    @skip("Enable for basic benchmarking of SongList sorting")
+    def test_sort_performance(self):
+        songs = []
+        for i in range(200000):
+            songs.append(AudioFile({
+                "~filename": fsnative(u"/dev/%d" % i),
+                "artist": u"Artist %d" % (i % 1000),
+                "album": u"Album %d" % (i % 10000),
+                "title": u"Title %d" % i,
+                "~#rating": (i % 5) / 4.0,
+            }))
+        s = self.songlist
+        s.set_column_headers(["artist", "album", "~#rating"])
+        for orders in [[("artist", False)], [("album", True)],
+                       [("artist", False), ("~#rating", True)]]:
+            s.set_sort_orders(orders)
+            for i in range(2):
+                t = time.time()
+                s._sort_songs(songs)
+                print("\n%r: %.3fs" % (orders, time.time() - t))
+
     def test_header_menu(self):
         from quodlibet import browsers
         from quodlibet.library import SongLibrary, SongLibrarian
@@ -103,6 +103,23 @@ class TPlaylistModel(TestCase):
         self.failUnless(8 in self.pl)
         self.failIf(22 in self.pl)
 
+    def test_index_updates(self):
+        self.failUnless(5 in self.pl)
+        self.pl.remove(self.pl.find(5))
+        self.failIf(5 in self.pl)
+        self.pl.insert(0, [5])
+        self.pl.append([5])
+        iters = self.pl.find_all([5])
+        self.failUnlessEqual(len(iters), 2)
+        self.failUnlessEqual(self.pl.get_path(iters[0]).get_indices(), [0])
+        self.failUnlessEqual(
+            self.pl.get_path(self.pl.find(5)).get_indices(), [0])
+        self.pl[iters[0]][0] = 22
+        self.failUnless(22 in self.pl)
+        self.failUnlessEqual(len(self.pl.find_all([5])), 1)
+        self.pl.clear()
+        self.failIf(22 in self.pl)
+
     def test_removal(self):
         self.pl.go_to(8)
         for i in range(3, 8):
@@ -0,0 +1,139 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import time
+
+from tests import TestCase
+from tests.helper import Song
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.library import SongLibrary
+from quodlibet.query import Query
+from quodlibet.query import _columns
+from quodlibet.query._columns import NumericColumns, can_store
+
+
+class TNumericColumns(TestCase):
+
+    def setUp(self):
+        config.init()
+        now = time.time()
+        self.songs = [
+            Song(0, **{"~#playcount": 10, "~#rating": 0.75,
+                       "~#added": now - 3600 * 24 * 3, "~#length": 200}),
+            Song(1, **{"~#playcount": 0, "~#added": now - 60,
+                       "~#length": 120.5, "bpm": u"120"}),
+            Song(2, **{"~#playcount": 3, "~#rating": 0.25,
+                       "~#length": 356.127, "bpm": u"fast"}),
+            Song(3, **{"~#playcount": 11, "~#skipcount": 2,
+                       "~#added": now - 3600 * 24 * 14}),
+        ]
+        self.library = SongLibrary()
+        self.library.add(self.songs)
+        self.columns = NumericColumns(self.library)
+
+    def tearDown(self):
+        self.library.destroy()
+        config.quit()
+
+    def _check(self, text):
+        query = Query(text)
+        found = query._match.candidates(self)
+        if found is not None:
+            assert set(filter(query.search, self.songs)) <= found
+        return found
+
+    def test_can_store(self):
+        assert can_store("~#playcount")
+        assert not can_store("~#playcount:avg")
+        assert not can_store("~#foo~bar")
+        assert not can_store("artist")
+
+    def test_compare(self):
+        assert self._check(u"#(playcount > 5)") == \
+            {self.songs[0], self.songs[3]}
+        assert self._check(u"#(playcount = 0)") == {self.songs[1]}
+        assert self._check(u"#(skipcount >= 2)") == {self.songs[3]}
+        assert self._check(u"#(playcount + skipcount > 12)") == \
+            {self.songs[3]}
+        assert self._check(u"#(-playcount < -10.5)") == {self.songs[3]}
+        assert self._check(u"#(length < 2:00)") == {self.songs[3]}
+
+    def test_limits(self):
+        # values close to the limit and missing ones might be included
+        assert self._check(u"#(3 < playcount)") == \
+            {self.songs[0], self.songs[2], self.songs[3]}
+        assert self._check(u"#(playcount != 0)") == set(self.songs)
+        assert self._check(u"#(bpm != 0)") == {self.songs[1]}
+
+    def test_time(self):
+        assert self._check(u"#(added < 1 day)") == {self.songs[1]}
+        assert self._check(u"#(added > 1 week)") == \
+            {self.songs[2], self.songs[3]}
+        assert self._check(u"#(added < 5 days ago)") == \
+            {self.songs[0], self.songs[1]}
+
+    def test_rating_default(self):
+        assert self._check(u"#(rating = 0.5)") == \
+            {self.songs[1], self.songs[3]}
+        default = config.RATINGS.default
+        config.RATINGS.default = 0.75
+        try:
+            assert self._check(u"#(rating = 0.75)") == \
+                {self.songs[0], self.songs[1], self.songs[3]}
+        finally:
+            config.RATINGS.default = default
+
+    def test_parsed(self):
+        assert self._check(u"#(bpm > 100)") == {self.songs[1]}
+
+    def test_unsupported(self):
+        assert self._check(u"#(playcount * 2 > 5)") is None
+        assert self._check(u"#(date > 2000)") is None
+        assert self._check(u"#(1 < 2)") is None
+
+    def test_signals(self):
+        assert self._check(u"#(playcount > 5)") == \
+            {self.songs[0], self.songs[3]}
+
+        self.songs[1]["~#playcount"] = 20
+        self.columns.changed([self.songs[1]])
+        self.columns.remove([self.songs[0]])
+        new = Song(4, **{"~#playcount": 6})
+        self.columns.add([new])
+        self.songs = self.songs[1:] + [new]
+
+        assert self._check(u"#(playcount > 5)") == \
+            {self.songs[0], self.songs[2], new}
+
+    def test_sort(self):
+        for tag in ["~#playcount", "~#rating", "~#added", "~#length",
+                    "~#skipcount"]:
+            for reverse in [False, True]:
+                songs = list(self.songs)
+                assert self.columns.sort(songs, tag, reverse)
+                expected = sorted(self.songs,
+                                  key=AudioFile.sort_by_func(tag),
+                                  reverse=reverse)
+                self.assertEqual(songs, expected)
+
+    def test_sort_unsupported(self):
+        songs = list(self.songs)
+        assert not self.columns.sort(songs, "~#bpm:avg")
+        assert not self.columns.sort(songs, "artist")
+        assert not self.columns.sort(songs + [Song(5)], "~#playcount")
+        self.assertEqual(songs, self.songs)
+
+    def test_without_numpy(self):
+        numpy = _columns.numpy
+        _columns.numpy = None
+        try:
+            self.test_compare()
+            self.test_time()
+            self.test_rating_default()
+            self.test_sort()
+        finally:
+            _columns.numpy = numpy
@@ -0,0 +1,142 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import time
+
+from senf import fsnative
+
+from tests import TestCase, skip
+
+from quodlibet import config
+from quodlibet.formats import AudioFile
+from quodlibet.query import Query
+from quodlibet.query import _match as match
+from quodlibet.query._compiler import QueryCompiler, compile_query
+from quodlibet.util.collection import Album
+
+
+QUERIES = [
+    u"foo",
+    u"piman mu",
+    u"!piman",
+    u"|(foo, mu)",
+    u"&(piman, !quux)",
+    u"artist=piman",
+    u"artist=!piman",
+    u"artist=|(mu, foo)",
+    u"title,artist=/^p/",
+    u"~filename=dir1",
+    u"~dirname=dir2",
+    u"filename=foo",
+    u"mountpoint=bla",
+    u"~people=mu",
+    u"date=2007",
+    u"#(playcount > 10)",
+    u"#(playcount >= 24, skipcount < 20)",
+    u"#(10 < playcount < 30)",
+    u"#(added < 2 days)",
+    u"#(lastplayed > 1 hour)",
+    u"#(added < 3 weeks ago)",
+    u"#(date > 2000)",
+    u"#(date < 2007-06)",
+    u"#(playcount + skipcount > 30)",
+    u"#(playcount // 0 > 2)",
+    u"#(playcount // 2 > 10)",
+    u"#(-playcount < -10)",
+    u"#((playcount + 1) * 2 > 40)",
+    u"#(length < 3:00)",
+    u"#(1 + 2 < 4)",
+    u"#(1 // 0 > 4)",
+    u"#(playcount:sum > 30)",
+    u"#(foo = 1)",
+    u"&(#(playcount > 10), |(piman, mu))",
+    u"|(#(playcount > 10), &(foo, bar))",
+    u"!#(playcount > 10)",
+    u"&()",
+    u"|()",
+    u"&(artist=piman, &(title=quux, album=/tests/))",
+    u"invalid ((",
+]
+
+
+class TQueryCompiler(TestCase):
+
+    def setUp(self):
+        config.init()
+        now = time.time()
+        self.songs = [
+            AudioFile({
+                "album": u"I Hate: Tests", "artist": u"piman",
+                "title": u"Quuxly", "~filename": fsnative(u"/dir1/foobar.ogg"),
+                "~#length": 224, "~#skipcount": 13, "~#playcount": 24,
+                "~#added": now - 3600 * 24 * 3, "~#lastplayed": now - 60,
+                "date": u"2007-05-24"}),
+            AudioFile({
+                "album": u"Foo the Bar", "artist": u"mu",
+                "title": u"Rockin' Out",
+                "~filename": fsnative(u"/dir2/something.mp3"),
+                "~#playcount": 0, "date": u"invalid"}),
+            AudioFile({
+                "artist": u"piman\nmu",
+                "~filename": fsnative(u"/test/\xf6\xe4\xfc/fo\xfc.ogg"),
+                "~mountpoint": fsnative(u"/bla/\xf6\xe4\xfc/fo\xfc"),
+                "~#added": now - 60}),
+        ]
+        album = Album(self.songs[0])
+        album.songs = set(self.songs[:2])
+        self.album = album
+
+    def tearDown(self):
+        config.quit()
+
+    def test_same_result(self):
+        for text in QUERIES:
+            query = Query(text)
+            search = compile_query(query._match)
+            for song in self.songs + [self.album]:
+                self.assertEqual(
+                    bool(search(song)), bool(query._match.search(song)),
+                    msg="%r %r" % (text, song))
+
+    def test_query(self):
+        query = Query(u"piman")
+        assert query.search(self.songs[0])
+        assert not query.search(self.songs[1])
+        self.assertEqual(
+            query.filter(self.songs), [self.songs[0], self.songs[2]])
+
+    def test_constant_folding(self):
+        compiler = QueryCompiler()
+        compiler.compile(Query(u"#(playcount > 4 * 5)")._match)
+        assert "20.0" in compiler.source
+        assert "*" not in compiler.source
+
+        search = compile_query(Query(u"#(playcount > 4 * 5)")._match)
+        assert search(self.songs[0])
+        assert not search(self.songs[1])
+
+    def test_fallback(self):
+        class Custom(match.Node):
+            def search(self, data):
+                return data("artist") == u"mu"
+
+        search = compile_query(Custom())
+        assert search(self.songs[1])
+        assert not search(self.songs[0])
+
+    @skip("Enable for basic benchmarking of Query")
+    def test_performance(self):
+        songs = self.songs * 10000
+        for text in [u"piman mu", u"artist=piman", u"#(playcount > 10)",
+                     u"&(foo, #(added < 1 week, length > 3:00))"]:
+            query = Query(text)
+            timings = []
+            for search in [query._match.search, query.search]:
+                t = time.time()
+                for song in songs:
+                    search(song)
+                timings.append((time.time() - t) * 1000000 / len(songs))
+            print("%r: %.2f μs -> %.2f μs per song" % (
+                text, timings[0], timings[1]))
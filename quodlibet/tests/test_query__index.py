@@ -0,0 +1,150 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from tests import TestCase
+from tests.helper import Song
+
+from quodlibet.library import SongLibrary
+from quodlibet.query import Query
+from quodlibet.query._index import fold, get_words, get_required_words, \
+    can_index
+
+
+class TFold(TestCase):
+
+    def test_case(self):
+        assert fold(u"FooBar") == u"foobar"
+
+    def test_diacritics(self):
+        assert fold(u"Múm") == fold(u"mum")
+        assert fold(u"Björk") == fold(u"bjork")
+
+    def test_variants(self):
+        assert fold(u"Æon") == fold(u"aeon")
+        assert fold(u"Łódź") == fold(u"lodz")
+
+    def test_words(self):
+        assert get_words(u"The Beatles\nfoo-bar") == \
+            {u"the", u"beatles", u"foo", u"bar"}
+
+
+class TRequiredWords(TestCase):
+
+    def test_literal(self):
+        assert sorted(get_required_words(u"beatles")) == [u"beatles"]
+        assert sorted(get_required_words(u"the beatles")) == \
+            [u"beatles", u"the"]
+
+    def test_short(self):
+        assert get_required_words(u"ab") == []
+
+    def test_regex(self):
+        assert sorted(get_required_words(u"^foo.*bar$")) == [u"bar", u"foo"]
+        assert get_required_words(u"foo|bar") == []
+        assert get_required_words(u"(foo)") == []
+        assert get_required_words(u"fooo?") == [u"foo"]
+
+    def test_invalid(self):
+        assert get_required_words(u"(") == []
+
+    def test_can_index(self):
+        assert can_index("artist")
+        assert can_index("~filename")
+        assert can_index("~people")
+        assert can_index("~title~version")
+        assert can_index("~people~~filename")
+        assert not can_index("~title~#track")
+        assert not can_index("~playlists")
+        assert not can_index("~rating")
+        assert not can_index("#foo")
+        assert not can_index("")
+
+
+class TTagIndex(TestCase):
+
+    def setUp(self):
+        self.library = SongLibrary()
+        self.songs = [
+            Song(0, artist=u"The Beatles", title=u"Help"),
+            Song(1, artist=u"Björk", title=u"Hyperballad"),
+            Song(2, artist=u"Múm", title=u"Green Grass of Tunnel"),
+            Song(3, artist=u"Beatles Tribute", title=u"Helpless", album=u"X"),
+        ]
+        self.library.add(self.songs)
+        self.library.enable_query_index()
+        self.index = self.library.query_index
+
+    def tearDown(self):
+        self.library.destroy()
+
+    def _check(self, text, star=Query.STAR):
+        query = Query(text, star)
+        expected = set(filter(query.search, self.songs))
+        candidates = self.index.candidates(query)
+        if candidates is not None:
+            assert expected <= candidates
+        assert set(self.library.query(text, star=star)) == expected
+        return candidates
+
+    def test_text(self):
+        assert self._check(u"beatles") == {self.songs[0], self.songs[3]}
+        assert self._check(u"bjork") == {self.songs[1]}
+        assert self._check(u"MUM") == {self.songs[2]}
+        assert self._check(u"eatle") == {self.songs[0], self.songs[3]}
+        assert self._check(u"beatles help") == \
+            {self.songs[0], self.songs[3]}
+
+    def test_tags(self):
+        assert self._check(u"title=help") == {self.songs[0], self.songs[3]}
+        assert self._check(u"artist=/^the/") == {self.songs[0]}
+        assert self._check(u"title=\"Help\"") == \
+            {self.songs[0], self.songs[3]}
+        assert self._check(u"~filename=file2") == {self.songs[2]}
+        assert self._check(u"album=x") is None
+
+    def test_combined(self):
+        assert self._check(u"|(bjork, mum)") == \
+            {self.songs[1], self.songs[2]}
+        assert self._check(u"&(beatles, #(playcount < 3))") == \
+            {self.songs[0], self.songs[3]}
+        assert self._check(u"!beatles") is None
+        assert self._check(u"|(beatles, #(playcount < 3))") == \
+            set(self.songs)
+        assert self._check(u"|(beatles, #(playcount * 2 < 3))") is None
+        assert self._check(u"artist=!beatles") is None
+        assert self._check(u"artist=|(bjork, mum)") == \
+            {self.songs[1], self.songs[2]}
+
+    def test_synthesized_tag(self):
+        assert self._check(u"~people=beatles") == \
+            {self.songs[0], self.songs[3]}
+        assert self._check(u"~title~artist=bjork") == {self.songs[1]}
+
+    def test_unindexed_tag(self):
+        assert self._check(u"~playlists=beatles") is None
+        assert self._check(u"title,~playlists=help") == \
+            {self.songs[0], self.songs[3]}
+        assert self._check(u"title,~playlists=h") is None
+
+    def test_default_star(self):
+        # SongList.star for the default columns
+        star = Query.STAR + ["~people", "version", "discsubtitle"]
+        assert self._check(u"beatles", star) == \
+            {self.songs[0], self.songs[3]}
+        assert self._check(u"help", star) == {self.songs[0], self.songs[3]}
+
+    def test_signals(self):
+        assert self._check(u"beatles") == {self.songs[0], self.songs[3]}
+
+        self.songs[1]["artist"] = u"Beatles"
+        self.library.changed([self.songs[1]])
+        self.library.remove([self.songs[0]])
+        del self.songs[0]
+        new = Song(4, title=u"Beatles")
+        self.library.add([new])
+        self.songs.append(new)
+
+        assert self._check(u"beatles") == \
+            {self.songs[0], self.songs[2], new}
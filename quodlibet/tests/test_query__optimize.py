@@ -0,0 +1,89 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+from tests import TestCase
+from tests.helper import Song
+
+from quodlibet import config
+from quodlibet.query import Query
+from quodlibet.query._optimize import Selectivity, optimize, learn, \
+    SAMPLE_SIZE
+
+
+class TOptimize(TestCase):
+
+    def setUp(self):
+        config.init()
+        self.selectivity = Selectivity()
+        self.songs = []
+        for i in range(SAMPLE_SIZE * 2):
+            song = Song(i, artist=u"foo" if i % 8 else u"bar")
+            song["~#playcount"] = i
+            self.songs.append(song)
+
+    def tearDown(self):
+        config.quit()
+
+    def _optimize(self, text):
+        return optimize(Query(text)._match, self.selectivity)
+
+    def test_cost(self):
+        text = u"&(~filename=foo, ~people=foo, artist=foo, #(playcount > 10))"
+        node = self._optimize(text)
+        expected = reversed(Query(text)._match.res)
+        self.assertEqual(
+            [repr(r) for r in node.res], [repr(r) for r in expected])
+
+    def test_nested(self):
+        node = self._optimize(u"!&(artist=foo, #(playcount > 10))")
+        assert "<Numcmp" in repr(node.res.res[0])
+        node = self._optimize(u"|(artist=foo, &(title=a, #(playcount > 1)))")
+        assert "<Numcmp" in repr(node.res[1].res[0])
+
+    def test_selectivity(self):
+        text = u"&(artist=foo, title=foo)"
+        assert repr(self._optimize(text).res[0]).startswith(
+            "<Tag names=['artist']")
+        self.selectivity.set(Query(u"title=foo")._match, 0.1)
+        self.selectivity.set(Query(u"artist=foo")._match, 0.9)
+        assert repr(self._optimize(text).res[0]).startswith(
+            "<Tag names=['title']")
+
+        text = u"|(artist=foo, title=foo)"
+        assert repr(self._optimize(text).res[0]).startswith(
+            "<Tag names=['artist']")
+
+    def test_selectivity_keys(self):
+        self.selectivity.set(Query(u"~dirname=foo")._match, 0.1)
+        assert Query(u"~basename=foo")._match not in self.selectivity
+        self.selectivity.set(Query(u"#(rating > 0.333)")._match, 0.1)
+        assert Query(u"#(rating > 0.334)")._match not in self.selectivity
+        assert Query(u"#(rating > 0.333)")._match in self.selectivity
+
+    def test_learn(self):
+        node = Query(u"&(artist=bar, #(playcount > 1))")._match
+        assert not learn(node, self.songs[:10], self.selectivity)
+        assert learn(node, self.songs[:SAMPLE_SIZE], self.selectivity)
+        assert not learn(node, self.songs, self.selectivity)
+        self.assertAlmostEqual(self.selectivity.get(node.res[0]), 1.0 / 8)
+        assert self.selectivity.get(node.res[1]) > 0.9
+
+    def test_max_entries(self):
+        self.selectivity.MAX_ENTRIES = 2
+        for i in range(3):
+            self.selectivity.set(Query(u"artist=%d" % i)._match, 0.1)
+        assert Query(u"artist=0")._match not in self.selectivity
+        assert Query(u"artist=2")._match in self.selectivity
+
+    def test_same_result(self):
+        for text in [u"&(foo, #(playcount > 10))", u"|(bar, #(playcount < 4))",
+                     u"!&(foo, #(playcount > 10))", u"&(|(foo, bar), !bar)"]:
+            query = Query(text)
+            learn(query._match, self.songs, self.selectivity)
+            node = optimize(query._match, self.selectivity)
+            self.assertEqual(query._match.filter(self.songs),
+                             node.filter(self.songs))
+            self.assertEqual(query.filter(self.songs),
+                             node.filter(self.songs))
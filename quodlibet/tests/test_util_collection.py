@@ -15,7 +15,7 @@ from tests import TestCase, mkdtemp
 from quodlibet.formats import AudioFile as Fakesong
 from quodlibet.formats._audio import NUMERIC_ZERO_DEFAULT, PEOPLE
 from quodlibet.util.collection import Album, Playlist, avg, bayesian_average, \
-    FileBackedPlaylist
+    FileBackedPlaylist, VALUE_CACHE
 from quodlibet.library.libraries import FileLibrary
 from quodlibet.util import format_rating
 
@@ -64,6 +64,94 @@ class TAlbum(TestCase):
 
         s.failUnlessEqual(album.comma("~peoplesort"), "aa, a, b")
 
+    def test_value_cache(s):
+        songs = [Fakesong({"artist": "a"}), Fakesong({"artist": "b"})]
+        album = Album(songs[0])
+        album.songs = set(songs[:1])
+
+        s.failUnlessEqual(album.comma("artist"), "a")
+        s.failUnlessEqual(album.comma("~foo"), "")
+        hits = VALUE_CACHE.stats()["hits"]
+        s.failUnlessEqual(album.comma("artist"), "a")
+        s.failUnlessEqual(album.comma("~foo"), "")
+        s.failUnlessEqual(VALUE_CACHE.stats()["hits"], hits + 2)
+
+        album.songs = set(songs)
+        s.failUnlessEqual(album.comma("artist"), "a")
+        album.finalize()
+        s.failUnlessEqual(album.comma("artist"), "a, b")
+
+    def test_value_cache_many_albums(s):
+        albums = []
+        for i in range(1000):
+            song = Fakesong({"album": "%05d" % i, "~#rating": 0.5})
+            album = Album(song)
+            album.songs = {song}
+            albums.append(album)
+
+        def sort_key(album):
+            return (album("~#rating"), album("album"))
+
+        expected = sorted(albums, key=sort_key)
+        misses = VALUE_CACHE.stats()["misses"]
+        s.assertEqual(sorted(reversed(albums), key=sort_key), expected)
+        s.assertEqual(VALUE_CACHE.stats()["misses"], misses)
+
+    def test_value_cache_finalize(s):
+        song = Fakesong({"artist": "a"})
+        album = Album(song)
+        album.songs = {song}
+        album.comma("artist")
+        size = len(VALUE_CACHE)
+        for i in range(10):
+            album.finalize()
+            album.comma("artist")
+        s.assertEqual(len(VALUE_CACHE), size)
+
+    def _get_misses(s, album, keys):
+        misses = []
+        for key in keys:
+            count = VALUE_CACHE.stats()["misses"]
+            album.get(key)
+            if VALUE_CACHE.stats()["misses"] != count:
+                misses.append(key)
+        return misses
+
+    def test_value_cache_changed_songs(s):
+        songs = [Fakesong({"artist": "a", "~#playcount": 1, "~#length": 5}),
+                 Fakesong({"artist": "b", "~#playcount": 2})]
+        album = Album(songs[0])
+        album.songs = set(songs)
+        keys = ["artist", "~people", "~#playcount", "~#playcount:max",
+                "~length", "~#bitrate", "~year"]
+        s.assertEqual(s._get_misses(album, keys), keys)
+
+        songs[0]["~#playcount"] += 1
+        album.finalize(songs[:1])
+        s.assertEqual(s._get_misses(album, keys),
+                      ["~#playcount", "~#playcount:max", "~year"])
+        s.assertEqual(album("~#playcount"), 4)
+
+        songs[1]["~#length"] = 10
+        album.finalize(songs[1:])
+        s.assertEqual(s._get_misses(album, keys),
+                      ["~length", "~#bitrate", "~year"])
+        s.assertEqual(album("~length"), "0:15")
+
+        songs[1]["artist"] = "c"
+        album.finalize(songs)
+        s.assertEqual(s._get_misses(album, keys),
+                      ["artist", "~people", "~year"])
+        s.assertEqual(album.comma("artist"), "a, c")
+        s.assertEqual(album.comma("~peoplesort"), "a, c")
+
+        album.finalize(songs)
+        s.assertEqual(s._get_misses(album, keys), [])
+
+        songs[0].update({"artist": "d"})
+        album.finalize(songs[:1])
+        s.assertEqual(s._get_misses(album, keys), keys)
+
     def test_tied_tags(s):
         songs = [
             Fakesong({"artist": "a", "title": "c"}),
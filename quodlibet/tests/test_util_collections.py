@@ -4,7 +4,8 @@
 # (at your option) any later version.
 
 from tests import TestCase
-from quodlibet.util.collections import HashedList, DictProxy
+from quodlibet.util.collections import HashedList, DictProxy, LRUCache, \
+    WeightedList
 
 
 class TDictMixin(TestCase):
@@ -151,3 +152,135 @@ class THashedList(TestCase):
         self.failIf(l.has_duplicates())
         l.append(5)
         self.failUnless(l.has_duplicates())
+
+
+class TLRUCache(TestCase):
+
+    def test_get(self):
+        c = LRUCache(2)
+        self.assertEqual(c.get(1), None)
+        self.assertEqual(c.get(1, 42), 42)
+        c[1] = None
+        assert 1 in c
+        self.assertEqual(c.get(1, 42), None)
+
+    def test_evict(self):
+        c = LRUCache(2)
+        c[1] = 1
+        c[2] = 2
+        c.get(1)
+        c[3] = 3
+        assert 1 in c
+        assert 2 not in c
+        assert 3 in c
+        self.assertEqual(len(c), 2)
+        self.assertEqual(c.evictions, 1)
+
+    def test_pop(self):
+        c = LRUCache(2)
+        c[1] = 2
+        self.assertEqual(c.pop(1), 2)
+        self.assertEqual(c.pop(1, 3), 3)
+        assert 1 not in c
+        self.assertEqual(c.misses, 0)
+
+    def test_stats(self):
+        c = LRUCache(2)
+        self.assertEqual(c.hit_rate, 0.0)
+        c[1] = 1
+        c.get(1)
+        c.get(2)
+        self.assertEqual(c.hits, 1)
+        self.assertEqual(c.misses, 1)
+        self.assertEqual(c.hit_rate, 0.5)
+        self.assertEqual(c.stats()["size"], 1)
+        c.reset_stats()
+        self.assertEqual(c.hits, 0)
+        c.clear()
+        self.assertEqual(len(c), 0)
+
+
+class TWeightedList(TestCase):
+
+    def setUp(self):
+        self._size = WeightedList.BLOCK_SIZE
+        WeightedList.BLOCK_SIZE = 2
+
+    def tearDown(self):
+        WeightedList.BLOCK_SIZE = self._size
+
+    def test_list(self):
+        w = WeightedList([1, 2, 3])
+        self.assertEqual(len(w), 3)
+        self.assertEqual(list(w), [1, 2, 3])
+        self.assertEqual(w.total, 6)
+        self.assertEqual(w[-1], 3)
+        self.assertRaises(IndexError, w.__getitem__, 3)
+
+    def test_modify(self):
+        w = WeightedList()
+        expected = []
+        for i in range(20):
+            w.insert(i // 2, i)
+            expected.insert(i // 2, i)
+        w.append(42)
+        expected.append(42)
+        self.assertEqual(list(w), expected)
+        del w[3]
+        del expected[3]
+        w[5] = 0
+        expected[5] = 0
+        self.assertEqual(list(w), expected)
+        self.assertEqual(w.total, sum(expected))
+        while expected:
+            del w[0]
+            del expected[0]
+            self.assertEqual(w.total, sum(expected))
+        self.assertEqual(len(w), 0)
+
+    def test_pick(self):
+        w = WeightedList([0, 1, 0, 0, 2, 0, 1, 0])
+        self.assertEqual(w.pick(-1), 1)
+        self.assertEqual(w.pick(0), 1)
+        self.assertEqual(w.pick(0.5), 1)
+        self.assertEqual(w.pick(1), 4)
+        self.assertEqual(w.pick(2.9), 4)
+        self.assertEqual(w.pick(3), 6)
+        self.assertEqual(w.pick(4), 6)
+        self.assertEqual(w.pick(100), 6)
+
+    def test_pick_zero(self):
+        self.assertRaises(ValueError, WeightedList().pick, 0)
+        self.assertRaises(ValueError, WeightedList([0, 0]).pick, 0)
+
+    def test_pick_rounding(self):
+        w = WeightedList([0.1, 0.2, 1.0, 0.0])
+        w[0] = 0.0
+        w[1] = 0.0
+        self.assertEqual(w.pick(0), 2)
+        self.assertEqual(w.pick(1.0), 2)
+        w[2] = 0.0
+        w.append(0.0)
+        self.assertRaises(ValueError, w.pick, 0)
+
+    def test_pick_modified(self):
+        weights = [(i * 7) % 5 for i in range(50)]
+        w = WeightedList(weights)
+        for i in range(0, 50, 3):
+            w.insert(i, i % 4)
+            weights.insert(i, i % 4)
+        for i in range(0, 40, 4):
+            del w[i]
+            del weights[i]
+        for i in range(0, 40, 5):
+            w[i] = 0
+            weights[i] = 0
+
+        self.assertEqual(list(w), weights)
+        self.assertEqual(w.total, sum(weights))
+        total = 0
+        for i, weight in enumerate(weights):
+            if weight:
+                self.assertEqual(w.pick(total), i)
+                self.assertEqual(w.pick(total + weight - 0.5), i)
+            total += weight
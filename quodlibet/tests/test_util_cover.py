@@ -7,6 +7,7 @@
 import glob
 import os
 import shutil
+import time
 
 from gi.repository import Gio
 
@@ -16,11 +17,13 @@ from quodlibet import config
 from quodlibet.ext.covers.artwork_url import ArtworkUrlCover
 from quodlibet.formats import AudioFile
 from quodlibet.plugins import Plugin
+from quodlibet.util.cover.cache import CoverCache, get_key, get_stamp, \
+    is_valid_stamp
 from quodlibet.util.cover.http import escape_query_value
 from quodlibet.util.cover.manager import CoverManager
 from quodlibet.util.path import normalize_path, path_equal, mkdir
 
-from tests import TestCase, mkdtemp
+from tests import TestCase, mkdtemp, get_data_path
 
 
 bar_2_1 = AudioFile({
@@ -210,6 +213,73 @@ class TCoverManager(TestCase):
         self.assertTrue(
             self.manager.get_pixbuf_many([self.song], 10, 10) is None)
 
+    def test_pixbuf_cache(self):
+        cache_dir = mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.manager.cache = CoverCache(cache_dir)
+        assert self.manager.get_pixbuf(self.song, 10, 10) is None
+        # no cover is remembered as well
+        self.manager.get_cover_source_many = \
+            lambda songs: self.fail("looked up")
+        assert self.manager.get_pixbuf(self.song, 10, 10) is None
+        del self.manager.get_cover_source_many
+
+        shutil.copy(get_data_path("image.png"), self.full_path("cover.png"))
+        # the directory changed
+        pixbuf = self.manager.get_pixbuf(self.song, 10, 10)
+        assert pixbuf is not None
+
+        self.manager.get_cover_source_many = \
+            lambda songs: self.fail("looked up")
+        assert self.manager.get_pixbuf(self.song, 10, 10) is pixbuf
+        # from disk
+        self.manager.cache.clear_memory()
+        assert self.manager.get_pixbuf(self.song, 10, 10) is not None
+        del self.manager.get_cover_source_many
+
+        # the image changed
+        future = time.time() + 10
+        os.utime(self.full_path("cover.png"), (future, future))
+        assert self.manager.get_pixbuf(self.song, 10, 20) is not None
+        found, pixbuf = self.manager.cache.lookup(
+            self.manager.get_cache_key([self.song]), (10, 10))
+        assert not found
+
+    def test_cache_key_settings(self):
+        key = self.manager.get_cache_key([self.song])
+        assert key == self.manager.get_cache_key([self.song])
+        config.set("albumart", "force_filename", True)
+        assert key != self.manager.get_cache_key([self.song])
+        config.set("albumart", "force_filename", False)
+        assert key == self.manager.get_cache_key([self.song])
+
+        plugin = Plugin(ArtworkUrlCover)
+        self.manager.plugin_handler.plugin_enable(plugin)
+        assert key != self.manager.get_cache_key([self.song])
+        self.manager.plugin_handler.plugin_disable(plugin)
+        assert key == self.manager.get_cache_key([self.song])
+
+    def test_pixbuf_cache_embedded(self):
+        cache_dir = mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.manager.cache = CoverCache(cache_dir)
+        cover = self.full_path("cover.png")
+        shutil.copy(get_data_path("image.png"), cover)
+        open(self.song("~filename"), "wb").close()
+        source = type("Source", (), {"embedded": True})
+        self.manager.get_cover_source_many = \
+            lambda songs: (open(cover, "rb"), source)
+        assert self.manager.get_pixbuf(self.song, 10, 10) is not None
+        del self.manager.get_cover_source_many
+
+        # the stamp covers the song file, not the image
+        future = time.time() + 10
+        os.utime(cover, (future, future))
+        key = self.manager.get_cache_key([self.song])
+        assert self.manager.cache.lookup(key, (10, 10))[0]
+        os.utime(self.song("~filename"), (future, future))
+        assert not self.manager.cache.lookup(key, (10, 10))[0]
+
     def test_get_many(self):
         songs = [AudioFile({"~filename": os.path.join(self.dir, "song.ogg"),
                             "title": "Ode to Baz"}),
@@ -228,6 +298,57 @@ class TCoverManager(TestCase):
         self.manager.search_cover(Gio.Cancellable(), album_songs)
 
 
+class TCoverCache(TestCase):
+
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.cache = CoverCache(self.dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_key(self):
+        a = AudioFile({"~filename": fsnative(u"/foo/a")})
+        b = AudioFile({"~filename": fsnative(u"/foo/b")})
+        assert get_key([a, b]) == get_key([b, a])
+        assert get_key([a]) != get_key([b])
+
+    def test_stamp(self):
+        path = os.path.join(self.dir, "foo")
+        stamp = get_stamp([self.dir, path])
+        assert is_valid_stamp(stamp)
+        open(path, "wb").close()
+        assert not is_valid_stamp(stamp)
+        assert not is_valid_stamp("nope")
+
+    def test_store(self):
+        self.cache.store("key", (10, 10), None, get_stamp([self.dir]))
+        self.assertEqual(self.cache.lookup("key", (10, 10)), (True, None))
+        self.assertEqual(self.cache.lookup("key", (20, 20)), (False, None))
+        self.cache.clear_memory()
+        self.assertEqual(self.cache.lookup("key", (10, 10)), (False, None))
+
+    def test_key_settings(self):
+        a = AudioFile({"~filename": fsnative(u"/foo/a")})
+        assert get_key([a]) == get_key([a], [])
+        assert get_key([a], ["x"]) != get_key([a], ["y"])
+
+    def test_prune(self):
+        for i in range(4):
+            for j, size in enumerate(["10x10", "20x20"]):
+                path = os.path.join(self.dir, size, "%d.png" % i)
+                mkdir(os.path.dirname(path))
+                open(path, "wb").close()
+                os.utime(path, (i * 2 + j, i * 2 + j))
+        self.cache.prune(3)
+        remaining = sorted(
+            os.path.join(size, name) for size in os.listdir(self.dir)
+            for name in os.listdir(os.path.join(self.dir, size)))
+        self.assertEqual(remaining, [
+            os.path.join("10x10", "3.png"), os.path.join("20x20", "2.png"),
+            os.path.join("20x20", "3.png")])
+
+
 class THttp(TestCase):
 
     def test_escape(self):
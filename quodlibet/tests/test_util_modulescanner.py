@@ -97,6 +97,20 @@ class TModuleScanner(TestCase):
         self.failUnlessEqual(len(s.modules), 2)
         self.failUnlessEqual(len(s.failures), 0)
 
+    def test_scanner_skip(self):
+        self._create_mod("q5.py").close()
+        self._create_mod("q6.py").close()
+        s = ModuleScanner([self.d])
+        removed, added = s.rescan(lambda name, deps: name == "q6")
+        self.failUnlessEqual(added, ["q5"])
+        self.failUnlessEqual(list(s.skipped), ["q6"])
+        self.failUnlessEqual(
+            s.skipped["q6"], [os.path.join(self.d, "q6.py")])
+        removed, added = s.rescan()
+        self.failIf(removed)
+        self.failUnlessEqual(added, ["q6"])
+        self.failIf(s.skipped)
+
     def test_unimportable_package(self):
         self._create_pkg("_foobar").close()
         s = ModuleScanner([self.d])
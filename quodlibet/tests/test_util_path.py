@@ -10,10 +10,10 @@ import unittest
 from senf import uri2fsn, fsn2uri, fsnative, environ
 
 from quodlibet.util.path import iscommand, limit_path, \
-    get_home_dir, uri_is_valid, ishidden
+    get_home_dir, uri_is_valid, ishidden, scan_dir, walk_dirs
 from quodlibet.util import print_d
 
-from . import TestCase
+from . import TestCase, mkdtemp
 
 
 is_win = os.name == "nt"
@@ -29,6 +29,58 @@ class Tishidden(TestCase):
         assert not ishidden(fsnative(u"foo"))
 
 
+class Twalk_dirs(TestCase):
+
+    def setUp(self):
+        self.root = os.path.realpath(mkdtemp())
+        for name in ["a", "b", os.path.join("a", "c")]:
+            os.mkdir(os.path.join(self.root, name))
+            with open(os.path.join(self.root, name, "file"), "wb"):
+                pass
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    @unittest.skipIf(is_win, "no symlink")
+    def test_scan_dir(self):
+        os.symlink(os.path.join(self.root, "a", "file"),
+                   os.path.join(self.root, "link"))
+        os.symlink(os.path.join(self.root, "b"),
+                   os.path.join(self.root, "dirlink"))
+        os.symlink(os.path.join(self.root, "nope"),
+                   os.path.join(self.root, "broken"))
+        dnames, fnames, links = scan_dir(self.root)
+        self.assertEqual(sorted(dnames), ["a", "b"])
+        self.assertEqual(fnames, [])
+        self.assertEqual(sorted(links), ["broken", "link"])
+
+    def test_walk(self):
+        for workers in [0, 3]:
+            result = [(p, sorted(d), f) for p, d, f, l in
+                      walk_dirs(self.root, workers)]
+            self.assertEqual(result[0], (self.root, ["a", "b"], []))
+            self.assertEqual(
+                sorted(result[1:]), [
+                    (os.path.join(self.root, "a"), ["c"], ["file"]),
+                    (os.path.join(self.root, "a", "c"), [], ["file"]),
+                    (os.path.join(self.root, "b"), [], ["file"]),
+                ])
+
+    def test_prune(self):
+        for workers in [0, 3]:
+            paths = []
+            for path, dnames, fnames, links in walk_dirs(self.root, workers):
+                paths.append(path)
+                if "a" in dnames:
+                    dnames.remove("a")
+            self.assertEqual(paths, [self.root, os.path.join(self.root, "b")])
+
+    def test_missing(self):
+        root = os.path.join(self.root, "nope")
+        self.assertEqual(list(walk_dirs(root)), [])
+        self.assertEqual(list(walk_dirs(root, 2)), [])
+
+
 class Turi(TestCase):
 
     def test_uri2fsn(self):
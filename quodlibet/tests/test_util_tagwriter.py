@@ -0,0 +1,188 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import os
+import threading
+
+from gi.repository import Gtk
+
+from tests import TestCase, get_data_path
+from .helper import get_temp_copy
+
+from quodlibet.formats import MusicFile
+from quodlibet.library import SongLibrary
+from quodlibet.util.tagwriter import TagWriter, WriteBatch, copy_song
+
+
+class TWriteBatch(TestCase):
+
+    def setUp(self):
+        self.library = SongLibrary()
+        self.writer = TagWriter(2)
+        self.songs = []
+        for i in range(5):
+            filename = get_temp_copy(get_data_path("silence-44-s.ogg"))
+            self.songs.append(MusicFile(filename))
+        self.library.add(self.songs)
+        self.changed = []
+        self.library.connect(
+            "changed", lambda lib, songs: self.changed.extend(songs))
+
+    def tearDown(self):
+        self.writer.shutdown()
+        self.library.destroy()
+        for song in self.songs:
+            if os.path.exists(song["~filename"]):
+                os.remove(song["~filename"])
+
+    def _write(self, batch, songs):
+        done = []
+        batch.write(songs, done.append)
+        while not done:
+            Gtk.main_iteration()
+        self.assertEqual(done, [batch])
+        assert batch.done
+
+    def _change(self, batch, songs, title):
+        for song in songs:
+            batch.record(song)
+            song["title"] = title
+
+    def test_copy_song(self):
+        song = self.songs[0]
+        copy = copy_song(song)
+        assert copy is not song
+        self.assertEqual(type(copy), type(song))
+        self.assertEqual(dict(copy), dict(song))
+
+    def test_write(self):
+        batch = WriteBatch(self.library, self.writer)
+        self._change(batch, self.songs, u"foo")
+        self.assertEqual(len(batch), 5)
+        self._write(batch, self.songs)
+
+        self.assertEqual(sorted(self.changed, key=id),
+                         sorted(self.songs, key=id))
+        self.assertEqual(len(batch.written), 5)
+        for song in self.songs:
+            assert song.valid()
+            self.assertEqual(MusicFile(song["~filename"])("title"), u"foo")
+
+    def test_write_empty(self):
+        batch = WriteBatch(self.library, self.writer)
+        self._write(batch, [])
+        self.assertEqual(self.changed, [])
+
+    def test_failed(self):
+        batch = WriteBatch(self.library, self.writer)
+        self._change(batch, self.songs, u"foo")
+        broken = self.songs[0]
+        os.remove(broken["~filename"])
+        self._write(batch, self.songs)
+
+        self.assertEqual(batch.failed, [broken])
+        self.assertEqual(len(batch.written), 4)
+        assert broken not in self.library
+
+    def test_revert(self):
+        old_title = self.songs[0]("title")
+        batch = WriteBatch(self.library, self.writer)
+        self._change(batch, self.songs, u"foo")
+        self._write(batch, self.songs[:3])
+
+        reverting = batch.revert()
+        while not reverting.done:
+            Gtk.main_iteration()
+        for song in self.songs:
+            self.assertEqual(song("title"), old_title)
+            assert song.valid()
+            self.assertEqual(
+                MusicFile(song["~filename"])("title"), old_title)
+
+    def test_shutdown(self):
+        song = self.songs[0]
+        batch = WriteBatch(self.library, self.writer)
+        self._change(batch, [song], u"foo")
+        done = []
+        batch.write([song], done.append)
+        self.writer.shutdown()
+        self.assertEqual(done, [batch])
+        self.assertEqual(batch.written, [song])
+        assert song.valid()
+        self.assertEqual(self.changed, [song])
+
+    def test_write_twice(self):
+        song = self.songs[0]
+        for title in [u"foo", u"bar"]:
+            batch = WriteBatch(self.library, self.writer)
+            self._change(batch, [song], title)
+            batch.write([song])
+        while self.writer.is_pending(song):
+            Gtk.main_iteration()
+        self.assertEqual(MusicFile(song["~filename"])("title"), u"bar")
+
+    def _blocked_writer(self):
+        """A writer with one worker, which waits for the returned event
+        to be set before writing. Returns once the worker waits for it.
+        """
+
+        writer = TagWriter(1)
+        self.addCleanup(writer.shutdown)
+        started = threading.Event()
+        release = threading.Event()
+        write = writer._write
+
+        def blocked_write(copy, previous):
+            started.set()
+            release.wait()
+            return write(copy, previous)
+        writer._write = blocked_write
+
+        # keep the only worker busy, so the others stay queued
+        song = self.songs[-1]
+        batch = WriteBatch(self.library, writer)
+        self._change(batch, [song], u"busy")
+        batch.write([song])
+        started.wait()
+        return writer, release
+
+    def test_cancel_superseded(self):
+        writer, release = self._blocked_writer()
+
+        song = self.songs[0]
+        first = WriteBatch(self.library, writer)
+        self._change(first, [song], u"foo")
+        first.write([song])
+        second = WriteBatch(self.library, writer)
+        self._change(second, [song], u"bar")
+        second.write([song])
+
+        first.cancel()
+        while not first.done:
+            Gtk.main_iteration()
+        self.assertEqual(first.cancelled, [song])
+        self.assertEqual(song("title"), u"bar")
+
+        release.set()
+        while not second.done:
+            Gtk.main_iteration()
+        self.assertEqual(song("title"), u"bar")
+        assert song.valid()
+        self.assertEqual(MusicFile(song["~filename"])("title"), u"bar")
+
+    def test_cancel_reverts(self):
+        writer, release = self._blocked_writer()
+
+        song = self.songs[0]
+        old_title = song("title")
+        batch = WriteBatch(self.library, writer)
+        self._change(batch, [song], u"foo")
+        batch.write([song])
+        batch.cancel()
+        release.set()
+        while not batch.done:
+            Gtk.main_iteration()
+        self.assertEqual(batch.cancelled, [song])
+        self.assertEqual(song("title"), old_title)
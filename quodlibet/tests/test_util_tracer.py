@@ -0,0 +1,103 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+
+import builtins
+import json
+import os
+import shutil
+import sys
+
+from senf import environ
+
+from tests import TestCase, mkdtemp
+
+from quodlibet.util import tracer
+from quodlibet.util.tracer import Tracer
+
+
+class TTracer(TestCase):
+
+    def setUp(self):
+        self.tracer = Tracer()
+        self.dir = mkdtemp()
+
+    def tearDown(self):
+        self.tracer.uninstall_import_hook()
+        shutil.rmtree(self.dir)
+
+    def test_span(self):
+        with self.tracer.span("outer"):
+            with self.tracer.span("inner"):
+                pass
+        inner, outer = self.tracer.events
+        self.assertEqual((inner.name, outer.name), ("inner", "outer"))
+        assert outer.start <= inner.start
+        assert outer.wall >= inner.wall
+        self.assertEqual(outer.category, "phase")
+
+        report = self.tracer.get_report()
+        assert "\nouter " in report
+        assert "\n  inner " in report
+
+    def test_span_error(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.span("foo"):
+                raise ValueError
+        self.assertEqual(len(self.tracer.events), 1)
+
+    def test_import_hook(self):
+        with open(os.path.join(self.dir, "qltracetest.py"), "w") as h:
+            h.write("import json\nVALUE = 42\n")
+        sys.path.insert(0, self.dir)
+        self.addCleanup(sys.path.remove, self.dir)
+        self.addCleanup(sys.modules.pop, "qltracetest", None)
+
+        original = builtins.__import__
+        self.tracer.install_import_hook()
+        import qltracetest
+        self.tracer.uninstall_import_hook()
+        assert builtins.__import__ is original
+
+        self.assertEqual(qltracetest.VALUE, 42)
+        # already imported ones are ignored
+        self.assertEqual(
+            [(e.name, e.category) for e in self.tracer.events],
+            [("qltracetest", "import")])
+
+    def test_chrome_trace(self):
+        with self.tracer.span("foo"):
+            pass
+        data = json.loads(json.dumps(self.tracer.get_chrome_trace()))
+        event, = data["traceEvents"]
+        self.assertEqual(event["name"], "foo")
+        self.assertEqual(event["ph"], "X")
+        assert event["dur"] >= 0
+
+    def test_global(self):
+        assert not tracer.is_tracing()
+        with tracer.span("foo"):
+            pass
+
+        @tracer.traced("bar")
+        def func(x):
+            return x * 2
+
+        path = os.path.join(self.dir, "trace.json")
+        environ["QUODLIBET_TRACE"] = path
+        try:
+            tracer.start()
+            assert tracer.is_tracing()
+            with tracer.span("foo"):
+                self.assertEqual(func(2), 4)
+            tracer.finish()
+        finally:
+            del environ["QUODLIBET_TRACE"]
+            tracer.finish()
+
+        assert not tracer.is_tracing()
+        with open(path, "r", encoding="utf-8") as h:
+            data = json.load(h)
+        names = [e["name"] for e in data["traceEvents"]]
+        self.assertEqual(names, ["bar", "foo"])